@@ -0,0 +1,55 @@
+"""daily transaction rollups
+
+Revision ID: 5c2e8f1a9d47
+Revises: b674d245312c
+Create Date: 2026-10-18 12:04:11.402113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e8f1a9d47'
+down_revision: Union[str, Sequence[str], None] = 'b674d245312c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_transaction_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', postgresql.ENUM('SUCCESSFUL', 'FAILED', name='typestatusenum', create_type=False), nullable=False),
+    sa.Column('type', postgresql.ENUM('PAYMENT', 'INVOICE', name='typepayenum', create_type=False), nullable=False),
+    sa.Column('total_amount', sa.DECIMAL(precision=18, scale=2), nullable=False),
+    sa.Column('transaction_count', sa.BigInteger(), nullable=False),
+    sa.Column('min_amount', sa.DECIMAL(precision=10, scale=2), nullable=False),
+    sa.Column('max_amount', sa.DECIMAL(precision=10, scale=2), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'status', 'type', name='uq_daily_rollups_day_status_type')
+    )
+    op.create_table('rollup_refresh_state',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('watermark', sa.DateTime(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    # Инкрементальный пересчёт ищет дни, затронутые после последнего запуска
+    op.create_index('idx_transactions_updated_at', 'transactions', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_transactions_updated_at', table_name='transactions')
+    op.drop_table('rollup_refresh_state')
+    op.drop_table('daily_transaction_rollups')
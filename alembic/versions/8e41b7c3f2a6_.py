@@ -0,0 +1,60 @@
+"""transactions change counter
+
+Revision ID: 8e41b7c3f2a6
+Revises: 5c2e8f1a9d47
+Create Date: 2026-10-18 13:21:52.118640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41b7c3f2a6'
+down_revision: Union[str, Sequence[str], None] = '5c2e8f1a9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('table_change_counters',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('table_name')
+    )
+    op.execute("INSERT INTO table_change_counters (table_name, version) VALUES ('transactions', 0)")
+    # Триггер на уровне оператора: одно обновление счётчика на запрос, а не на строку
+    op.execute(
+        """
+        CREATE FUNCTION bump_table_change_counter() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO table_change_counters (table_name, version)
+            VALUES (TG_TABLE_NAME, 1)
+            ON CONFLICT (table_name) DO UPDATE
+            SET version = table_change_counters.version + 1, updated_at = now();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER transactions_change_counter
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON transactions
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_table_change_counter()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS transactions_change_counter ON transactions")
+    op.execute("DROP FUNCTION IF EXISTS bump_table_change_counter()")
+    op.drop_table('table_change_counters')
@@ -0,0 +1,36 @@
+"""hll user sketches in daily rollups
+
+Revision ID: a4e7c2f9d813
+Revises: f1c6a8d3b592
+Create Date: 2026-10-18 21:03:12.275941
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e7c2f9d813'
+down_revision: Union[str, Sequence[str], None] = 'f1c6a8d3b592'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('daily_transaction_rollups', sa.Column('hll_registers', postgresql.ARRAY(sa.SmallInteger()), server_default='{}', nullable=False))
+    op.add_column('daily_transaction_rollups', sa.Column('hll_ranks', postgresql.ARRAY(sa.SmallInteger()), server_default='{}', nullable=False))
+    # Сброс отметки: следующий пересчёт пересоберёт роллапы вместе с HLL
+    op.execute(
+        "UPDATE rollup_refresh_state SET watermark = NULL "
+        "WHERE name = 'daily_transaction_rollups'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('daily_transaction_rollups', 'hll_ranks')
+    op.drop_column('daily_transaction_rollups', 'hll_registers')
@@ -0,0 +1,67 @@
+"""bump change counter from application code
+
+Revision ID: a7c3e9f2d418
+Revises: f6d1b3e8a5c7
+Create Date: 2026-10-19 14:41:19.270364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9f2d418'
+down_revision: Union[str, Sequence[str], None] = 'f6d1b3e8a5c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHANGE_COUNTER_SHARDS = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Отчёты зависят не только от строк transactions: пересчёт роллапов меняет
+    # их результат для дней до отметки пересчёта. Счётчик сдвигается той же
+    # функцией, что и в триггере, из кода приложения
+    op.execute(
+        f"""
+        CREATE FUNCTION bump_change_counter(counter_name text) RETURNS void AS $$
+        BEGIN
+            INSERT INTO table_change_counters (table_name, shard, version)
+            VALUES (counter_name, pg_backend_pid() % {CHANGE_COUNTER_SHARDS}, 1)
+            ON CONFLICT (table_name, shard) DO UPDATE
+            SET version = table_change_counters.version + 1, updated_at = now();
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_table_change_counter() RETURNS trigger AS $$
+        BEGIN
+            PERFORM bump_change_counter(TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION bump_table_change_counter() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO table_change_counters (table_name, shard, version)
+            VALUES (TG_TABLE_NAME, pg_backend_pid() % {CHANGE_COUNTER_SHARDS}, 1)
+            ON CONFLICT (table_name, shard) DO UPDATE
+            SET version = table_change_counters.version + 1, updated_at = now();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute("DROP FUNCTION IF EXISTS bump_change_counter(text)")
@@ -0,0 +1,110 @@
+"""rollup dirty days
+
+Revision ID: b9d3e6f1a2c4
+Revises: a4e7c2f9d813
+Create Date: 2026-10-19 10:14:37.502118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d3e6f1a2c4'
+down_revision: Union[str, Sequence[str], None] = 'a4e7c2f9d813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rollup_dirty_days',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Триггеры на уровне оператора с таблицами переходов: одна вставка дней
+    # на запрос (и на COPY), удаления и смена date_pay тоже отмечают дни.
+    # Отметка фиксируется вместе с изменением, поэтому поздний коммит
+    # долгой транзакции не теряется, в отличие от отметки по updated_at
+    op.execute(
+        """
+        CREATE FUNCTION mark_rollup_dirty_days() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO rollup_dirty_days (day)
+                SELECT DISTINCT date_pay::date FROM new_rows;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO rollup_dirty_days (day)
+                SELECT DISTINCT date_pay::date FROM old_rows;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER transactions_rollup_dirty_insert
+        AFTER INSERT ON transactions REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION mark_rollup_dirty_days()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER transactions_rollup_dirty_update
+        AFTER UPDATE ON transactions
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION mark_rollup_dirty_days()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER transactions_rollup_dirty_delete
+        AFTER DELETE ON transactions REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION mark_rollup_dirty_days()
+        """
+    )
+    # После TRUNCATE роллапы пересобираются целиком
+    op.execute(
+        """
+        CREATE FUNCTION reset_rollup_watermark() RETURNS trigger AS $$
+        BEGIN
+            UPDATE rollup_refresh_state SET watermark = NULL, updated_at = now()
+            WHERE name = 'daily_transaction_rollups';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER transactions_rollup_truncate
+        AFTER TRUNCATE ON transactions
+        FOR EACH STATEMENT EXECUTE FUNCTION reset_rollup_watermark()
+        """
+    )
+    # Затронутые дни больше не ищутся по updated_at
+    op.drop_index('idx_transactions_updated_at', table_name='transactions')
+    # Изменения, пропущенные отметкой по updated_at, исправит полная пересборка
+    op.execute(
+        "UPDATE rollup_refresh_state SET watermark = NULL "
+        "WHERE name = 'daily_transaction_rollups'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('idx_transactions_updated_at', 'transactions', ['updated_at'], unique=False)
+    op.execute("DROP TRIGGER IF EXISTS transactions_rollup_truncate ON transactions")
+    op.execute("DROP FUNCTION IF EXISTS reset_rollup_watermark()")
+    op.execute("DROP TRIGGER IF EXISTS transactions_rollup_dirty_delete ON transactions")
+    op.execute("DROP TRIGGER IF EXISTS transactions_rollup_dirty_update ON transactions")
+    op.execute("DROP TRIGGER IF EXISTS transactions_rollup_dirty_insert ON transactions")
+    op.execute("DROP FUNCTION IF EXISTS mark_rollup_dirty_days()")
+    op.drop_table('rollup_dirty_days')
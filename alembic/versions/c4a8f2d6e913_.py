@@ -0,0 +1,85 @@
+"""sharded change counters
+
+Revision ID: c4a8f2d6e913
+Revises: b9d3e6f1a2c4
+Create Date: 2026-10-19 11:02:48.361905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a8f2d6e913'
+down_revision: Union[str, Sequence[str], None] = 'b9d3e6f1a2c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHANGE_COUNTER_SHARDS = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('table_change_counters', sa.Column('shard', sa.SmallInteger(), server_default='0', nullable=False))
+    op.drop_constraint('table_change_counters_table_name_key', 'table_change_counters', type_='unique')
+    op.create_unique_constraint('table_change_counters_table_name_shard_key', 'table_change_counters', ['table_name', 'shard'])
+    # Строки шардов заранее: триггеру достаточно UPDATE своей строки
+    op.execute(
+        f"""
+        INSERT INTO table_change_counters (table_name, shard, version)
+        SELECT 'transactions', shard, 0 FROM generate_series(1, {CHANGE_COUNTER_SHARDS - 1}) AS shard
+        """
+    )
+    # Один счётчик на таблицу держал блокировку строки до конца транзакции
+    # и выстраивал всех пишущих в очередь. Шард выбирается по процессу
+    # соединения: транзакция всегда блокирует одну и ту же строку, взаимных
+    # блокировок нет. Последовательность не подходит: nextval виден до
+    # коммита, и отчёт без ещё не закоммиченных строк попал бы в кэш
+    # под новым watermark
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION bump_table_change_counter() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO table_change_counters (table_name, shard, version)
+            VALUES (TG_TABLE_NAME, pg_backend_pid() % {CHANGE_COUNTER_SHARDS}, 1)
+            ON CONFLICT (table_name, shard) DO UPDATE
+            SET version = table_change_counters.version + 1, updated_at = now();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_table_change_counter() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO table_change_counters (table_name, version)
+            VALUES (TG_TABLE_NAME, 1)
+            ON CONFLICT (table_name) DO UPDATE
+            SET version = table_change_counters.version + 1, updated_at = now();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    # Сумма по шардам остаётся в нулевом шарде, watermark не уменьшается
+    op.execute(
+        """
+        UPDATE table_change_counters AS counter SET version = totals.version
+        FROM (
+            SELECT table_name, sum(version) AS version
+            FROM table_change_counters GROUP BY table_name
+        ) AS totals
+        WHERE counter.table_name = totals.table_name AND counter.shard = 0
+        """
+    )
+    op.execute("DELETE FROM table_change_counters WHERE shard <> 0")
+    op.drop_constraint('table_change_counters_table_name_shard_key', 'table_change_counters', type_='unique')
+    op.create_unique_constraint('table_change_counters_table_name_key', 'table_change_counters', ['table_name'])
+    op.drop_column('table_change_counters', 'shard')
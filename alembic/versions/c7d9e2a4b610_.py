@@ -0,0 +1,149 @@
+"""partition transactions by month
+
+Revision ID: c7d9e2a4b610
+Revises: 8e41b7c3f2a6
+Create Date: 2026-10-18 15:02:37.550184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d9e2a4b610'
+down_revision: Union[str, Sequence[str], None] = '8e41b7c3f2a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRANSACTION_INDEXES = (
+    ('idx_transactions_status_type_date_user', ['status', 'type', 'date_pay', 'user_id']),
+    ('idx_transactions_user_id', ['user_id']),
+    ('idx_transactions_date_pay', ['date_pay']),
+    ('idx_transactions_sum_pay', ['sum_pay']),
+    ('idx_transactions_updated_at', ['updated_at']),
+)
+
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_transactions_partitions(start_month date, end_month date)
+RETURNS integer AS $$
+DECLARE
+    month date := date_trunc('month', start_month)::date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    -- Несколько воркеров приложения могут вызвать функцию одновременно
+    PERFORM pg_advisory_xact_lock(hashtext('create_transactions_partitions'));
+    WHILE month <= end_month LOOP
+        partition_name := format('transactions_y%sm%s', to_char(month, 'YYYY'), to_char(month, 'MM'));
+        -- Отсоединённые партиции остаются таблицами и повторно не создаются
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month, (month + interval '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+CREATE_CHANGE_COUNTER_TRIGGER = """
+CREATE TRIGGER transactions_change_counter
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON transactions
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_change_counter()
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индексы старой таблицы не нужны: данные копируются в новую без них
+    for name, _ in TRANSACTION_INDEXES:
+        op.drop_index(name, table_name='transactions')
+    op.rename_table('transactions', 'transactions_unpartitioned')
+    op.execute("ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey")
+    op.execute("ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_user_id_fkey TO transactions_unpartitioned_user_id_fkey")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+
+    # Ключ партиционирования обязан входить в первичный ключ
+    op.execute(
+        """
+        CREATE TABLE transactions (
+            date_pay TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            sum_pay NUMERIC(10, 2) NOT NULL,
+            status typestatusenum NOT NULL,
+            type typepayenum NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            id INTEGER NOT NULL DEFAULT nextval('transactions_id_seq'),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT transactions_pkey PRIMARY KEY (id, date_pay)
+        ) PARTITION BY RANGE (date_pay)
+        """
+    )
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+    op.execute(
+        """
+        SELECT create_transactions_partitions(
+            coalesce(min(date_pay), now())::date,
+            (date_trunc('month', greatest(coalesce(max(date_pay), now()), now())) + interval '3 months')::date
+        )
+        FROM transactions_unpartitioned
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO transactions (date_pay, sum_pay, status, type, user_id, id, created_at, updated_at)
+        SELECT date_pay, sum_pay, status, type, user_id, id, created_at, updated_at
+        FROM transactions_unpartitioned
+        """
+    )
+    op.drop_table('transactions_unpartitioned')
+
+    # Индексы на родительской таблице создаются на каждой партиции
+    for name, columns in TRANSACTION_INDEXES:
+        op.create_index(name, 'transactions', columns, unique=False)
+    op.execute(CREATE_CHANGE_COUNTER_TRIGGER)
+    op.execute("ANALYZE transactions")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+    op.rename_table('transactions', 'transactions_partitioned')
+    for name, _ in TRANSACTION_INDEXES:
+        op.drop_index(name, table_name='transactions_partitioned')
+    op.execute("ALTER TABLE transactions_partitioned RENAME CONSTRAINT transactions_pkey TO transactions_partitioned_pkey")
+    op.create_table('transactions',
+    sa.Column('date_pay', sa.DateTime(), nullable=False),
+    sa.Column('sum_pay', sa.DECIMAL(precision=10, scale=2), nullable=False),
+    sa.Column('status', postgresql.ENUM('SUCCESSFUL', 'FAILED', name='typestatusenum', create_type=False), nullable=False),
+    sa.Column('type', postgresql.ENUM('PAYMENT', 'INVOICE', name='typepayenum', create_type=False), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('transactions_id_seq')"), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.execute(
+        """
+        INSERT INTO transactions (date_pay, sum_pay, status, type, user_id, id, created_at, updated_at)
+        SELECT date_pay, sum_pay, status, type, user_id, id, created_at, updated_at
+        FROM transactions_partitioned
+        """
+    )
+    # Вместе с родительской таблицей удаляются все присоединённые партиции
+    op.drop_table('transactions_partitioned')
+    op.execute("DROP FUNCTION IF EXISTS create_transactions_partitions(date, date)")
+    for name, columns in TRANSACTION_INDEXES:
+        op.create_index(name, 'transactions', columns, unique=False)
+    op.execute(CREATE_CHANGE_COUNTER_TRIGGER)
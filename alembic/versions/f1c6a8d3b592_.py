@@ -0,0 +1,36 @@
+"""amount sketches in daily rollups
+
+Revision ID: f1c6a8d3b592
+Revises: e5b2c9d4f718
+Create Date: 2026-10-18 20:12:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6a8d3b592'
+down_revision: Union[str, Sequence[str], None] = 'e5b2c9d4f718'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('daily_transaction_rollups', sa.Column('sketch_buckets', postgresql.ARRAY(sa.Integer()), server_default='{}', nullable=False))
+    op.add_column('daily_transaction_rollups', sa.Column('sketch_counts', postgresql.ARRAY(sa.BigInteger()), server_default='{}', nullable=False))
+    # Сброс отметки: следующий пересчёт пересоберёт роллапы вместе со скетчами
+    op.execute(
+        "UPDATE rollup_refresh_state SET watermark = NULL "
+        "WHERE name = 'daily_transaction_rollups'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('daily_transaction_rollups', 'sketch_counts')
+    op.drop_column('daily_transaction_rollups', 'sketch_buckets')
@@ -0,0 +1,106 @@
+"""move default partition rows into new monthly partitions
+
+Revision ID: f6d1b3e8a5c7
+Revises: c4a8f2d6e913
+Create Date: 2026-10-19 12:27:05.814233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6d1b3e8a5c7'
+down_revision: Union[str, Sequence[str], None] = 'c4a8f2d6e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Если в transactions_default уже есть строки месяца, CREATE TABLE ... PARTITION OF
+# падает. Такие строки переносятся в отдельную таблицу, и она присоединяется партицией
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_transactions_partitions(start_month date, end_month date)
+RETURNS integer AS $$
+DECLARE
+    month date := date_trunc('month', start_month)::date;
+    next_month date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    -- Несколько воркеров приложения могут вызвать функцию одновременно
+    PERFORM pg_advisory_xact_lock(hashtext('create_transactions_partitions'));
+    WHILE month <= end_month LOOP
+        next_month := (month + interval '1 month')::date;
+        partition_name := format('transactions_y%sm%s', to_char(month, 'YYYY'), to_char(month, 'MM'));
+        -- Отсоединённые партиции остаются таблицами и повторно не создаются
+        IF to_regclass(partition_name) IS NULL THEN
+            -- Новая партиция всё равно блокирует default целиком; блокировка до проверки
+            -- не даёт вставить строки месяца между проверкой и созданием
+            LOCK TABLE transactions_default IN EXCLUSIVE MODE;
+            IF EXISTS (
+                SELECT 1 FROM transactions_default
+                WHERE date_pay >= month AND date_pay < next_month
+            ) THEN
+                EXECUTE format('CREATE TABLE %I (LIKE transactions INCLUDING DEFAULTS)', partition_name);
+                EXECUTE format(
+                    'WITH moved AS ('
+                    '    DELETE FROM transactions_default WHERE date_pay >= %L AND date_pay < %L RETURNING *'
+                    ') INSERT INTO %I SELECT * FROM moved',
+                    month, next_month, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE transactions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month, next_month
+                );
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month, next_month
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month := next_month;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_transactions_partitions(start_month date, end_month date)
+RETURNS integer AS $$
+DECLARE
+    month date := date_trunc('month', start_month)::date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    -- Несколько воркеров приложения могут вызвать функцию одновременно
+    PERFORM pg_advisory_xact_lock(hashtext('create_transactions_partitions'));
+    WHILE month <= end_month LOOP
+        partition_name := format('transactions_y%sm%s', to_char(month, 'YYYY'), to_char(month, 'MM'));
+        -- Отсоединённые партиции остаются таблицами и повторно не создаются
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month, (month + interval '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(PREVIOUS_PARTITIONS_FUNCTION)
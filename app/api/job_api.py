@@ -0,0 +1,88 @@
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, Form, HTTPException
+
+from app.core.job_queue import Job, JobQueueFullError
+from app.core.responses import FastJSONResponse
+from app.enums.enum_job import JobStatusEnum
+from app.schemas.job_schema import JobInfo, JobQueueStats
+from app.schemas.report_schema import TransactionFilter, CountryStatsFilter
+from app.services.report_job_service import (
+    report_jobs,
+    submit_report_job,
+    submit_country_report_job,
+)
+
+router = APIRouter(
+    prefix="/reports/jobs",
+    tags=["Report jobs"],
+    default_response_class=FastJSONResponse,
+)
+
+
+def get_job_or_404(job_id: str) -> Job:
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404, detail=f"Задача {job_id} не найдена или её результат истёк"
+        )
+    return job
+
+
+@router.post("/report", status_code=202, response_model=JobInfo)
+async def create_report_job(trans_filter: TransactionFilter = Depends()):
+    """
+    Ставит отчёт /reports/report в очередь и сразу возвращает id задачи.
+    Query-параметры те же, что у /reports/report.
+    Статус — GET /reports/jobs/{job_id}, результат — GET /reports/jobs/{job_id}/result.
+    """
+    try:
+        return submit_report_job(trans_filter)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+@router.post("/by-country", status_code=202, response_model=JobInfo)
+async def create_country_report_job(
+    dataset_id: Annotated[int, Form()],
+    sort_by: Annotated[Literal["count", "total", "avg"], Form()] = "count",
+    top_n: Annotated[int | None, Form()] = None,
+    include_distinct_users: Annotated[bool, Form()] = False,
+):
+    """
+    Ставит отчёт по странам в очередь. Работает с сохранённым набором
+    стран (dataset_id из /reports/country-datasets).
+    """
+    filters = CountryStatsFilter(
+        sort_by=sort_by, top_n=top_n, include_distinct_users=include_distinct_users
+    )
+    try:
+        return submit_country_report_job(dataset_id, filters)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+@router.get("/stats", status_code=200, response_model=JobQueueStats)
+async def get_job_queue_stats():
+    """Воркеры, задачи в очереди и в работе, число хранимых результатов"""
+    return report_jobs.get_stats()
+
+
+@router.get("/{job_id}", status_code=200, response_model=JobInfo)
+async def get_job(job_id: str):
+    return get_job_or_404(job_id).info()
+
+
+@router.get("/{job_id}/result", status_code=200)
+async def get_job_result(job_id: str):
+    """Результат завершённой задачи, 409 — если задача ещё не готова или упала"""
+    job = get_job_or_404(job_id)
+    if job.status == JobStatusEnum.FAILED:
+        raise HTTPException(
+            status_code=409, detail=f"Задача завершилась с ошибкой: {job.error}"
+        )
+    if job.status != JobStatusEnum.DONE:
+        raise HTTPException(
+            status_code=409, detail=f"Задача ещё не готова: {job.status.value}"
+        )
+    return FastJSONResponse(job.result)
@@ -0,0 +1,80 @@
+from typing import List
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.db_connector import engine, replica_router
+from app.core.request_metrics import route_metrics, render_histogram
+from app.services.report_service import report_cache, report_flight
+
+router = APIRouter(tags=["System"])
+
+
+def render_gauges(prefix: str, values: dict) -> List[str]:
+    lines = []
+    for name, value in values.items():
+        lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {value:g}"]
+    return lines
+
+
+def render_counters(prefix: str, values: dict) -> List[str]:
+    """Монотонные счётчики: тип counter и суффикс _total, как требует Prometheus"""
+    lines = []
+    for name, value in values.items():
+        metric = f"{prefix}_{name.removesuffix('_total')}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value:g}"]
+    return lines
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Метрики в текстовом формате Prometheus: гистограммы времени ответа
+    и счётчики SQL/фаз по маршрутам, состояние пула соединений, реплики,
+    кэша отчётов и объединения одинаковых запросов.
+    """
+    lines = route_metrics.render()
+    pool = engine.pool.get_stats()
+    pool_counters = {"checkouts_total", "timeouts_total"}
+    lines += render_gauges(
+        "db_pool",
+        pool.model_dump(exclude={"wait_seconds", *pool_counters}),
+    )
+    lines += render_counters("db_pool", pool.model_dump(include=pool_counters))
+    lines += ["# TYPE db_pool_wait_seconds histogram"]
+    lines += render_histogram("db_pool_wait_seconds", engine.pool.wait_histogram)
+    replica = replica_router.get_stats()
+    if replica.configured:
+        lines += render_gauges(
+            "db_replica",
+            {
+                "healthy": int(replica.healthy),
+                "lag_seconds": replica.lag_seconds or 0,
+            },
+        )
+        lines += render_counters(
+            "db_replica",
+            replica.model_dump(
+                include={
+                    "replica_reads_total",
+                    "primary_reads_total",
+                    "fallbacks_total",
+                }
+            ),
+        )
+    cache = report_cache.get_stats()
+    lines += render_gauges(
+        "report_cache", cache.model_dump(include={"size", "hit_ratio"})
+    )
+    lines += render_counters(
+        "report_cache", cache.model_dump(include={"hits", "misses", "stale"})
+    )
+    coalescing = report_flight.get_stats()
+    lines += render_gauges(
+        "report_coalescing", coalescing.model_dump(include={"in_flight"})
+    )
+    lines += render_counters(
+        "report_coalescing",
+        coalescing.model_dump(include={"executions", "coalesced", "errors"}),
+    )
+    return PlainTextResponse("\n".join(lines) + "\n")
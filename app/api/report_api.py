@@ -1,20 +1,88 @@
-from typing import Annotated, Literal, List
+from typing import Annotated, Literal, List, Optional, Sequence
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    UploadFile,
+    File,
+    Form,
+    Query,
+    Header,
+)
+from fastapi.responses import StreamingResponse, Response
 
-from app.schemas.report_schema import TransactionFilter, CountryStatsFilter, CountryStat
-from app.services.report_service import ReportServices, report_services
+from app.core.executor import ExecutorBusyError
+from app.core.request_metrics import request_phase
+from app.core.responses import FastJSONResponse
+from app.enums.enum_export import ExportFormatEnum, ReportFormatEnum
+from app.schemas.report_schema import (
+    TransactionFilter,
+    CountryStatsFilter,
+    CountryStat,
+    CacheStats,
+    SingleFlightStats,
+    SamplingParams,
+    BatchReportRequest,
+    BatchReportResponse,
+    CountryDatasetInfo,
+)
+from app.services.country_dataset_service import (
+    CountryDatasetServices,
+    country_dataset_services,
+)
+from app.services.export_service import EXPORT_MEDIA_TYPES, stream_transactions_export
+from app.services.report_service import (
+    ReportServices,
+    report_services,
+    report_read_services,
+    report_cache,
+    report_flight,
+)
+from app.services.utils.utils_arrow import arrow_available, report_to_arrow_ipc
+from app.services.utils.utils_pandas_frame import CSV_EXTENSIONS
 
 router = APIRouter(
     prefix="/reports",
     tags=["Report"],
+    default_response_class=FastJSONResponse,
 )
 
 
+def negotiate_report_format(
+    accept: Optional[str], supported: Sequence[ReportFormatEnum]
+) -> Optional[ReportFormatEnum]:
+    """Подходящий формат из Accept с учётом q, None — если ни один не подошёл"""
+    if not accept:
+        return ReportFormatEnum.JSON
+    candidates = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media_type.lower()))
+    for _, _, media_type in sorted(candidates):
+        if media_type in ("*/*", "application/*"):
+            return ReportFormatEnum.JSON
+        for report_format in supported:
+            if media_type == report_format.value:
+                return report_format
+    return None
+
+
 @router.get("/report", status_code=200)
 async def register_user(
-    report_serv: Annotated[ReportServices, Depends(report_services)],
+    report_serv: Annotated[ReportServices, Depends(report_read_services)],
     trans_filter: TransactionFilter = Depends(),
+    sampling: SamplingParams = Depends(),
+    accept: Annotated[Optional[str], Header(include_in_schema=False)] = None,
 ):
     """
     Получение аналитики по транзакциям.
@@ -28,28 +96,134 @@ async def register_user(
         include_avg (bool): Включить среднюю сумму. По умолчанию False.
         include_min (bool): Включить минимальную сумму. По умолчанию False.
         include_max (bool): Включить максимальную сумму. По умолчанию False.
+        include_median (bool): Включить медиану суммы. По умолчанию False.
+        include_percentiles (bool): Включить квантили p25, p75, p90, p95, p99. По умолчанию False.
+        include_distinct_users (bool): Оценка числа различных пользователей (HyperLogLog)
+            за период и, при include_daily_shift, по дням. По умолчанию False.
         include_daily_shift (bool): Включить данные по дням с % изменением. По умолчанию False.
+        approximate (bool): Оценка по выборке TABLESAMPLE с доверительными интервалами
+            (ApproximateReportResponse, только JSON, без daily_shifts). По умолчанию False.
+        sample_pct (float, optional): Процент выборки (0, 100]. По умолчанию подбирается
+            под APPROX_SAMPLE_ROWS строк.
+        sample_method (str): 'system' (страницами, быстрее) или 'bernoulli' (строками).
+        max_staleness (float, optional): Допустимое отставание реплики в секундах,
+            если задан REPLICA_DATABASE_URL. Реплика недоступна или отстаёт больше —
+            отчёт строится по основной БД; 0 — всегда по основной.
+            По умолчанию REPLICA_MAX_STALENESS_SEC.
+    Заголовок Accept:
+        application/json — daily_shifts списком объектов (по умолчанию);
+        application/vnd.report.columns+json — daily_shifts параллельными массивами;
+        application/vnd.apache.arrow.stream — дневная серия в Arrow IPC, итоги в метаданных схемы.
     Returns:
         ReportResponse: Агрегированная статистика по транзакциям.
     """
-    return await report_serv.get_all_report_by_filter(trans_filter)
+    if sampling.approximate:
+        try:
+            with request_phase("service"):
+                report = await report_serv.get_approximate_report(
+                    trans_filter, sampling
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(report)
+    supported = [ReportFormatEnum.JSON, ReportFormatEnum.COLUMNAR_JSON]
+    if arrow_available():
+        supported.append(ReportFormatEnum.ARROW)
+    report_format = negotiate_report_format(accept, supported)
+    if report_format is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Поддерживаются форматы: {', '.join(f.value for f in supported)}",
+        )
+    columnar = report_format != ReportFormatEnum.JSON
+    with request_phase("service"):
+        report = await report_serv.get_all_report_by_filter(
+            trans_filter, columnar=columnar
+        )
+    if report_format == ReportFormatEnum.ARROW:
+        return Response(report_to_arrow_ipc(report), media_type=report_format.value)
+    # Ответ отдаётся готовым: FastAPI не валидирует и не перекодирует модель повторно
+    return FastJSONResponse(report, media_type=report_format.value)
+
+
+@router.post("/batch", status_code=200, response_model=BatchReportResponse)
+async def get_batch_report(
+    report_serv: Annotated[ReportServices, Depends(report_read_services)],
+    batch: BatchReportRequest,
+):
+    """
+    Несколько отчётов /reports/report за один запрос.
+    Тело: {"filters": [TransactionFilter, ...]} — до 50 фильтров с теми же полями,
+    что у query-параметров /reports/report. Отчёты возвращаются в порядке фильтров.
+    Одинаковые фильтры считаются один раз; фильтры только с итогами считаются
+    одним SQL-запросом, остальные — параллельно на отдельных соединениях.
+    Query-параметр max_staleness — как у /reports/report, все отчёты пакета
+    строятся на одной и той же БД.
+    """
+    with request_phase("service"):
+        reports = await report_serv.get_batch_report(batch.filters)
+    return FastJSONResponse(BatchReportResponse(reports=reports))
+
+
+def validate_csv_filename(filename: Optional[str]) -> None:
+    if not filename or not filename.endswith(CSV_EXTENSIONS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Разрешены только файлы {', '.join(CSV_EXTENSIONS)}",
+        )
+
+
+@router.post("/country-datasets", status_code=200, response_model=CountryDatasetInfo)
+async def upload_country_dataset(
+    dataset_serv: Annotated[CountryDatasetServices, Depends(country_dataset_services)],
+    countries_file: Annotated[
+        UploadFile,
+        File(
+            description="CSV файл с данными о странах (должен содержать колонки: user_id, country)"
+        ),
+    ],
+):
+    """
+    Сохраняет соответствие пользователь → страна как версию набора
+    и возвращает её id для /report/by-country.
+    Тот же файл (по sha256 содержимого) повторно не загружается: возвращается
+    существующий набор с created=false.
+    """
+    validate_csv_filename(countries_file.filename)
+    try:
+        with request_phase("service"):
+            dataset = await dataset_serv.upload_dataset(
+                countries_file=countries_file.file, filename=countries_file.filename
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return FastJSONResponse(dataset)
 
 
 @router.post("/report/by-country", status_code=200, response_model=List[CountryStat])
 async def get_country_stats(
     report_serv: Annotated["ReportServices", Depends(report_services)],
     countries_file: Annotated[
-        UploadFile,
+        Optional[UploadFile],
         File(
             description="CSV файл с данными о странах (должен содержать колонки: user_id, country)"
         ),
-    ],
+    ] = None,
+    dataset_id: Annotated[int | None, Form()] = None,
     sort_by: Annotated[Literal["count", "total", "avg"], Form()] = "count",
     top_n: Annotated[int | None, Form()] = None,
+    include_distinct_users: Annotated[bool, Form()] = False,
 ):
     """
     Получение статистики по странам.
     Загружает файл с данными о странах пользователей и объединяет с транзакциями из БД.
+    Поддерживаются несжатые .csv, а также .csv.gz и .csv.zst.
+    Вместо файла можно передать dataset_id набора, сохранённого через
+    /country-datasets: тогда CSV не передаётся и не разбирается.
+    include_distinct_users=true добавляет оценку числа различных плательщиков
+    по стране (HyperLogLog, ошибка ~1.04/sqrt(2^HLL_PRECISION)).
     **Формат CSV файла:**
     ```
     user_id,country
@@ -58,16 +232,79 @@ async def get_country_stats(
     3,Germany
     ```
     """
+    if (countries_file is None) == (dataset_id is None):
+        raise HTTPException(
+            status_code=400,
+            detail="Нужно передать либо countries_file, либо dataset_id",
+        )
+    # Создание фильтра
+    filters = CountryStatsFilter(
+        sort_by=sort_by, top_n=top_n, include_distinct_users=include_distinct_users
+    )
+    if dataset_id is not None:
+        try:
+            with request_phase("service"):
+                stats = await report_serv.get_report_country_by_dataset(
+                    dataset_id=dataset_id, filters=filters
+                )
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        return FastJSONResponse(stats)
+
     # Валидация типа файла
-    if not countries_file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Только CSV файлы разрешены")
-    # Чтение файла
+    validate_csv_filename(countries_file.filename)
+    # Вызов сервиса: файл читается пачками прямо из временного файла загрузки
     try:
-        content = await countries_file.read()
-        file_str = content.decode("utf-8")
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Ошибка чтения файла: {str(e)}")
-    # Создание фильтра
-    filters = CountryStatsFilter(sort_by=sort_by, top_n=top_n)
-    # Вызов сервиса
-    return await report_serv.get_report_country(countries_csv=file_str, filters=filters)
+        with request_phase("service"):
+            stats = await report_serv.get_report_country(
+                countries_file=countries_file.file,
+                filename=countries_file.filename,
+                filters=filters,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    # response_model остаётся для документации, данные уже собраны сервисом
+    return FastJSONResponse(stats)
+
+
+@router.get("/export", status_code=200)
+async def export_transactions(
+    trans_filter: TransactionFilter = Depends(),
+    export_format: Annotated[ExportFormatEnum, Query(alias="format")] = (
+        ExportFormatEnum.CSV
+    ),
+):
+    """
+    Потоковая выгрузка сырых транзакций по тем же фильтрам, что и /report.
+    Данные идут из PostgreSQL COPY ... TO STDOUT напрямую в ответ,
+    без ORM-объектов и без накопления результата в памяти.
+    Query-параметры:
+        format (str): 'csv' (с заголовком) или 'ndjson'. По умолчанию 'csv'.
+    """
+    filename = f"transactions.{export_format.value}"
+    return StreamingResponse(
+        stream_transactions_export(trans_filter, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/cache/stats", status_code=200, response_model=CacheStats)
+async def get_cache_stats():
+    """
+    Статистика кэша отчётов /reports/report: попадания, промахи,
+    устаревшие по watermark записи и текущий размер.
+    """
+    return report_cache.get_stats()
+
+
+@router.get("/coalescing/stats", status_code=200, response_model=SingleFlightStats)
+async def get_coalescing_stats():
+    """
+    Объединение одинаковых одновременных запросов /reports/report:
+    выполнений в БД, присоединившихся к уже идущему запросу,
+    выполнений с ошибкой и выполняющихся сейчас.
+    """
+    return report_flight.get_stats()
@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+
+from app.core.db_connector import engine, replica_router
+from app.schemas.system_schema import PoolStats, ReplicaStats
+
+router = APIRouter(
+    prefix="/system",
+    tags=["System"],
+)
+
+
+@router.get("/pool", status_code=200, response_model=PoolStats)
+async def get_pool_stats():
+    """
+    Текущее состояние пула соединений с БД:
+    занятые и свободные соединения, ожидающие запросы
+    и гистограмма времени получения соединения.
+    """
+    return engine.pool.get_stats()
+
+
+@router.get("/replica", status_code=200, response_model=ReplicaStats)
+async def get_replica_stats():
+    """
+    Реплика для отчётов: настроена ли, доступна ли и насколько отставала
+    при последней проверке, сколько чтений ушло на неё и на основную БД
+    (из них из-за недоступности или отставания реплики), состояние её пула.
+    """
+    return replica_router.get_stats()
@@ -1,21 +1,54 @@
+import asyncio
+import contextlib
 from contextlib import asynccontextmanager
 
 import uvicorn
 from app.api.report_api import router
+from app.api.system_api import router as system_router
+from app.api.metrics_api import router as metrics_router
+from app.api.job_api import router as job_router
 from fastapi import FastAPI
 
-from app.initial_sample_data import initialize_sample_data
+from app.core.executor import cpu_executor
+from app.core.request_metrics import RequestMetricsMiddleware
+from app.core.settings import settings
+from app.services.report_job_service import report_jobs
+from app.services.partition_service import maintain_partitions_periodically
+from app.services.rollup_service import refresh_daily_rollups_periodically
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await initialize_sample_data()
+    tasks = [
+        asyncio.create_task(
+            maintain_partitions_periodically(
+                settings.PARTITION_MAINTENANCE_INTERVAL_SEC
+            )
+        )
+    ]
+    if settings.USE_DAILY_ROLLUPS:
+        tasks.append(
+            asyncio.create_task(
+                refresh_daily_rollups_periodically(settings.ROLLUP_REFRESH_INTERVAL_SEC)
+            )
+        )
+    report_jobs.start()
     yield
+    await report_jobs.stop()
+    cpu_executor.shutdown()
+    for task in tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
 
 
 def create_app() -> FastAPI:
     app = FastAPI(lifespan=lifespan, title="Test", version="0.1.0")
     app.include_router(router, prefix="/api/v1")
+    app.include_router(job_router, prefix="/api/v1")
+    app.include_router(system_router, prefix="/api/v1")
+    app.include_router(metrics_router)
+    app.add_middleware(RequestMetricsMiddleware)
     return app
 
 
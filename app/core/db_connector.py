@@ -1,16 +1,241 @@
-import os
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+import asyncio
+import threading
+import time
+from typing import Annotated, Optional
 
+from fastapi import Depends, Query
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import (
+    async_sessionmaker,
+    create_async_engine,
+    AsyncSession,
+    AsyncEngine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.metrics import Histogram
+from app.core.request_metrics import install_sql_hooks
 from app.core.settings import settings
+from app.schemas.system_schema import PoolStats, ReplicaStats
 
-SessionLocal = async_sessionmaker(
-    bind=create_async_engine(
-        settings.DATABASE_URL,
+# Границы корзин времени ожидания соединения, секунды
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который считает ожидающих соединения
+    и строит гистограмму времени получения соединения.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_histogram = Histogram(POOL_WAIT_BUCKETS)
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self._stats_lock = threading.Lock()
+
+    def connect(self):
+        with self._stats_lock:
+            self.waiting += 1
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.waiting -= 1
+            self.wait_histogram.observe(time.perf_counter() - started)
+        with self._stats_lock:
+            self.checkouts += 1
+        return connection
+
+    def get_stats(self) -> PoolStats:
+        return PoolStats(
+            pool_size=self.size(),
+            max_overflow=self._max_overflow,
+            checked_out=self.checkedout(),
+            checked_in=self.checkedin(),
+            overflow=max(self.overflow(), 0),
+            waiting=self.waiting,
+            checkouts_total=self.checkouts,
+            timeouts_total=self.timeouts,
+            wait_seconds=self.wait_histogram.snapshot(),
+        )
+
+
+def create_engine_from_settings(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
         echo=False,
-    ),
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE
+        },
+    )
+
+
+engine = create_engine_from_settings(settings.DATABASE_URL)
+install_sql_hooks(engine)
+
+SessionLocal = async_sessionmaker(
+    bind=engine,
     expire_on_commit=False,
 )
 
+replica_engine: Optional[AsyncEngine] = None
+ReplicaSessionLocal: Optional[async_sessionmaker] = None
+if settings.REPLICA_DATABASE_URL:
+    replica_engine = create_engine_from_settings(settings.REPLICA_DATABASE_URL)
+    install_sql_hooks(replica_engine)
+    ReplicaSessionLocal = async_sessionmaker(
+        bind=replica_engine,
+        expire_on_commit=False,
+    )
+
+# Отставание реплики в секундах. Если всё полученное WAL уже применено и приём
+# идёт, реплика не отстаёт, даже когда последняя транзакция на основной была давно.
+# Без приёма WAL (основная недоступна, соединение оборвалось) совпадение позиций
+# ничего не значит: отставание — возраст последней применённой транзакции.
+# Без прав pg_read_all_stats статус приёма не виден, тогда достаточно самой строки
+# процесса приёма. NULL — отставание неизвестно
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+            AND EXISTS (
+                SELECT 1 FROM pg_stat_wal_receiver
+                WHERE COALESCE(status, 'streaming') = 'streaming'
+            ) THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """)
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Ошибка связи с сервером, а не ошибка самого запроса"""
+    if isinstance(error, (OSError, InterfaceError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class ReplicaRouter:
+    """
+    Выбор БД для чтения: реплика, если она настроена, отвечает и отстаёт
+    не больше допустимого, иначе основная.
+
+    Доступность и отставание проверяются не чаще раза в check_interval секунд,
+    одновременные запросы ждут одну проверку. Между проверками отставание могло
+    вырасти не больше чем на прошедшее время: если с ним предел запроса уже
+    превышен, а по последнему замеру нет — реплика перепроверяется сразу.
+    """
+
+    def __init__(
+        self,
+        primary: async_sessionmaker,
+        replica: Optional[async_sessionmaker] = None,
+        check_interval: float = settings.REPLICA_HEALTH_CHECK_INTERVAL_SEC,
+        check_timeout: float = settings.REPLICA_HEALTH_CHECK_TIMEOUT_SEC,
+    ):
+        self.primary = primary
+        self.replica = replica
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.fallbacks = 0
+        self._check_lock = asyncio.Lock()
+
+    async def _query_lag(self) -> float:
+        async with self.replica() as session:
+            lag = await session.scalar(REPLICA_LAG_QUERY)
+        # Неизвестное отставание не должно пропускать чтения на реплику
+        return float("inf") if lag is None else float(lag)
+
+    async def check(self) -> None:
+        try:
+            lag = await asyncio.wait_for(self._query_lag(), self.check_timeout)
+        except (asyncio.TimeoutError, SQLAlchemyError, OSError) as e:
+            self.mark_failed(e)
+            return
+        self.healthy = True
+        self.lag_seconds = lag
+        self.last_error = None
+        self.checked_at = time.monotonic()
+
+    def mark_failed(self, error: BaseException) -> None:
+        """Реплика недоступна: до следующей проверки чтения идут на основную"""
+        self.healthy = False
+        self.last_error = repr(error)
+        self.checked_at = time.monotonic()
+
+    def _checked_ago(self) -> Optional[float]:
+        if self.checked_at is None:
+            return None
+        return time.monotonic() - self.checked_at
+
+    async def _refresh(self, max_age: float) -> None:
+        checked_ago = self._checked_ago()
+        if checked_ago is not None and checked_ago < max_age:
+            return
+        async with self._check_lock:
+            # Пока ждали блокировку, проверку мог выполнить другой запрос
+            checked_ago = self._checked_ago()
+            if checked_ago is None or checked_ago >= max_age:
+                await self.check()
+
+    async def choose(self, max_staleness: Optional[float] = None) -> async_sessionmaker:
+        """Фабрика сессий для чтения с отставанием не больше max_staleness секунд"""
+        if max_staleness is None:
+            max_staleness = settings.REPLICA_MAX_STALENESS_SEC
+        if self.replica is None or max_staleness <= 0:
+            self.primary_reads += 1
+            return self.primary
+        await self._refresh(self.check_interval)
+        if self.healthy and self.lag_seconds <= max_staleness:
+            if self.lag_seconds + self._checked_ago() > max_staleness:
+                await self._refresh(max_staleness - self.lag_seconds)
+        if self.healthy and self.lag_seconds + self._checked_ago() <= max_staleness:
+            self.replica_reads += 1
+            return self.replica
+        self.fallbacks += 1
+        self.primary_reads += 1
+        return self.primary
+
+    def get_stats(self) -> ReplicaStats:
+        pool = None
+        if self.replica is not None:
+            pool = self.replica.kw["bind"].pool.get_stats()
+        return ReplicaStats(
+            configured=self.replica is not None,
+            healthy=self.healthy,
+            lag_seconds=self.lag_seconds,
+            checked_ago_seconds=self._checked_ago(),
+            last_error=self.last_error,
+            replica_reads_total=self.replica_reads,
+            primary_reads_total=self.primary_reads,
+            fallbacks_total=self.fallbacks,
+            pool=pool,
+        )
+
+
+replica_router = ReplicaRouter(SessionLocal, ReplicaSessionLocal)
+
 
 async def get_db():
     async with SessionLocal() as session:
@@ -21,3 +246,32 @@ async def get_db():
             raise
         finally:
             await session.close()
+
+
+async def read_session_factory(
+    max_staleness: Annotated[
+        Optional[float],
+        Query(
+            ge=0,
+            description="Допустимое отставание реплики, секунды "
+            "(0 — читать с основной БД). По умолчанию REPLICA_MAX_STALENESS_SEC",
+        ),
+    ] = None,
+) -> async_sessionmaker:
+    return await replica_router.choose(max_staleness)
+
+
+async def get_read_db(
+    session_factory: async_sessionmaker = Depends(read_session_factory),
+):
+    """Сессия только для чтения: на реплике или, если она не подходит, на основной"""
+    async with session_factory() as session:
+        try:
+            yield session
+        except Exception as e:
+            if session_factory is not replica_router.primary and is_connection_error(e):
+                replica_router.mark_failed(e)
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
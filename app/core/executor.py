@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+from app.core.settings import settings
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class ExecutorBusyError(Exception):
+    """Все слоты пула заняты, запрос нужно повторить позже"""
+
+
+class BoundedExecutor:
+    """
+    Пул потоков для CPU-нагруженной работы (pandas, хэширование) вне event loop.
+    Глубина очереди ограничена max_pending: сверх неё задачи не копятся,
+    а сразу отклоняются ExecutorBusyError.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="cpu-worker"
+            )
+        return self._executor
+
+    def _reserve(self) -> None:
+        if self.pending >= self.max_pending:
+            raise ExecutorBusyError(
+                f"Сервер занят обработкой {self.pending} файлов, повторите позже"
+            )
+        self.pending += 1
+
+    def _release(self) -> None:
+        self.pending -= 1
+
+    async def _submit(self, func: Callable[..., T], *args) -> T:
+        # Контекст копируется, чтобы метрики запроса видели время в потоке
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(context.run, func, *args)
+        )
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        self._reserve()
+        try:
+            return await self._submit(func, *args)
+        finally:
+            self._release()
+
+    async def iterate(self, items: Iterable[T]) -> AsyncIterator[T]:
+        """
+        Продвигает синхронный итератор в пуле. Слот занят на всё время
+        итерации, чтобы уже начатая загрузка не упала посередине.
+        """
+        self._reserve()
+        try:
+            iterator = iter(items)
+            while (item := await self._submit(next, iterator, _DONE)) is not _DONE:
+                yield item
+        finally:
+            self._release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+cpu_executor = BoundedExecutor(
+    max_workers=settings.CPU_EXECUTOR_WORKERS,
+    max_pending=settings.CPU_EXECUTOR_MAX_PENDING,
+)
@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.enums.enum_job import JobKindEnum, JobStatusEnum
+from app.schemas.job_schema import JobInfo, JobQueueStats
+
+
+class JobQueueFullError(Exception):
+    """Очередь задач заполнена, новую задачу нужно отправить позже"""
+
+
+@dataclass
+class Job:
+    kind: JobKindEnum
+    runner: Callable[[], Awaitable[Any]]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: JobStatusEnum = JobStatusEnum.QUEUED
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Момент (monotonic), после которого завершённая задача удаляется
+    expires_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    def info(self) -> JobInfo:
+        return JobInfo(
+            id=self.id,
+            kind=self.kind,
+            status=self.status,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            error=self.error,
+        )
+
+
+class JobQueue:
+    """
+    Очередь тяжёлых задач с фиксированным числом asyncio-воркеров.
+    Одновременно выполняется не больше workers задач, поэтому они занимают
+    не больше workers соединений пула. Результаты хранятся result_ttl_sec
+    секунд после завершения.
+    """
+
+    def __init__(self, workers: int, max_queued: int, result_ttl_sec: float):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl_sec = result_ttl_sec
+        self._queue: "asyncio.Queue[Job]" = asyncio.Queue(maxsize=max_queued)
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.log = logging.getLogger(__name__)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    def submit(
+        self, kind: JobKindEnum, runner: Callable[[], Awaitable[Any]]
+    ) -> JobInfo:
+        self.purge_expired()
+        job = Job(kind=kind, runner=runner)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(
+                f"В очереди уже {self.max_queued} задач, повторите позже"
+            )
+        self._jobs[job.id] = job
+        return job.info()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.purge_expired()
+        return self._jobs.get(job_id)
+
+    def purge_expired(self) -> None:
+        now = time.monotonic()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.expires_at is not None and job.expires_at <= now
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    def get_stats(self) -> JobQueueStats:
+        running = sum(
+            job.status == JobStatusEnum.RUNNING for job in self._jobs.values()
+        )
+        return JobQueueStats(
+            workers=len(self._tasks),
+            queued=self._queue.qsize(),
+            running=running,
+            stored=len(self._jobs),
+            max_queued=self.max_queued,
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = JobStatusEnum.RUNNING
+        job.started_at = datetime.now()
+        try:
+            job.result = await job.runner()
+            job.status = JobStatusEnum.DONE
+        except asyncio.CancelledError:
+            job.status = JobStatusEnum.FAILED
+            job.error = "Задача отменена при остановке приложения"
+            raise
+        except Exception as e:
+            self.log.error(f"❌ Ошибка задачи {job.kind.value} {job.id}: {e}")
+            job.status = JobStatusEnum.FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now()
+            job.expires_at = time.monotonic() + self.result_ttl_sec
+            # Замыкание держит фильтры и ссылки на сервисы, после выполнения не нужно
+            job.runner = None
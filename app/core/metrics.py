@@ -0,0 +1,43 @@
+import threading
+from bisect import bisect_left
+from typing import List, Sequence
+
+from pydantic import BaseModel
+
+
+class HistogramSnapshot(BaseModel):
+    buckets: List[float]
+    # Накопительные счётчики по границам buckets, последний элемент — +Inf
+    counts: List[int]
+    count: int
+    sum: float
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин, безопасна для потоков"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> HistogramSnapshot:
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self._count, self._sum
+        cumulative, running = [], 0
+        for bucket_count in counts:
+            running += bucket_count
+            cumulative.append(running)
+        return HistogramSnapshot(
+            buckets=self.buckets, counts=cumulative, count=count, sum=round(total, 6)
+        )
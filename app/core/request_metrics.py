@@ -0,0 +1,253 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.metrics import Histogram
+
+T = TypeVar("T")
+
+# Границы корзин времени обработки запроса, секунды
+REQUEST_DURATION_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+)
+
+
+@dataclass
+class RequestMetrics:
+    """Счётчики одного HTTP-запроса, заполняются хуками SQLAlchemy и сервисами"""
+
+    started: float = field(default_factory=time.perf_counter)
+    db_statements: int = 0
+    db_seconds: float = 0.0
+    db_rows: int = 0
+    phases: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+    service_finished: Optional[float] = None
+
+
+current_request_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "current_request_metrics", default=None
+)
+
+
+@contextmanager
+def request_phase(name: str) -> Iterator[None]:
+    """Добавляет время блока к фазе name текущего запроса"""
+    metrics = current_request_metrics.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            finished = time.perf_counter()
+            metrics.phases[name] += finished - started
+            if name == "service":
+                metrics.service_finished = finished
+
+
+def timed_iter(items: Iterable[T], phase: str) -> Iterator[T]:
+    """Итерирует items, относя время получения каждого элемента к фазе phase"""
+    iterator = iter(items)
+    while True:
+        with request_phase(phase):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время старта хранится в контексте выполнения: он свой у каждого выражения
+    # и не переживает его, даже если выражение завершилось ошибкой
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _record_statement(context, rowcount: int) -> None:
+    started = getattr(context, "_query_started", None)
+    metrics = current_request_metrics.get()
+    if started is None or metrics is None:
+        return
+    metrics.db_statements += 1
+    metrics.db_seconds += time.perf_counter() - started
+    # Для серверных курсоров число строк заранее неизвестно (-1)
+    if rowcount > 0:
+        metrics.db_rows += rowcount
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(context, cursor.rowcount)
+
+
+def _handle_error(exception_context) -> None:
+    # Упавшее выражение тоже занимало БД
+    _record_statement(exception_context.execution_context, 0)
+
+
+def install_sql_hooks(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+class RouteMetricsRegistry:
+    """Агрегаты по маршрутам для /metrics"""
+
+    def __init__(self, buckets: Iterable[float] = REQUEST_DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._durations: Dict[Tuple[str, str], Histogram] = {}
+        self._totals: Dict[Tuple[str, str, str], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(
+        self, method: str, route: str, duration: float, metrics: RequestMetrics
+    ) -> None:
+        key = (method, route)
+        with self._lock:
+            histogram = self._durations.get(key)
+            if histogram is None:
+                histogram = self._durations[key] = Histogram(self.buckets)
+            self._totals[(method, route, "db_statements")] += metrics.db_statements
+            self._totals[(method, route, "db_seconds")] += metrics.db_seconds
+            self._totals[(method, route, "db_rows")] += metrics.db_rows
+            for phase, seconds in metrics.phases.items():
+                self._totals[(method, route, f"phase:{phase}")] += seconds
+        histogram.observe(duration)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            durations = dict(self._durations)
+            totals = dict(self._totals)
+        lines = [
+            "# HELP http_request_duration_seconds Время обработки запроса",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(durations.items()):
+            labels = f'method="{method}",route="{route}"'
+            lines.extend(
+                render_histogram("http_request_duration_seconds", histogram, labels)
+            )
+
+        counters = {
+            "db_statements": ("http_db_statements_total", "SQL-выражений"),
+            "db_seconds": ("http_db_seconds_total", "Время в БД, секунды"),
+            "db_rows": ("http_db_rows_total", "Строк получено из БД"),
+        }
+        for key, (name, help_text) in counters.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (method, route, metric), value in sorted(totals.items()):
+                if metric == key:
+                    lines.append(
+                        f'{name}{{method="{method}",route="{route}"}} {value:g}'
+                    )
+        lines += [
+            "# HELP http_phase_seconds_total Время фаз обработки запроса",
+            "# TYPE http_phase_seconds_total counter",
+        ]
+        for (method, route, metric), value in sorted(totals.items()):
+            if metric.startswith("phase:"):
+                phase = metric.removeprefix("phase:")
+                lines.append(
+                    f'http_phase_seconds_total{{method="{method}",route="{route}",'
+                    f'phase="{phase}"}} {value:g}'
+                )
+        return lines
+
+
+def render_histogram(name: str, histogram: Histogram, labels: str = "") -> List[str]:
+    snapshot = histogram.snapshot()
+    prefix = f"{labels}," if labels else ""
+    bounds = [f"{bucket:g}" for bucket in snapshot.buckets] + ["+Inf"]
+    lines = [
+        f'{name}_bucket{{{prefix}le="{bound}"}} {count}'
+        for bound, count in zip(bounds, snapshot.counts)
+    ]
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {snapshot.sum:g}")
+    lines.append(f"{name}_count{suffix} {snapshot.count}")
+    return lines
+
+
+def format_server_timing(metrics: RequestMetrics, finished: float) -> str:
+    total = finished - metrics.started
+    parts = [
+        f"db;dur={metrics.db_seconds * 1000:.1f};"
+        f'desc="{metrics.db_statements} queries, {metrics.db_rows} rows"'
+    ]
+    for phase, seconds in metrics.phases.items():
+        parts.append(f"{phase};dur={seconds * 1000:.1f}")
+    # Всё после сервиса до отправки заголовков — валидация и сериализация ответа
+    if metrics.service_finished is not None:
+        parts.append(
+            f"serialize;dur={(finished - metrics.service_finished) * 1000:.1f}"
+        )
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def route_template(scope) -> str:
+    """Шаблон пути вместо фактического, чтобы не плодить метки по id"""
+    if "route" not in scope:
+        return "unmatched"
+    path = scope["path"]
+    for name, value in scope.get("path_params", {}).items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    return path
+
+
+route_metrics = RouteMetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI-мидлвара: заводит RequestMetrics на запрос, добавляет
+    заголовок Server-Timing и пишет агрегаты в route_metrics.
+    """
+
+    def __init__(self, app, registry: RouteMetricsRegistry = route_metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timing = format_server_timing(metrics, time.perf_counter())
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request_metrics.reset(token)
+            self.registry.observe(
+                scope["method"],
+                route_template(scope),
+                time.perf_counter() - metrics.started,
+                metrics,
+            )
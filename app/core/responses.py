@@ -0,0 +1,40 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import PydanticSerializationError, to_jsonable_python
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # Модели уже провалидированы сервисом: один проход сериализатора pydantic
+    # вместо повторной валидации по response_model и jsonable_encoder.
+    # Даты и Decimal тоже идут через pydantic, чтобы json без orjson
+    # выдавал тот же результат
+    try:
+        return to_jsonable_python(obj)
+    except PydanticSerializationError:
+        raise TypeError(f"Объект типа {type(obj).__name__} не сериализуется в JSON")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON-ответ без повторной валидации и jsonable_encoder: эндпоинт возвращает
+    его напрямую, FastAPI не прогоняет содержимое через response_model.
+    Если orjson не установлен, используется стандартный json.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_default)
+        return json.dumps(
+            content,
+            default=_default,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
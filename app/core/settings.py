@@ -1,5 +1,6 @@
 from typing import Optional
 
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 
@@ -13,6 +14,68 @@ class Settings(BaseSettings):
 
     DATABASE_URL: Optional[str] = None
 
+    # Реплика только для чтения для отчётов (не задана — всё читается с основной БД)
+    REPLICA_DATABASE_URL: Optional[str] = None
+    # Как часто перепроверять доступность и отставание реплики
+    REPLICA_HEALTH_CHECK_INTERVAL_SEC: float = 5.0
+    REPLICA_HEALTH_CHECK_TIMEOUT_SEC: float = 2.0
+    # Допустимое отставание реплики, если запрос не задал max_staleness
+    REPLICA_MAX_STALENESS_SEC: float = 30.0
+
+    # Пул соединений
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    # Кэш подготовленных выражений asyncpg на соединение (0 — для pgbouncer)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Дневные роллапы транзакций
+    USE_DAILY_ROLLUPS: bool = True
+    ROLLUP_REFRESH_INTERVAL_SEC: int = 60
+
+    # Месячные партиции transactions
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_MAINTENANCE_INTERVAL_SEC: int = 3600
+    # Сколько DETACH ждёт блокировку transactions, пока её держат долгие запросы
+    PARTITION_DETACH_LOCK_TIMEOUT_SEC: float = 5.0
+
+    # Размер пачки строк при разборе загруженного CSV
+    CSV_CHUNK_SIZE: int = 100_000
+
+    # Пул потоков для разбора CSV и другой CPU-нагруженной работы
+    CPU_EXECUTOR_WORKERS: int = 4
+    CPU_EXECUTOR_MAX_PENDING: int = 16
+
+    # Сколько кусков COPY-выгрузки буферизуется до отправки клиенту
+    EXPORT_QUEUE_SIZE: int = 16
+
+    # Фоновые задачи отчётов: воркеры, размер очереди, время хранения результата
+    REPORT_JOB_WORKERS: int = 2
+    REPORT_JOB_MAX_QUEUED: int = 100
+    REPORT_JOB_RESULT_TTL_SEC: int = 3600
+
+    # Приближённый отчёт по TABLESAMPLE: ожидаемый размер выборки, когда
+    # sample_pct не задан, и уровень доверия интервалов
+    APPROX_SAMPLE_ROWS: int = 100_000
+    APPROX_CONFIDENCE: float = 0.95
+
+    # Точность HyperLogLog для distinct_users: 2^p регистров, ошибка ~1.04/sqrt(2^p)
+    # (12 — ~1.6%). Не выше точности регистров в роллапах (14)
+    HLL_PRECISION: int = Field(default=12, ge=4, le=14)
+
+    # /reports/batch: сколько отчётов с дневной серией строятся одновременно
+    # (каждый на своём соединении из пула)
+    BATCH_REPORT_CONCURRENCY: int = 4
+
+    # Кэш результатов /reports/report
+    REPORT_CACHE_ENABLED: bool = True
+    REPORT_CACHE_MAX_SIZE: int = 1024
+    REPORT_CACHE_TTL_SEC: int = 300
+    # Одинаковые одновременные запросы /reports/report выполняются одним запросом к БД
+    REPORT_COALESCE_ENABLED: bool = True
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if not self.DATABASE_URL:
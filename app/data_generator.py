@@ -0,0 +1,330 @@
+"""
+Генератор синтетических данных для нагрузочного тестирования.
+
+Пишет пользователей и транзакции в PostgreSQL через COPY из нескольких процессов.
+Результат детерминирован при фиксированном seed и не зависит от числа процессов:
+транзакции генерируются блоками, у каждого блока свой генератор случайных чисел.
+
+Пример:
+    uv run python -m app.data_generator --users 1000000 --tx-per-user 50 --workers 8 --seed 42
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import asyncpg
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field, model_validator
+
+from app.core.settings import settings
+from app.enums.enum_status import TypeStatusEnum
+from app.enums.enum_type_pay import TypePayEnum
+
+TRANSACTION_COLUMNS = ["date_pay", "sum_pay", "status", "type", "user_id"]
+USER_COLUMNS = ["id", "email", "hashed_password", "name"]
+
+# Метки потоков случайных чисел: без них поток перестановки пользователей
+# [seed, users] совпал бы с потоком блока [seed, block_index] при users == block_index
+USER_RANKS_STREAM = 0
+TRANSACTION_BLOCKS_STREAM = 1
+
+
+class DatasetConfig(BaseModel):
+    users: int = Field(default=100, ge=1)
+    tx_per_user: int = Field(default=100, ge=0, description="В среднем на пользователя")
+    workers: int = Field(default=1, ge=1)
+    seed: int = 0
+    zipf_a: float = Field(
+        default=0.0,
+        ge=0,
+        description="Перекос активности пользователей, 0 — равномерно",
+    )
+    days: int = Field(default=730, ge=1, description="Глубина истории в днях")
+    end_date: date = Field(default_factory=date.today)
+    seasonality: float = Field(
+        default=0.0, ge=0, le=1, description="Амплитуда годовой сезонности"
+    )
+    weekend_factor: float = Field(
+        default=1.0, gt=0, description="Во сколько раз активнее выходные дни"
+    )
+    successful_share: float = Field(default=0.5, ge=0, le=1)
+    payment_share: float = Field(default=0.5, ge=0, le=1)
+    min_amount: float = Field(default=1.0, gt=0)
+    max_amount: float = Field(default=1000.0, gt=0)
+    block_size: int = Field(default=200_000, ge=1)
+    first_user_id: int = 1
+
+    @model_validator(mode="after")
+    def validate_amounts(self):
+        """Проверяем, что минимальная сумма не больше максимальной"""
+        if self.min_amount > self.max_amount:
+            raise ValueError("min_amount не может быть больше max_amount")
+        return self
+
+    @property
+    def total_transactions(self) -> int:
+        return self.users * self.tx_per_user
+
+    @property
+    def block_count(self) -> int:
+        return -(-self.total_transactions // self.block_size)
+
+    @property
+    def start_date(self) -> date:
+        """Первый день истории: days дней, последний из них — end_date"""
+        return self.end_date - timedelta(days=self.days - 1)
+
+
+def get_asyncpg_dsn() -> str:
+    return settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+
+def user_rank_cdf(config: DatasetConfig) -> np.ndarray:
+    """Функция распределения по рангам пользователей (закон Ципфа)"""
+    ranks = np.arange(1, config.users + 1, dtype=np.float64)
+    weights = ranks**-config.zipf_a
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def day_cdf(config: DatasetConfig) -> np.ndarray:
+    """Функция распределения по дням истории с годовой и недельной сезонностью"""
+    days = pd.date_range(config.start_date, periods=config.days, freq="D")
+    weights = 1 + config.seasonality * np.sin(
+        2 * np.pi * (days.dayofyear.to_numpy() - 80) / 365.25
+    )
+    weights = weights * np.where(
+        days.dayofweek.to_numpy() >= 5, config.weekend_factor, 1
+    )
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def generate_transactions_block(
+    config: DatasetConfig,
+    block_index: int,
+    users_cdf: Optional[np.ndarray] = None,
+    days_cdf: Optional[np.ndarray] = None,
+    user_ids_by_rank: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    """Детерминированно генерирует блок транзакций с номером block_index"""
+    users_cdf = user_rank_cdf(config) if users_cdf is None else users_cdf
+    days_cdf = day_cdf(config) if days_cdf is None else days_cdf
+    if user_ids_by_rank is None:
+        user_ids_by_rank = get_user_ids_by_rank(config)
+    start_row = block_index * config.block_size
+    size = min(config.block_size, config.total_transactions - start_row)
+    rng = np.random.default_rng([config.seed, TRANSACTION_BLOCKS_STREAM, block_index])
+
+    ranks = np.searchsorted(users_cdf, rng.random(size), side="right")
+    day_offsets = np.searchsorted(days_cdf, rng.random(size), side="right")
+    seconds = rng.integers(0, 86400, size)
+    start = np.datetime64(config.start_date, "s")
+    date_pay = (
+        start
+        + day_offsets.astype("timedelta64[D]").astype("timedelta64[s]")
+        + seconds.astype("timedelta64[s]")
+    )
+    cents = rng.integers(
+        int(config.min_amount * 100), int(config.max_amount * 100) + 1, size
+    )
+    statuses = np.where(
+        rng.random(size) < config.successful_share,
+        TypeStatusEnum.SUCCESSFUL.name,
+        TypeStatusEnum.FAILED.name,
+    )
+    types = np.where(
+        rng.random(size) < config.payment_share,
+        TypePayEnum.PAYMENT.name,
+        TypePayEnum.INVOICE.name,
+    )
+    return pd.DataFrame(
+        {
+            "date_pay": date_pay,
+            "sum_pay": cents / 100,
+            "status": statuses,
+            "type": types,
+            "user_id": user_ids_by_rank[ranks],
+        },
+        columns=TRANSACTION_COLUMNS,
+    )
+
+
+def get_user_ids_by_rank(config: DatasetConfig) -> np.ndarray:
+    """Самые активные пользователи разбросаны по id, а не идут первыми"""
+    rng = np.random.default_rng([config.seed, USER_RANKS_STREAM, config.users])
+    return config.first_user_id + rng.permutation(config.users).astype(np.int64)
+
+
+def frame_to_csv(frame: pd.DataFrame) -> io.BytesIO:
+    buffer = io.BytesIO()
+    frame.to_csv(
+        buffer,
+        index=False,
+        header=False,
+        float_format="%.2f",
+        date_format="%Y-%m-%d %H:%M:%S",
+    )
+    buffer.seek(0)
+    return buffer
+
+
+async def copy_users(connection: asyncpg.Connection, config: DatasetConfig) -> None:
+    ids = np.arange(config.first_user_id, config.first_user_id + config.users)
+    frame = pd.DataFrame(
+        {
+            "id": ids,
+            "email": [f"user{i}@example.com" for i in ids],
+            "hashed_password": [f"hashed_password_{i}" for i in ids],
+            "name": [f"User {i}" for i in ids],
+        },
+        columns=USER_COLUMNS,
+    )
+    await connection.copy_to_table(
+        "users", source=frame_to_csv(frame), columns=USER_COLUMNS, format="csv"
+    )
+    await connection.execute(
+        "SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT max(id) FROM users))"
+    )
+
+
+async def copy_transaction_blocks(
+    dsn: str, config: DatasetConfig, block_indexes: List[int]
+) -> int:
+    users_cdf = user_rank_cdf(config)
+    days_cdf = day_cdf(config)
+    user_ids_by_rank = get_user_ids_by_rank(config)
+    connection = await asyncpg.connect(dsn)
+    copied = 0
+    try:
+        for block_index in block_indexes:
+            frame = generate_transactions_block(
+                config, block_index, users_cdf, days_cdf, user_ids_by_rank
+            )
+            await connection.copy_to_table(
+                "transactions",
+                source=frame_to_csv(frame),
+                columns=TRANSACTION_COLUMNS,
+                format="csv",
+            )
+            copied += len(frame)
+    finally:
+        await connection.close()
+    return copied
+
+
+def copy_transaction_blocks_in_process(
+    dsn: str, config: DatasetConfig, block_indexes: List[int]
+) -> int:
+    return asyncio.run(copy_transaction_blocks(dsn, config, block_indexes))
+
+
+async def generate_dataset(config: DatasetConfig, dsn: Optional[str] = None) -> int:
+    """Создаёт пользователей и транзакции, возвращает число транзакций"""
+    dsn = dsn or get_asyncpg_dsn()
+    started = time.perf_counter()
+    connection = await asyncpg.connect(dsn)
+    try:
+        max_user_id = await connection.fetchval(
+            "SELECT coalesce(max(id), 0) FROM users"
+        )
+        config = config.model_copy(update={"first_user_id": max_user_id + 1})
+        await copy_users(connection, config)
+        # Без месячных партиций строки осели бы в transactions_default
+        await connection.execute(
+            "SELECT create_transactions_partitions($1, $2)",
+            config.start_date,
+            config.end_date,
+        )
+    finally:
+        await connection.close()
+    logging.info(f"Создано {config.users} пользователей")
+
+    # Блоки раздаются процессам по кругу, содержимое блока от процесса не зависит
+    blocks = list(range(config.block_count))
+    workers = min(config.workers, len(blocks)) or 1
+    partitions = [blocks[i::workers] for i in range(workers)]
+    if workers == 1:
+        copied = await copy_transaction_blocks(dsn, config, partitions[0])
+    else:
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = await asyncio.gather(
+                *[
+                    loop.run_in_executor(
+                        pool, copy_transaction_blocks_in_process, dsn, config, part
+                    )
+                    for part in partitions
+                ]
+            )
+        copied = sum(results)
+
+    connection = await asyncpg.connect(dsn)
+    try:
+        await connection.execute("ANALYZE users")
+        await connection.execute("ANALYZE transactions")
+    finally:
+        await connection.close()
+    elapsed = time.perf_counter() - started
+    logging.info(
+        f"✅ Создано {copied} транзакций за {elapsed:.1f} с "
+        f"({copied / max(elapsed, 1e-9):,.0f} строк/с)"
+    )
+    return copied
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    defaults = DatasetConfig()
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--tx-per-user", type=int, default=defaults.tx_per_user)
+    parser.add_argument("--workers", type=int, default=defaults.workers)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--zipf-a", type=float, default=defaults.zipf_a)
+    parser.add_argument("--days", type=int, default=defaults.days)
+    parser.add_argument(
+        "--end-date", type=date.fromisoformat, default=defaults.end_date
+    )
+    parser.add_argument("--seasonality", type=float, default=defaults.seasonality)
+    parser.add_argument("--weekend-factor", type=float, default=defaults.weekend_factor)
+    parser.add_argument(
+        "--successful-share", type=float, default=defaults.successful_share
+    )
+    parser.add_argument("--payment-share", type=float, default=defaults.payment_share)
+    parser.add_argument("--min-amount", type=float, default=defaults.min_amount)
+    parser.add_argument("--max-amount", type=float, default=defaults.max_amount)
+    parser.add_argument("--block-size", type=int, default=defaults.block_size)
+    parser.add_argument(
+        "--no-rollups",
+        action="store_true",
+        help="Не пересчитывать дневные роллапы после загрузки",
+    )
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    config = DatasetConfig(
+        **{
+            key: value
+            for key, value in vars(args).items()
+            if key in DatasetConfig.model_fields
+        }
+    )
+    await generate_dataset(config)
+    if not args.no_rollups:
+        from app.services.rollup_service import refresh_daily_rollups_once
+
+        await refresh_daily_rollups_once()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -17,3 +17,15 @@ class TransactionFieldEnum(Enum):
     PREV_DAY_TOTAL = "prev_day_total"
     PERCENTAGE_CHANGE = "percentage_change"
     FILTERED_TRANSACTION = "filtered_transactions"
+    DAILY_SOURCE = "daily_source"
+    COUNTRY = "country"
+    USER_ID = "user_id"
+    AVERAGE_AMOUNT = "average_amount"
+    COUNTRY_STATS = "country_stats"
+    SAMPLED_ROWS = "sampled_rows"
+    SAMPLED_TOTAL = "sampled_total"
+    SUM_COUNT_SQ = "sum_count_sq"
+    SUM_TOTAL_SQ = "sum_total_sq"
+    SUM_COUNT_TOTAL = "sum_count_total"
+    SAMPLE_CLUSTERS = "sample_clusters"
+    DISTINCT_USERS = "distinct_users"
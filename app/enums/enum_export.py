@@ -0,0 +1,14 @@
+from enum import Enum
+
+
+class ExportFormatEnum(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class ReportFormatEnum(str, Enum):
+    """Форматы ответа /reports/report, выбираются по заголовку Accept"""
+
+    JSON = "application/json"
+    COLUMNAR_JSON = "application/vnd.report.columns+json"
+    ARROW = "application/vnd.apache.arrow.stream"
@@ -0,0 +1,13 @@
+from enum import Enum
+
+
+class JobStatusEnum(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class JobKindEnum(str, Enum):
+    REPORT = "report"
+    COUNTRY_REPORT = "country_report"
@@ -0,0 +1,5 @@
+from enum import Enum
+
+
+class RollupNameEnum(str, Enum):
+    DAILY_TRANSACTIONS = "daily_transaction_rollups"
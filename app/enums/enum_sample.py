@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class SampleMethodEnum(str, Enum):
+    """Метод TABLESAMPLE: SYSTEM выбирает страницы целиком, BERNOULLI — отдельные строки"""
+
+    SYSTEM = "system"
+    BERNOULLI = "bernoulli"
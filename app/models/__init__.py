@@ -1,9 +1,22 @@
 from app.models.base import BaseModel
 from app.models.transactions_models import TransactionModel
 from app.models.user_models import UserModel
+from app.models.rollup_models import (
+    DailyTransactionRollupModel,
+    RollupRefreshStateModel,
+    RollupDirtyDayModel,
+)
+from app.models.change_counter_models import TableChangeCounterModel
+from app.models.country_dataset_models import CountryDatasetModel, UserCountryModel
 
 __all__ = [
     'BaseModel',
     'TransactionModel',
-    'UserModel'
+    'UserModel',
+    'DailyTransactionRollupModel',
+    'RollupRefreshStateModel',
+    'RollupDirtyDayModel',
+    'TableChangeCounterModel',
+    'CountryDatasetModel',
+    'UserCountryModel',
 ]
@@ -0,0 +1,27 @@
+from sqlalchemy import BigInteger, SmallInteger, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import BaseModel
+
+
+class TableChangeCounterModel(BaseModel):
+    """
+    Счётчик изменений таблицы, увеличивается триггером на каждый
+    INSERT/UPDATE/DELETE/TRUNCATE. Используется как дешёвый watermark данных.
+    Счётчик разбит на шарды по процессу соединения, чтобы пишущие транзакции
+    не ждали друг друга на одной строке; watermark — сумма по шардам.
+    """
+
+    __tablename__ = "table_change_counters"
+
+    table_name: Mapped[str] = mapped_column(String(64), nullable=False)
+    shard: Mapped[int] = mapped_column(
+        SmallInteger, nullable=False, default=0, server_default="0"
+    )
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "table_name", "shard", name="table_change_counters_table_name_shard_key"
+        ),
+    )
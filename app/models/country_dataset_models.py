@@ -0,0 +1,39 @@
+from sqlalchemy import BigInteger, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import BaseModel
+
+
+class CountryDatasetModel(BaseModel):
+    """
+    Загруженная версия соответствия пользователь → страна.
+    Один и тот же файл (по sha256 содержимого) хранится один раз.
+    """
+
+    __tablename__ = "country_datasets"
+
+    content_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    row_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class UserCountryModel(BaseModel):
+    """Строки соответствия пользователь → страна внутри набора"""
+
+    __tablename__ = "user_countries"
+
+    dataset_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("country_datasets.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    country: Mapped[str] = mapped_column(Text, nullable=False)
+
+    __table_args__ = (
+        # Соединение с транзакциями читает только индекс
+        Index(
+            "idx_user_countries_dataset_user",
+            "dataset_id",
+            "user_id",
+            postgresql_include=["country"],
+        ),
+    )
@@ -0,0 +1,81 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import (
+    ARRAY,
+    Enum,
+    Date,
+    DateTime,
+    DECIMAL,
+    BigInteger,
+    Integer,
+    SmallInteger,
+    String,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.enums.enum_status import TypeStatusEnum
+from app.enums.enum_type_pay import TypePayEnum
+from app.models.base import BaseModel
+
+
+class DailyTransactionRollupModel(BaseModel):
+    """
+    Предагрегированные транзакции за день в разрезе статуса и типа
+    """
+
+    __tablename__ = "daily_transaction_rollups"
+
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    status: Mapped[TypeStatusEnum] = mapped_column(Enum(TypeStatusEnum), nullable=False)
+    type: Mapped[TypePayEnum] = mapped_column(Enum(TypePayEnum), nullable=False)
+    total_amount: Mapped[Decimal] = mapped_column(DECIMAL(18, 2), nullable=False)
+    transaction_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    min_amount: Mapped[Decimal] = mapped_column(DECIMAL(10, 2), nullable=False)
+    max_amount: Mapped[Decimal] = mapped_column(DECIMAL(10, 2), nullable=False)
+    # Скетч сумм для квантилей: номера корзин по возрастанию и их счётчики
+    sketch_buckets: Mapped[List[int]] = mapped_column(
+        ARRAY(Integer), nullable=False, server_default="{}"
+    )
+    sketch_counts: Mapped[List[int]] = mapped_column(
+        ARRAY(BigInteger), nullable=False, server_default="{}"
+    )
+    # HyperLogLog по user_id: заполненные регистры и их максимальные ранги
+    hll_registers: Mapped[List[int]] = mapped_column(
+        ARRAY(SmallInteger), nullable=False, server_default="{}"
+    )
+    hll_ranks: Mapped[List[int]] = mapped_column(
+        ARRAY(SmallInteger), nullable=False, server_default="{}"
+    )
+
+    __table_args__ = (
+        UniqueConstraint(
+            "day", "status", "type", name="uq_daily_rollups_day_status_type"
+        ),
+    )
+
+
+class RollupRefreshStateModel(BaseModel):
+    """
+    Отметка времени последнего пересчёта роллапа
+    """
+
+    __tablename__ = "rollup_refresh_state"
+
+    name: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    watermark: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class RollupDirtyDayModel(BaseModel):
+    """
+    Дни, транзакции которых изменились после последнего пересчёта роллапов.
+    Заполняется триггерами transactions в той же транзакции, что и изменение,
+    поэтому отметка видна ровно тогда, когда видны сами изменённые строки.
+    Уникальности нет: вставки не блокируют друг друга, дубли схлопывает пересчёт.
+    """
+
+    __tablename__ = "rollup_dirty_days"
+
+    day: Mapped[date] = mapped_column(Date, nullable=False)
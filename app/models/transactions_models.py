@@ -2,7 +2,7 @@ from datetime import datetime
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Enum, Integer, ForeignKey, DECIMAL, DateTime, Index
+from sqlalchemy import Enum, Integer, ForeignKey, DECIMAL, DateTime, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.enums.enum_status import TypeStatusEnum
@@ -16,7 +16,10 @@ if TYPE_CHECKING:
 class TransactionModel(BaseModel):
     __tablename__ = "transactions"
 
-    date_pay: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # Таблица партиционирована по месяцам, ключ партиции входит в первичный ключ
+    date_pay: Mapped[datetime] = mapped_column(
+        DateTime, primary_key=True, nullable=False
+    )
     sum_pay: Mapped[Decimal] = mapped_column(DECIMAL(10, 2), nullable=False)
     status: Mapped[TypeStatusEnum] = mapped_column(Enum(TypeStatusEnum), nullable=False)
     type: Mapped[TypePayEnum] = mapped_column(Enum(TypePayEnum), nullable=False)
@@ -29,13 +32,25 @@ class TransactionModel(BaseModel):
 
     __table_args__ = (
         Index(
-            "idx_transactions_status_type_date_user",
+            "idx_transactions_status_type_date_cover",
             "status",
             "type",
             "date_pay",
-            "user_id",
+            postgresql_include=["sum_pay", "user_id"],
+        ),
+        Index(
+            "idx_transactions_successful_date_cover",
+            "date_pay",
+            postgresql_include=["type", "sum_pay", "user_id"],
+            postgresql_where=text("status = 'SUCCESSFUL'"),
+        ),
+        Index(
+            "idx_transactions_failed_date_cover",
+            "date_pay",
+            postgresql_include=["type", "sum_pay", "user_id"],
+            postgresql_where=text("status = 'FAILED'"),
         ),
+        Index("idx_transactions_date_pay_brin", "date_pay", postgresql_using="brin"),
         Index("idx_transactions_user_id", "user_id"),
-        Index("idx_transactions_date_pay", "date_pay"),
-        Index("idx_transactions_sum_pay", "sum_pay"),
+        {"postgresql_partition_by": "RANGE (date_pay)"},
     )
@@ -0,0 +1,55 @@
+from typing import AsyncIterable, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import CountryDatasetModel, UserCountryModel
+from app.repo.base_repository import BaseRepo
+
+
+class CountryDatasetRepository(BaseRepo[CountryDatasetModel]):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.dataset_model = CountryDatasetModel
+        self.user_country_model = UserCountryModel
+
+    async def get_by_id(self, dataset_id: int) -> Optional[CountryDatasetModel]:
+        return await self.session.get(self.dataset_model, dataset_id)
+
+    async def get_by_hash(self, content_hash: str) -> Optional[CountryDatasetModel]:
+        smtp = select(self.dataset_model).where(
+            self.dataset_model.content_hash == content_hash
+        )
+        return await self.session.scalar(smtp)
+
+    async def create_dataset(
+        self, content_hash: str, filename: str
+    ) -> CountryDatasetModel:
+        dataset = self.dataset_model(
+            content_hash=content_hash, filename=filename, row_count=0
+        )
+        self.session.add(dataset)
+        await self.session.flush()
+        return dataset
+
+    async def load_user_countries(
+        self, dataset_id: int, chunks: AsyncIterable[List[Tuple[int, str]]]
+    ) -> int:
+        """Загружает пачки пар (user_id, country) в user_countries через COPY"""
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        table = self.user_country_model.__table__
+        columns = [table.c.dataset_id.name, table.c.user_id.name, table.c.country.name]
+        loaded = 0
+        async for records in chunks:
+            await raw_connection.driver_connection.copy_records_to_table(
+                table.name,
+                records=[
+                    (dataset_id, user_id, country) for user_id, country in records
+                ],
+                columns=columns,
+            )
+            loaded += len(records)
+        # Статистика для планировщика после крупной загрузки
+        await self.session.execute(text(f"ANALYZE {table.name}"))
+        return loaded
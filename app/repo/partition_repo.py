@@ -0,0 +1,77 @@
+from datetime import date
+from typing import List
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import DailyTransactionRollupModel, TransactionModel
+from app.repo.base_repository import BaseRepo
+
+PARTITION_NAME_FORMAT = "transactions_y%Ym%m"
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return month.strftime(PARTITION_NAME_FORMAT)
+
+
+class PartitionRepository(BaseRepo[TransactionModel]):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.trans_model = TransactionModel
+
+    async def create_partitions(self, start: date, end: date) -> int:
+        """Создаёт недостающие месячные партиции с start по end включительно"""
+        smtp = text("SELECT create_transactions_partitions(:start, :end)")
+        return await self.session.scalar(smtp, {"start": start, "end": end})
+
+    async def get_partitions(self) -> List[str]:
+        smtp = text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :table
+            ORDER BY child.relname
+            """)
+        result = await self.session.execute(
+            smtp, {"table": self.trans_model.__tablename__}
+        )
+        return list(result.scalars().all())
+
+    async def detach_partition(self, month: date, lock_timeout_sec: float) -> str:
+        """
+        Отсоединяет партицию месяца, данные остаются в отдельной таблице.
+        DETACH CONCURRENTLY запрещён при default-партиции, поэтому обычный
+        DETACH: он коротко блокирует transactions целиком, а ожидание
+        блокировки ограничено lock_timeout_sec. В той же транзакции удаляются
+        роллапы дней месяца, чтобы отчёты не считали отсоединённые данные.
+        """
+        start = month_start(month)
+        name = partition_name(start)
+        await self.session.execute(
+            text(f"SET LOCAL lock_timeout = '{int(lock_timeout_sec * 1000)}ms'")
+        )
+        await self.session.execute(
+            text(
+                f"ALTER TABLE {self.trans_model.__tablename__} "
+                f'DETACH PARTITION "{name}"'
+            )
+        )
+        rollup = DailyTransactionRollupModel
+        await self.session.execute(
+            delete(rollup).where(rollup.day >= start, rollup.day < add_months(start, 1))
+        )
+        # Кэш отчётов за отсоединённый месяц сбрасывается
+        await self.session.execute(
+            select(func.bump_change_counter(self.trans_model.__tablename__))
+        )
+        return name
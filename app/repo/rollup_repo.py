@@ -0,0 +1,210 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import select, func, cast, delete, insert, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.enums.enum_rollup import RollupNameEnum
+from app.models import (
+    TransactionModel,
+    DailyTransactionRollupModel,
+    RollupRefreshStateModel,
+    RollupDirtyDayModel,
+)
+from app.repo.base_repository import BaseRepo
+from app.services.utils.utils_hll import (
+    HLL_STORED_PRECISION,
+    hll_register_sql,
+    hll_rank_sql,
+)
+from app.services.utils.utils_sketch import sketch_bucket_sql
+
+
+class RollupRepository(BaseRepo[DailyTransactionRollupModel]):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.rollup_model = DailyTransactionRollupModel
+        self.state_model = RollupRefreshStateModel
+        self.dirty_model = RollupDirtyDayModel
+        self.trans_model = TransactionModel
+
+    async def lock_watermark(self, name: RollupNameEnum) -> Optional[datetime]:
+        """
+        Возвращает отметку последнего пересчёта и блокирует строку состояния,
+        чтобы параллельные воркеры не пересчитывали одни и те же дни.
+        """
+        await self.session.execute(
+            pg_insert(self.state_model)
+            .values(name=name.value, watermark=None)
+            .on_conflict_do_nothing(index_elements=[self.state_model.name])
+        )
+        smtp = (
+            select(self.state_model.watermark)
+            .where(self.state_model.name == name.value)
+            .with_for_update()
+        )
+        return await self.session.scalar(smtp)
+
+    async def set_watermark(self, name: RollupNameEnum, watermark: datetime) -> None:
+        smtp = (
+            pg_insert(self.state_model)
+            .values(name=name.value, watermark=watermark)
+            .on_conflict_do_update(
+                index_elements=[self.state_model.name],
+                set_={"watermark": watermark, "updated_at": func.now()},
+            )
+        )
+        await self.session.execute(smtp)
+
+    async def get_db_now(self) -> datetime:
+        return await self.session.scalar(select(func.localtimestamp()))
+
+    async def bump_data_watermark(self) -> None:
+        """
+        Сдвигает счётчик изменений transactions: отчёты читают роллапы,
+        поэтому пересчёт меняет их результат так же, как запись в таблицу
+        """
+        await self.session.execute(
+            select(func.bump_change_counter(self.trans_model.__tablename__))
+        )
+
+    async def claim_dirty_days(self) -> List[date]:
+        """
+        Забирает отметки изменённых дней, которые видны на момент вызова.
+        Отметки ещё не закоммиченных транзакций остаются до следующего пересчёта.
+        """
+        result = await self.session.execute(
+            delete(self.dirty_model).returning(self.dirty_model.day)
+        )
+        return sorted(set(result.scalars().all()))
+
+    async def rebuild_daily_rollups(self, days: Optional[List[date]] = None) -> None:
+        """
+        Пересчитывает роллапы за указанные дни.
+        Если days не передан — пересобирает таблицу целиком.
+        Скетч сумм строится в том же проходе: сначала группировка
+        до корзины скетча, затем свёртка корзин дня в массивы.
+        Регистры HyperLogLog по user_id собираются так же, по номеру регистра.
+        """
+        trans = self.trans_model
+        day_expr = cast(trans.date_pay, Date)
+        bucket_expr = sketch_bucket_sql(trans.sum_pay)
+        register_expr = hll_register_sql(trans.user_id, HLL_STORED_PRECISION)
+        delete_smtp = delete(self.rollup_model)
+        buckets_smtp = select(
+            day_expr.label("day"),
+            trans.status,
+            trans.type,
+            bucket_expr.label("bucket"),
+            func.sum(trans.sum_pay).label("total_amount"),
+            func.count().label("transaction_count"),
+            func.min(trans.sum_pay).label("min_amount"),
+            func.max(trans.sum_pay).label("max_amount"),
+        ).group_by(day_expr, trans.status, trans.type, bucket_expr)
+        registers_smtp = select(
+            day_expr.label("day"),
+            trans.status,
+            trans.type,
+            register_expr.label("register"),
+            func.max(hll_rank_sql(trans.user_id, HLL_STORED_PRECISION)).label("rank"),
+        ).group_by(day_expr, trans.status, trans.type, register_expr)
+        if days is not None:
+            if not days:
+                return
+            delete_smtp = delete_smtp.where(self.rollup_model.day.in_(days))
+            # Границы по date_pay дают индексный диапазон, IN отсекает пропуски
+            days_filter = (
+                trans.date_pay >= min(days),
+                trans.date_pay < max(days) + timedelta(days=1),
+                day_expr.in_(days),
+            )
+            buckets_smtp = buckets_smtp.where(*days_filter)
+            registers_smtp = registers_smtp.where(*days_filter)
+        buckets = buckets_smtp.subquery("day_buckets")
+        totals = (
+            select(
+                buckets.c.day,
+                buckets.c.status,
+                buckets.c.type,
+                func.sum(buckets.c.total_amount).label("total_amount"),
+                func.sum(buckets.c.transaction_count).label("transaction_count"),
+                func.min(buckets.c.min_amount).label("min_amount"),
+                func.max(buckets.c.max_amount).label("max_amount"),
+                func.array_agg(
+                    aggregate_order_by(buckets.c.bucket, buckets.c.bucket)
+                ).label("sketch_buckets"),
+                func.array_agg(
+                    aggregate_order_by(buckets.c.transaction_count, buckets.c.bucket)
+                ).label("sketch_counts"),
+            )
+            .group_by(buckets.c.day, buckets.c.status, buckets.c.type)
+            .subquery("day_totals")
+        )
+        registers = registers_smtp.subquery("day_registers")
+        hll = (
+            select(
+                registers.c.day,
+                registers.c.status,
+                registers.c.type,
+                func.array_agg(
+                    aggregate_order_by(registers.c.register, registers.c.register)
+                ).label("hll_registers"),
+                func.array_agg(
+                    aggregate_order_by(registers.c.rank, registers.c.register)
+                ).label("hll_ranks"),
+            )
+            .group_by(registers.c.day, registers.c.status, registers.c.type)
+            .subquery("day_hll")
+        )
+        select_smtp = select(
+            totals,
+            hll.c.hll_registers,
+            hll.c.hll_ranks,
+        ).join(
+            hll,
+            (hll.c.day == totals.c.day)
+            & (hll.c.status == totals.c.status)
+            & (hll.c.type == totals.c.type),
+        )
+        await self.session.execute(delete_smtp)
+        await self.session.execute(
+            insert(self.rollup_model).from_select(
+                [
+                    self.rollup_model.day,
+                    self.rollup_model.status,
+                    self.rollup_model.type,
+                    self.rollup_model.total_amount,
+                    self.rollup_model.transaction_count,
+                    self.rollup_model.min_amount,
+                    self.rollup_model.max_amount,
+                    self.rollup_model.sketch_buckets,
+                    self.rollup_model.sketch_counts,
+                    self.rollup_model.hll_registers,
+                    self.rollup_model.hll_ranks,
+                ],
+                select_smtp,
+            )
+        )
+
+    async def refresh_daily_rollups(self) -> Optional[List[date]]:
+        """
+        Инкрементально обновляет дневные роллапы: пересчитываются только дни,
+        транзакции которых изменились после прошлого запуска.
+        Возвращает пересчитанные дни (None — была полная пересборка).
+        Изменённые дни (вставки, обновления и удаления) отмечают триггеры
+        transactions в rollup_dirty_days при коммите изменения.
+        """
+        name = RollupNameEnum.DAILY_TRANSACTIONS
+        watermark = await self.lock_watermark(name)
+        new_watermark = await self.get_db_now()
+        # Отметки забираются и при полной пересборке: их дни в неё уже входят
+        days = await self.claim_dirty_days()
+        if watermark is None:
+            days = None
+        await self.rebuild_daily_rollups(days)
+        await self.set_watermark(name, new_watermark)
+        # Кэш отчётов, собранных по старым роллапам, сбрасывается в той же транзакции
+        if days is None or days:
+            await self.bump_data_watermark()
+        return days
@@ -1,139 +1,715 @@
 import logging
 from datetime import date, datetime, timezone
-from typing import List, Sequence
+from typing import (
+    List,
+    Sequence,
+    Tuple,
+    AsyncIterable,
+    Optional,
+    Callable,
+    Awaitable,
+    Union,
+)
 
-from sqlalchemy import select, func, cast, Select, Text, literal_column, case
+from sqlalchemy import (
+    select,
+    func,
+    cast,
+    Select,
+    literal,
+    literal_column,
+    case,
+    union_all,
+    Date,
+    CTE,
+    Table,
+    MetaData,
+    Column,
+    Integer,
+    Text,
+    Row,
+    text,
+    BigInteger,
+    tablesample,
+    Float,
+    and_,
+)
+from sqlalchemy.dialects import postgresql
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.settings import settings
 from app.enums.enum_aggregate import TransactionFieldEnum
+from app.enums.enum_export import ExportFormatEnum
+from app.enums.enum_rollup import RollupNameEnum
+from app.enums.enum_sample import SampleMethodEnum
 from app.enums.enum_status import APITypeStatusEnum
 from app.enums.enum_type_pay import APITypePayEnum
-from app.models import TransactionModel
+from app.models import (
+    TransactionModel,
+    DailyTransactionRollupModel,
+    RollupRefreshStateModel,
+    TableChangeCounterModel,
+    UserCountryModel,
+)
 from app.repo.base_repository import BaseRepo
-from app.schemas.report_schema import TransactionFilter, DailyShift, AggregateReport
+from app.services.utils.utils_hll import (
+    HLL_STORED_PRECISION,
+    hll_register_sql,
+    hll_rank_sql,
+    hll_fold_sql,
+    hll_estimate_sql,
+)
+from app.services.utils.utils_sketch import sketch_bucket_sql
+from app.schemas.report_schema import (
+    TransactionFilter,
+    DailyShift,
+    DailyShiftColumns,
+    AggregateReport,
+    CountryStatsFilter,
+)
+
+# Временная таблица сессии с соответствием пользователь → страна из CSV
+user_countries_tmp = Table(
+    "tmp_user_countries",
+    MetaData(),
+    Column("user_id", Integer, nullable=False),
+    Column("country", Text, nullable=False),
+)
 
 
 class TransactionRepository(BaseRepo[TransactionModel]):
     def __init__(self, session: AsyncSession):
         super().__init__(session)
         self.trans_model = TransactionModel
+        self.rollup_model = DailyTransactionRollupModel
 
     async def get_report_by_filter(
-        self, query: Select, filters: TransactionFilter
+        self, query: Select, filters: TransactionFilter, columns=None
     ) -> Select:
-        # Базовый запрос с фильтрацией по дате, статусам, типам
+        # Базовый запрос с фильтрацией по дате, статусам, типам;
+        # columns — колонки другого источника строк (например, выборки TABLESAMPLE)
+        columns = self.trans_model if columns is None else columns
         if filters.start_date:
             start_datetime = datetime.combine(
                 filters.start_date_parsed, datetime.min.time()
             )
-            query = query.where(self.trans_model.date_pay >= start_datetime)
+            query = query.where(columns.date_pay >= start_datetime)
         if filters.end_date:
             end_datetime = datetime.combine(
                 filters.end_date_parsed, datetime.max.time()
             )
-            query = query.where(self.trans_model.date_pay <= end_datetime)
+            query = query.where(columns.date_pay <= end_datetime)
         if filters.status != APITypeStatusEnum.ALL:
-            query = query.where(self.trans_model.status == filters.status)
+            # Статус подставляется литералом: с параметром generic-план
+            # prepared statement не может выбрать частичный индекс по статусу
+            status = literal(
+                filters.status, self.trans_model.status.type, literal_execute=True
+            )
+            query = query.where(columns.status == status)
         if filters.type != APITypePayEnum.ALL:
-            query = query.where(self.trans_model.type == filters.type)
+            query = query.where(columns.type == filters.type)
 
         return query
 
-    async def get_trans_user_ids(
-        self, list_id: List[int]
-    ) -> Sequence[TransactionModel]:
-        smtp = select(self.trans_model).where(self.trans_model.user_id.in_(list_id))
-        result = await self.session.execute(smtp)
-        daily_data = result.scalars().all()
-        return daily_data
+    async def get_data_watermark(self) -> int:
+        """Счётчик изменений таблицы транзакций: сумма шардов, поддерживается триггером"""
+        smtp = select(func.sum(TableChangeCounterModel.version)).where(
+            TableChangeCounterModel.table_name == self.trans_model.__tablename__
+        )
+        return int(await self.session.scalar(smtp) or 0)
+
+    async def get_row_estimate(self) -> float:
+        """Число строк по статистике планировщика (сумма по партициям), без сканирования"""
+        result = await self.session.execute(
+            text(
+                "SELECT coalesce(sum(greatest(c.reltuples, 0)), 0) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:table_name AS regclass)"
+            ),
+            {"table_name": self.trans_model.__tablename__},
+        )
+        return float(result.scalar() or 0)
+
+    async def get_sample_totals(
+        self,
+        filters: TransactionFilter,
+        method: SampleMethodEnum,
+        sample_pct: float,
+    ) -> Row:
+        """
+        Суммы по выборке TABLESAMPLE с фильтром отчёта. Для SYSTEM строки
+        сначала группируются по страницам (tableoid, номер блока из ctid):
+        страницы попадают в выборку целиком, и дисперсия оценок считается по ним.
+        """
+        sampler = (
+            func.bernoulli if method == SampleMethodEnum.BERNOULLI else func.system
+        )
+        sample = tablesample(
+            self.trans_model.__table__,
+            sampler(literal(sample_pct, Float)),
+            name="transactions_sample",
+        )
+        amount = sample.c.sum_pay
+        fields = TransactionFieldEnum
+        if method == SampleMethodEnum.BERNOULLI:
+            # Каждая строка — отдельная единица выборки: c_j = 1, s_j = сумма
+            query = select(
+                func.count().label(fields.SAMPLED_ROWS.value),
+                func.sum(amount).label(fields.SAMPLED_TOTAL.value),
+                func.count().label(fields.SUM_COUNT_SQ.value),
+                func.sum(amount * amount).label(fields.SUM_TOTAL_SQ.value),
+                func.sum(amount).label(fields.SUM_COUNT_TOTAL.value),
+                func.min(amount).label(fields.MIN_AMOUNT.value),
+                func.max(amount).label(fields.MAX_AMOUNT.value),
+            ).select_from(sample)
+            query = await self.get_report_by_filter(query, filters, sample.c)
+        else:
+            page = literal_column(f"({sample.name}.ctid::text::point)[0]")
+            partition = literal_column(f"{sample.name}.tableoid")
+            clusters = select(
+                func.count().label(fields.TRANSACTION_COUNT.value),
+                func.sum(amount).label(fields.TOTAL_AMOUNT.value),
+                func.min(amount).label(fields.MIN_AMOUNT.value),
+                func.max(amount).label(fields.MAX_AMOUNT.value),
+            ).select_from(sample)
+            clusters = await self.get_report_by_filter(clusters, filters, sample.c)
+            clusters = clusters.group_by(partition, page).subquery(
+                fields.SAMPLE_CLUSTERS.value
+            )
+            count = clusters.c.transaction_count
+            total = clusters.c.total_amount
+            query = select(
+                func.coalesce(func.sum(count), 0).label(fields.SAMPLED_ROWS.value),
+                func.sum(total).label(fields.SAMPLED_TOTAL.value),
+                func.sum(count * count).label(fields.SUM_COUNT_SQ.value),
+                func.sum(total * total).label(fields.SUM_TOTAL_SQ.value),
+                func.sum(count * total).label(fields.SUM_COUNT_TOTAL.value),
+                func.min(clusters.c.min_amount).label(fields.MIN_AMOUNT.value),
+                func.max(clusters.c.max_amount).label(fields.MAX_AMOUNT.value),
+            )
+        result = await self.session.execute(query)
+        return result.fetchone()
+
+    def use_rollups(self, filters: TransactionFilter) -> bool:
+        """Роллапы применимы, если фильтр по датам покрывает целые дни"""
+        return bool(
+            settings.USE_DAILY_ROLLUPS and filters.start_date and filters.end_date
+        )
+
+    def get_rollup_cutoff(self):
+        """
+        День последнего пересчёта роллапов: всё, что раньше, берётся из роллапов,
+        начиная с него — из сырых транзакций.
+        """
+        watermark = (
+            select(cast(RollupRefreshStateModel.watermark, Date))
+            .where(
+                RollupRefreshStateModel.name == RollupNameEnum.DAILY_TRANSACTIONS.value
+            )
+            .scalar_subquery()
+        )
+        return func.coalesce(watermark, date.min)
+
+    def filter_rollups(
+        self, query: Select, filters: TransactionFilter, cutoff
+    ) -> Select:
+        """Фильтр отчёта для роллапов: дни диапазона до cutoff, статус и тип"""
+        rollup = self.rollup_model
+        query = query.where(
+            rollup.day >= filters.start_date_parsed,
+            rollup.day <= filters.end_date_parsed,
+            rollup.day < cutoff,
+        )
+        if filters.status != APITypeStatusEnum.ALL:
+            query = query.where(rollup.status == filters.status)
+        if filters.type != APITypePayEnum.ALL:
+            query = query.where(rollup.type == filters.type)
+        return query
+
+    async def get_amount_sketch(self, filters: TransactionFilter) -> Sequence[Row]:
+        """
+        Слитый скетч сумм по фильтру: строки (bucket, transaction_count).
+        Дни до пересчёта роллапов берутся из скетчей роллапов (O(дней)),
+        свежие — раскладываются по корзинам из сырых транзакций.
+        """
+        bucket = sketch_bucket_sql(self.trans_model.sum_pay)
+        raw_query = select(
+            bucket.label("bucket"),
+            func.count().label(TransactionFieldEnum.TRANSACTION_COUNT.value),
+        )
+        raw_query = await self.get_report_by_filter(raw_query, filters)
+        if self.use_rollups(filters):
+            cutoff = self.get_rollup_cutoff()
+            raw_query = raw_query.where(self.trans_model.date_pay >= cutoff)
+            rollup = self.rollup_model
+            rollup_query = select(
+                func.unnest(rollup.sketch_buckets).label("bucket"),
+                func.unnest(rollup.sketch_counts).label(
+                    TransactionFieldEnum.TRANSACTION_COUNT.value
+                ),
+            )
+            rollup_query = self.filter_rollups(rollup_query, filters, cutoff)
+            source = union_all(rollup_query, raw_query.group_by(bucket)).subquery()
+        else:
+            source = raw_query.group_by(bucket).subquery()
+        result = await self.session.execute(
+            select(source.c.bucket, func.sum(source.c.transaction_count))
+            .group_by(source.c.bucket)
+            .order_by(source.c.bucket)
+        )
+        return result.fetchall()
+
+    async def get_user_registers(self, filters: TransactionFilter):
+        """
+        Регистры HyperLogLog по user_id (day_date, register, rank) с точностью
+        HLL_PRECISION: из роллапов до их пересчёта и из сырых транзакций после.
+        Один день может дать несколько строк на регистр, берётся максимум ранга.
+        """
+        precision = settings.HLL_PRECISION
+        day = cast(self.trans_model.date_pay, Date)
+        raw_query = select(
+            day.label(TransactionFieldEnum.DAY_DATE.value),
+            hll_register_sql(self.trans_model.user_id, precision).label("register"),
+            hll_rank_sql(self.trans_model.user_id, precision).label("rank"),
+        )
+        raw_query = await self.get_report_by_filter(raw_query, filters)
+        if not self.use_rollups(filters):
+            return raw_query.subquery("user_registers")
+
+        cutoff = self.get_rollup_cutoff()
+        raw_query = raw_query.where(self.trans_model.date_pay >= cutoff)
+        rollup = self.rollup_model
+        stored = select(
+            rollup.day.label(TransactionFieldEnum.DAY_DATE.value),
+            func.unnest(rollup.hll_registers).label("register"),
+            func.unnest(rollup.hll_ranks).label("rank"),
+        )
+        stored = self.filter_rollups(stored, filters, cutoff).subquery("stored")
+        # unnest нельзя использовать внутри CASE, поэтому свёртка — уровнем выше
+        register, rank = hll_fold_sql(
+            stored.c.register, stored.c.rank, HLL_STORED_PRECISION, precision
+        )
+        rollup_query = select(
+            stored.c.day_date, register.label("register"), rank.label("rank")
+        )
+        return union_all(rollup_query, raw_query).subquery("user_registers")
+
+    async def get_distinct_users(self, filters: TransactionFilter) -> int:
+        """Оценка числа различных пользователей за весь диапазон фильтра"""
+        source = await self.get_user_registers(filters)
+        registers = (
+            select(source.c.register, func.max(source.c.rank).label("rank"))
+            .group_by(source.c.register)
+            .subquery("registers")
+        )
+        estimate = await self.session.scalar(
+            select(hll_estimate_sql(registers.c.rank, settings.HLL_PRECISION))
+        )
+        return estimate or 0
+
+    async def get_daily_distinct_users(self, filters: TransactionFilter) -> dict:
+        """Оценка числа различных пользователей по дням: {YYYY-MM-DD: оценка}"""
+        source = await self.get_user_registers(filters)
+        registers = (
+            select(
+                source.c.day_date,
+                source.c.register,
+                func.max(source.c.rank).label("rank"),
+            )
+            .group_by(source.c.day_date, source.c.register)
+            .subquery("registers")
+        )
+        result = await self.session.execute(
+            select(
+                registers.c.day_date,
+                hll_estimate_sql(registers.c.rank, settings.HLL_PRECISION),
+            ).group_by(registers.c.day_date)
+        )
+        return {day.isoformat(): estimate for day, estimate in result.all()}
+
+    async def get_daily_source(self, filters: TransactionFilter) -> CTE:
+        """
+        Дневные суммы (day_date, daily_total, daily_count, min_amount, max_amount)
+        по фильтру. Стоимость зависит от числа дней в диапазоне, а не от числа строк.
+        """
+        raw_day = cast(self.trans_model.date_pay, Date)
+        raw_query = select(
+            raw_day.label(TransactionFieldEnum.DAY_DATE.value),
+            func.sum(self.trans_model.sum_pay).label(
+                TransactionFieldEnum.DAILY_TOTAL.value
+            ),
+            func.count().label(TransactionFieldEnum.DAILY_COUNT.value),
+            func.min(self.trans_model.sum_pay).label(
+                TransactionFieldEnum.MIN_AMOUNT.value
+            ),
+            func.max(self.trans_model.sum_pay).label(
+                TransactionFieldEnum.MAX_AMOUNT.value
+            ),
+        )
+        raw_query = await self.get_report_by_filter(raw_query, filters)
+        if not self.use_rollups(filters):
+            return raw_query.group_by(raw_day).cte(
+                name=TransactionFieldEnum.DAILY_SOURCE.value
+            )
+
+        cutoff = self.get_rollup_cutoff()
+        raw_query = raw_query.where(self.trans_model.date_pay >= cutoff).group_by(
+            raw_day
+        )
+        rollup = self.rollup_model
+        rollup_query = select(
+            rollup.day.label(TransactionFieldEnum.DAY_DATE.value),
+            func.sum(rollup.total_amount).label(TransactionFieldEnum.DAILY_TOTAL.value),
+            # sum(bigint) даёт numeric, а count() в сырой части — bigint:
+            # без приведения UNION ALL вернул бы Decimal
+            cast(func.sum(rollup.transaction_count), BigInteger).label(
+                TransactionFieldEnum.DAILY_COUNT.value
+            ),
+            func.min(rollup.min_amount).label(TransactionFieldEnum.MIN_AMOUNT.value),
+            func.max(rollup.max_amount).label(TransactionFieldEnum.MAX_AMOUNT.value),
+        ).group_by(rollup.day)
+        rollup_query = self.filter_rollups(rollup_query, filters, cutoff)
+        return union_all(rollup_query, raw_query).cte(
+            name=TransactionFieldEnum.DAILY_SOURCE.value
+        )
+
+    async def get_export_query(self, filters: TransactionFilter) -> Select:
+        query = select(
+            self.trans_model.id,
+            self.trans_model.date_pay,
+            self.trans_model.sum_pay,
+            self.trans_model.status,
+            self.trans_model.type,
+            self.trans_model.user_id,
+        )
+        return await self.get_report_by_filter(query, filters)
+
+    async def copy_export(
+        self,
+        filters: TransactionFilter,
+        export_format: ExportFormatEnum,
+        output: Callable[[bytes], Awaitable[None]],
+    ) -> None:
+        """
+        Выгружает транзакции по фильтру через COPY ... TO STDOUT,
+        куски байтов по мере чтения из сокета передаются в output.
+        """
+        query = await self.get_export_query(filters)
+        # COPY не принимает параметры, значения фильтра подставляются литералами
+        sql = str(
+            query.compile(
+                dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+            )
+        )
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        if export_format == ExportFormatEnum.CSV:
+            await driver_connection.copy_from_query(
+                sql, output=output, format="csv", header=True
+            )
+        else:
+            # В текстовом формате COPY экранирует только \, табуляцию и переводы строк,
+            # которых в JSON из числовых, enum и дат не бывает
+            await driver_connection.copy_from_query(
+                f"SELECT row_to_json(export) FROM ({sql}) AS export", output=output
+            )
+
+    async def load_user_countries(
+        self, chunks: AsyncIterable[List[Tuple[int, str]]]
+    ) -> int:
+        """
+        Загружает пачки пар (user_id, country) во временную таблицу через COPY.
+        Таблица живёт до конца транзакции сессии. Возвращает число строк.
+        """
+        await self.session.execute(
+            text(
+                f"CREATE TEMP TABLE IF NOT EXISTS {user_countries_tmp.name} "
+                "(user_id integer NOT NULL, country text NOT NULL) ON COMMIT DROP"
+            )
+        )
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        columns = [column.name for column in user_countries_tmp.columns]
+        loaded = 0
+        async for records in chunks:
+            await raw_connection.driver_connection.copy_records_to_table(
+                user_countries_tmp.name, records=records, columns=columns
+            )
+            loaded += len(records)
+        # Статистика для планировщика, чтобы join строился по hash
+        await self.session.execute(text(f"ANALYZE {user_countries_tmp.name}"))
+        return loaded
+
+    def get_user_countries_source(self, dataset_id: Optional[int] = None):
+        """Соответствие пользователь → страна: сохранённый набор или временная таблица"""
+        if dataset_id is None:
+            return user_countries_tmp
+        return (
+            select(UserCountryModel.user_id, UserCountryModel.country)
+            .where(UserCountryModel.dataset_id == dataset_id)
+            .subquery(UserCountryModel.__tablename__)
+        )
+
+    async def get_country_report(
+        self, filters: CountryStatsFilter, dataset_id: Optional[int] = None
+    ) -> Sequence[Row]:
+        """
+        Агрегирует транзакции по странам из временной таблицы
+        или сохранённого набора dataset_id:
+        top_n стран по метрике sort_by, отсортированные по возрастанию.
+        """
+        user_countries = self.get_user_countries_source(dataset_id)
+        fields = TransactionFieldEnum
+        country = user_countries.c.country
+        joined = (
+            select()
+            .select_from(user_countries)
+            .join(
+                self.trans_model,
+                self.trans_model.user_id == user_countries.c.user_id,
+            )
+        )
+        if filters.include_distinct_users:
+            stats, metrics = self.get_country_metrics_with_users(joined, country)
+        else:
+            metrics = {
+                "count": func.count().label(fields.TRANSACTION_COUNT.value),
+                "total": func.sum(self.trans_model.sum_pay).label(
+                    fields.TOTAL_AMOUNT.value
+                ),
+                "avg": func.avg(self.trans_model.sum_pay).label(
+                    fields.AVERAGE_AMOUNT.value
+                ),
+            }
+            stats = joined.add_columns(
+                country.label(fields.COUNTRY.value), *metrics.values()
+            ).group_by(country)
+        sort_key = filters.sort_by or "count"
+        if filters.top_n:
+            stats = stats.order_by(
+                metrics[sort_key].desc(), literal_column(fields.COUNTRY.value)
+            ).limit(filters.top_n)
+        stats = stats.subquery(TransactionFieldEnum.COUNTRY_STATS.value)
+        sort_column = stats.c[metrics[sort_key].name]
+        result = await self.session.execute(
+            select(stats).order_by(sort_column, stats.c.country)
+        )
+        return result.fetchall()
+
+    def get_country_metrics_with_users(self, joined: Select, country):
+        """
+        Метрики по странам вместе с оценкой различных пользователей:
+        сначала группировка по (страна, регистр HyperLogLog), затем по стране.
+        Память ограничена числом стран × 2^HLL_PRECISION, без COUNT(DISTINCT).
+        """
+        fields = TransactionFieldEnum
+        precision = settings.HLL_PRECISION
+        register = hll_register_sql(self.trans_model.user_id, precision)
+        registers = (
+            joined.add_columns(
+                country.label(fields.COUNTRY.value),
+                register.label("register"),
+                func.count().label(fields.TRANSACTION_COUNT.value),
+                func.sum(self.trans_model.sum_pay).label(fields.TOTAL_AMOUNT.value),
+                func.max(hll_rank_sql(self.trans_model.user_id, precision)).label(
+                    "rank"
+                ),
+            )
+            .group_by(country, register)
+            .subquery("country_registers")
+        )
+        count = func.sum(registers.c.transaction_count)
+        total = func.sum(registers.c.total_amount)
+        metrics = {
+            "count": count.label(fields.TRANSACTION_COUNT.value),
+            "total": total.label(fields.TOTAL_AMOUNT.value),
+            "avg": (total / count).label(fields.AVERAGE_AMOUNT.value),
+        }
+        stats = select(
+            registers.c.country,
+            *metrics.values(),
+            hll_estimate_sql(registers.c.rank, precision).label(
+                fields.DISTINCT_USERS.value
+            ),
+        ).group_by(registers.c.country)
+        return stats, metrics
+
+    def get_totals_columns(
+        self,
+        source: CTE,
+        filters: TransactionFilter,
+        over: bool = False,
+        condition=None,
+    ) -> list:
+        """
+        Итоговые агрегаты по дневным суммам согласно флагам include_*.
+        При over=True агрегаты считаются оконными функциями по всем дням,
+        чтобы вернуть их вместе с дневной серией в одном запросе.
+        condition ограничивает строки источника через FILTER (WHERE ...).
+        """
+        if filters.status != APITypeStatusEnum.SUCCESSFUL:
+            return []
+
+        def total(expr):
+            if condition is not None:
+                expr = expr.filter(condition)
+            return expr.over() if over else expr
 
-    async def get_aggregated_report(
-        self, filters: TransactionFilter
-    ) -> AggregateReport:
-        # Запрос для агрегации
         base_aggr = []
-        resul_report_aggr = {}
-        if filters.status == APITypeStatusEnum.SUCCESSFUL:
-            if filters.include_avg:
-                base_aggr.append(
-                    func.avg(self.trans_model.sum_pay).label(
-                        TransactionFieldEnum.AVG_AMOUNT.value
-                    )
+        if filters.include_total:
+            base_aggr.append(
+                func.coalesce(total(func.sum(source.c.daily_total)), 0).label(
+                    TransactionFieldEnum.TOTAL_AMOUNT.value
                 )
-                resul_report_aggr.update({TransactionFieldEnum.AVG_AMOUNT.value: 0})
-            if filters.include_max:
-                base_aggr.append(
-                    func.max(self.trans_model.sum_pay).label(
-                        TransactionFieldEnum.MAX_AMOUNT.value
-                    )
-                )
-                resul_report_aggr.update({TransactionFieldEnum.MAX_AMOUNT.value: 0})
-            if filters.include_min:
-                base_aggr.append(
-                    func.min(self.trans_model.sum_pay).label(
-                        TransactionFieldEnum.MIN_AMOUNT.value
-                    )
+            )
+            base_aggr.append(
+                func.coalesce(total(func.sum(source.c.daily_count)), 0).label(
+                    TransactionFieldEnum.TRANSACTION_COUNT.value
                 )
-                resul_report_aggr.update({TransactionFieldEnum.MIN_AMOUNT.value: 0})
-            if filters.include_total:
-                base_aggr.append(
-                    func.count(self.trans_model.id).label(
-                        TransactionFieldEnum.TRANSACTION_COUNT.value
-                    )
+            )
+        if filters.include_avg:
+            base_aggr.append(
+                (
+                    total(func.sum(source.c.daily_total))
+                    / func.nullif(total(func.sum(source.c.daily_count)), 0)
+                ).label(TransactionFieldEnum.AVG_AMOUNT.value)
+            )
+        if filters.include_max:
+            base_aggr.append(
+                total(func.max(source.c.max_amount)).label(
+                    TransactionFieldEnum.MAX_AMOUNT.value
                 )
-                resul_report_aggr.update(
-                    {TransactionFieldEnum.TRANSACTION_COUNT.value: 0}
+            )
+        if filters.include_min:
+            base_aggr.append(
+                total(func.min(source.c.min_amount)).label(
+                    TransactionFieldEnum.MIN_AMOUNT.value
                 )
-            if (
-                filters.include_avg
-                or filters.include_max
-                or filters.include_min
-                or filters.include_total
+            )
+        return base_aggr
+
+    @staticmethod
+    def to_aggregate_report(mapping, totals_columns: list) -> AggregateReport:
+        resul_report_aggr = {}
+        for column in totals_columns:
+            value = mapping.get(column.name) if mapping is not None else None
+            if value is None and column.name in (
+                TransactionFieldEnum.TOTAL_AMOUNT.value,
+                TransactionFieldEnum.TRANSACTION_COUNT.value,
             ):
-                agg_query = select(*base_aggr)
-            else:
-                agg_query = select(self.trans_model)
-
-            filtered_query = await self.get_report_by_filter(agg_query, filters)
-            result = await self.session.execute(filtered_query)
-            row = result.fetchone()
-            for field in resul_report_aggr.keys():
-                resul_report_aggr.update(
-                    {field: float(row._get_by_key_impl_mapping(field))}
-                )
-            return AggregateReport(**resul_report_aggr)
-        return AggregateReport()
+                value = 0
+            resul_report_aggr.update(
+                {column.name: float(value) if value is not None else None}
+            )
+        return AggregateReport(**resul_report_aggr)
 
-    async def get_daily_shifts(self, filters: TransactionFilter):
+    async def get_aggregated_report(
+        self, filters: TransactionFilter
+    ) -> AggregateReport:
+        # Запрос для агрегации
+        source = await self.get_daily_source(filters)
+        base_aggr = self.get_totals_columns(source, filters)
+        if not base_aggr:
+            return AggregateReport()
+        result = await self.session.execute(select(*base_aggr).select_from(source))
+        row = result.fetchone()
+        return self.to_aggregate_report(row._mapping, base_aggr)
+
+    async def get_daily_cube(self, filters: TransactionFilter) -> CTE:
         """
-        Возвращает ежедневные суммы транзакций с процентным изменением
-        относительно предыдущего дня.
+        Дневные суммы в разрезе статуса и типа за диапазон дат filters
+        (статус и тип фильтра не применяются): источник для нескольких
+        фильтров сразу. Как и get_daily_source, читает роллапы и свежие транзакции.
         """
-        # Применяем фильтры к базовому запросу (это должен быть запрос с WHERE условиями)
-        cte_filtered = await self.get_report_by_filter(
-            select(self.trans_model.date_pay, self.trans_model.sum_pay), filters
+        trans = self.trans_model
+        fields = TransactionFieldEnum
+        raw_day = cast(trans.date_pay, Date)
+        raw_query = select(
+            raw_day.label(fields.DAY_DATE.value),
+            trans.status,
+            trans.type,
+            func.sum(trans.sum_pay).label(fields.DAILY_TOTAL.value),
+            func.count().label(fields.DAILY_COUNT.value),
+            func.min(trans.sum_pay).label(fields.MIN_AMOUNT.value),
+            func.max(trans.sum_pay).label(fields.MAX_AMOUNT.value),
         )
-        cte_filtered = cte_filtered.cte(
-            name=TransactionFieldEnum.FILTERED_TRANSACTION.value
+        raw_query = await self.get_report_by_filter(raw_query, filters)
+        if not self.use_rollups(filters):
+            return raw_query.group_by(raw_day, trans.status, trans.type).cte(
+                name="daily_cube"
+            )
+
+        cutoff = self.get_rollup_cutoff()
+        raw_query = raw_query.where(trans.date_pay >= cutoff).group_by(
+            raw_day, trans.status, trans.type
         )
-        # Агрегируем по дням
-        day_trunc_expr = func.date_trunc(
-            TransactionFieldEnum.DAY.value, cte_filtered.c.date_pay
+        rollup = self.rollup_model
+        # Строка роллапа уже уникальна по (день, статус, тип)
+        rollup_query = select(
+            rollup.day.label(fields.DAY_DATE.value),
+            rollup.status,
+            rollup.type,
+            rollup.total_amount.label(fields.DAILY_TOTAL.value),
+            rollup.transaction_count.label(fields.DAILY_COUNT.value),
+            rollup.min_amount,
+            rollup.max_amount,
         )
-        base_query = (
-            select(
-                day_trunc_expr.label(TransactionFieldEnum.DAY_DATE.value),
-                func.sum(cte_filtered.c.sum_pay).label(
-                    TransactionFieldEnum.DAILY_TOTAL.value
-                ),
-                func.count().label(TransactionFieldEnum.DAILY_COUNT.value),
+        rollup_query = self.filter_rollups(rollup_query, filters, cutoff)
+        return union_all(rollup_query, raw_query).cte(name="daily_cube")
+
+    async def get_batch_aggregates(
+        self, filters_list: Sequence[TransactionFilter]
+    ) -> List[AggregateReport]:
+        """
+        Итоги для нескольких фильтров одним запросом: общий источник за
+        объединённый диапазон дат, итоги каждого фильтра — условные агрегаты
+        FILTER (WHERE ...). Результаты в порядке filters_list.
+        """
+        cube = await self.get_daily_cube(
+            TransactionFilter(
+                start_date=min(f.start_date_parsed for f in filters_list).isoformat(),
+                end_date=max(f.end_date_parsed for f in filters_list).isoformat(),
             )
-            .select_from(cte_filtered)
-            .group_by(day_trunc_expr)
         )
+        per_filter = []
+        for filters in filters_list:
+            condition = and_(
+                cube.c.day_date >= filters.start_date_parsed,
+                cube.c.day_date <= filters.end_date_parsed,
+            )
+            if filters.status != APITypeStatusEnum.ALL:
+                condition = and_(condition, cube.c.status == filters.status)
+            if filters.type != APITypePayEnum.ALL:
+                condition = and_(condition, cube.c.type == filters.type)
+            per_filter.append(
+                self.get_totals_columns(cube, filters, condition=condition)
+            )
+        selected = [
+            column.element.label(f"{column.name}_{index}")
+            for index, columns in enumerate(per_filter)
+            for column in columns
+        ]
+        if not selected:
+            return [AggregateReport() for _ in filters_list]
+        result = await self.session.execute(select(*selected).select_from(cube))
+        mapping = result.fetchone()._mapping
+        return [
+            self.to_aggregate_report(
+                {column.name: mapping[f"{column.name}_{index}"] for column in columns},
+                columns,
+            )
+            for index, columns in enumerate(per_filter)
+        ]
 
-        cte_daily_totals = base_query.cte(name=TransactionFieldEnum.DAILY_TOTALS.value)
+    def build_daily_shifts_query(
+        self, cte_daily_totals: CTE, extra_columns: Sequence = ()
+    ) -> Select:
+        """
+        Дневные суммы с процентным изменением относительно предыдущего дня.
+        extra_columns (оконные агрегаты по всем дням) вычисляются в том же проходе.
+        """
         # Добавляем LAG и вычисляем процентное изменение
         with_prev = (
             select(
@@ -143,13 +719,14 @@ class TransactionRepository(BaseRepo[TransactionModel]):
                 func.lag(cte_daily_totals.c.daily_total)
                 .over(order_by=cte_daily_totals.c.day_date)
                 .label(TransactionFieldEnum.PREV_DAY_TOTAL.value),
+                *extra_columns,
             )
             .select_from(cte_daily_totals)
             .subquery()
         )
 
         # Вычисляем percentage_change
-        final_query = (
+        return (
             select(
                 with_prev.c.day_date,
                 with_prev.c.daily_total,
@@ -167,21 +744,69 @@ class TransactionRepository(BaseRepo[TransactionModel]):
                         2,
                     ),
                 ).label(TransactionFieldEnum.PERCENTAGE_CHANGE.value),
+                *[with_prev.c[column.name] for column in extra_columns],
             )
             .select_from(with_prev)
             .order_by(with_prev.c.day_date)
         )
-        result = await self.session.execute(final_query)
-        daily_data = result.fetchall()
 
-        return [
-            DailyShift(
-                date=row.day_date.date().isoformat(),
-                total_amount=float(row.daily_total) if row.daily_total else None,
-                count=row.daily_count,
-                percent_change=(
-                    float(row.percentage_change) if row.prev_day_total else None
-                ),
+    @staticmethod
+    def to_daily_shift(row) -> DailyShift:
+        return DailyShift(
+            date=row.day_date.isoformat(),
+            total_amount=float(row.daily_total) if row.daily_total else None,
+            count=int(row.daily_count),
+            percent_change=(
+                float(row.percentage_change) if row.prev_day_total else None
+            ),
+        )
+
+    @staticmethod
+    def to_daily_shift_columns(rows: Sequence[Row]) -> DailyShiftColumns:
+        """Колонки строятся сразу из строк результата, без модели на каждый день"""
+        columns = DailyShiftColumns()
+        for row in rows:
+            columns.date.append(row.day_date.isoformat())
+            columns.total_amount.append(
+                float(row.daily_total) if row.daily_total is not None else None
             )
-            for row in daily_data
-        ]
+            columns.count.append(int(row.daily_count))
+            columns.percent_change.append(
+                float(row.percentage_change) if row.prev_day_total else None
+            )
+        return columns
+
+    async def get_daily_shifts(self, filters: TransactionFilter):
+        """
+        Возвращает ежедневные суммы транзакций с процентным изменением
+        относительно предыдущего дня.
+        """
+        # Дневные суммы из роллапов и свежих транзакций
+        cte_daily_totals = await self.get_daily_source(filters)
+        result = await self.session.execute(
+            self.build_daily_shifts_query(cte_daily_totals)
+        )
+        return [self.to_daily_shift(row) for row in result.fetchall()]
+
+    async def get_report(
+        self, filters: TransactionFilter, columnar: bool = False
+    ) -> Tuple[AggregateReport, Optional[Union[List[DailyShift], DailyShiftColumns]]]:
+        """
+        Итоги и дневная серия одним запросом: отфильтрованные данные
+        читаются один раз, итоги считаются оконными агрегатами по дням.
+        При columnar дневная серия возвращается колонками.
+        """
+        if not filters.include_daily_shift:
+            return await self.get_aggregated_report(filters), None
+        source = await self.get_daily_source(filters)
+        totals_columns = self.get_totals_columns(source, filters, over=True)
+        result = await self.session.execute(
+            self.build_daily_shifts_query(source, totals_columns)
+        )
+        rows = result.fetchall()
+        aggregated = self.to_aggregate_report(
+            rows[0]._mapping if rows else None, totals_columns
+        )
+        if columnar:
+            return aggregated, self.to_daily_shift_columns(rows)
+        return aggregated, [self.to_daily_shift(row) for row in rows]
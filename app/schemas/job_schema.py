@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.enums.enum_job import JobKindEnum, JobStatusEnum
+
+
+class JobInfo(BaseModel):
+    id: str
+    kind: JobKindEnum
+    status: JobStatusEnum
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class JobQueueStats(BaseModel):
+    workers: int
+    queued: int
+    running: int
+    stored: int
+    max_queued: int
@@ -1,20 +1,32 @@
 from fastapi import HTTPException
-from pydantic import BaseModel, Field, model_validator, field_validator
+from pydantic import (
+    BaseModel,
+    Field,
+    model_validator,
+    field_validator,
+    computed_field,
+)
 from datetime import date, timedelta
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Dict
 
 from starlette import status
 
+from app.enums.enum_sample import SampleMethodEnum
 from app.enums.enum_status import APITypeStatusEnum
 from app.enums.enum_type_pay import APITypePayEnum
 
 
 class TransactionFilter(BaseModel):
+    # validate_default: умолчания подставляются и при создании фильтра из тела запроса
     start_date: Optional[str] = Field(
-        default=None, description="Начало периода (формат: YYYY-MM-DD)"
+        default=None,
+        validate_default=True,
+        description="Начало периода (формат: YYYY-MM-DD)",
     )
     end_date: Optional[str] = Field(
-        default=None, description="Конец периода (формат: YYYY-MM-DD)"
+        default=None,
+        validate_default=True,
+        description="Конец периода (формат: YYYY-MM-DD)",
     )
     status: APITypeStatusEnum = APITypeStatusEnum.ALL
     type: APITypePayEnum = APITypePayEnum.ALL
@@ -22,6 +34,9 @@ class TransactionFilter(BaseModel):
     include_avg: bool = False
     include_min: bool = False
     include_max: bool = False
+    include_median: bool = False
+    include_percentiles: bool = False
+    include_distinct_users: bool = False
     include_daily_shift: bool = False
     full_info_data: bool = False
 
@@ -65,6 +80,8 @@ class TransactionFilter(BaseModel):
             "include_avg",
             "include_min",
             "include_max",
+            "include_median",
+            "include_percentiles",
         ]
         has_aggregation_enabled = any(
             getattr(self, field) for field in aggregation_fields
@@ -87,6 +104,22 @@ class CountryStatsFilter(BaseModel):
     top_n: Optional[int] = Field(
         default=None, description="Ограничение количества стран", ge=1
     )
+    include_distinct_users: bool = Field(
+        default=False, description="Оценка числа различных пользователей (HLL)"
+    )
+
+
+class SamplingParams(BaseModel):
+    approximate: bool = Field(
+        default=False, description="Оценка по выборке TABLESAMPLE вместо точного отчёта"
+    )
+    sample_pct: Optional[float] = Field(
+        default=None,
+        gt=0,
+        le=100,
+        description="Процент выборки; по умолчанию подбирается под APPROX_SAMPLE_ROWS строк",
+    )
+    sample_method: SampleMethodEnum = SampleMethodEnum.SYSTEM
 
 
 class AggregateReport(BaseModel):
@@ -97,22 +130,21 @@ class AggregateReport(BaseModel):
     max_amount: Optional[float] = None
 
 
-class CSVData(BaseModel):
-    country: str
-    list_id_user_country: List[int]
-
-
-class CSVDataList(BaseModel):
-    list_id_for_search: List[int] = []
-    list_id_data_csv: List[CSVData] = []
-    list_for_frame_user_country: List[dict] = []
-
-
 class CountryStat(BaseModel):
     country: str
     transaction_count: int
     total_amount: float
     average_amount: float
+    distinct_users: Optional[int] = None
+
+
+class CountryDatasetInfo(BaseModel):
+    id: int
+    filename: str
+    content_hash: str
+    row_count: int
+    # False — такой же файл уже загружали, возвращён существующий набор
+    created: bool
 
 
 class CountryReportResponse(BaseModel):
@@ -124,6 +156,7 @@ class DailyShift(BaseModel):
     total_amount: float
     count: int
     percent_change: Optional[float] = None
+    distinct_users: Optional[int] = None
 
 
 class ReportResponse(BaseModel):
@@ -132,4 +165,86 @@ class ReportResponse(BaseModel):
     avg_amount: Optional[float] = None
     min_amount: Optional[float] = None
     max_amount: Optional[float] = None
+    median_amount: Optional[float] = None
+    # Квантили сумм с ключами вида p95, оценка по скетчам роллапов
+    percentiles: Optional[Dict[str, Optional[float]]] = None
+    # Оценка HyperLogLog, ошибка ~1.04/sqrt(2^HLL_PRECISION)
+    distinct_users: Optional[int] = None
     daily_shifts: Optional[List[DailyShift]] = None
+
+
+class BatchReportRequest(BaseModel):
+    filters: List[TransactionFilter] = Field(min_length=1, max_length=50)
+
+
+class BatchReportResponse(BaseModel):
+    """Отчёты в порядке фильтров запроса"""
+
+    reports: List[ReportResponse]
+
+
+class DailyShiftColumns(BaseModel):
+    """Дневная серия по колонкам: i-й элемент каждого списка относится к одному дню"""
+
+    date: List[str] = []
+    total_amount: List[Optional[float]] = []
+    count: List[int] = []
+    percent_change: List[Optional[float]] = []
+    distinct_users: Optional[List[Optional[int]]] = None
+
+
+class ReportColumnarResponse(BaseModel):
+    total_amount: Optional[float] = None
+    transaction_count: Optional[float] = None
+    avg_amount: Optional[float] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    median_amount: Optional[float] = None
+    # Квантили сумм с ключами вида p95, оценка по скетчам роллапов
+    percentiles: Optional[Dict[str, Optional[float]]] = None
+    # Оценка HyperLogLog, ошибка ~1.04/sqrt(2^HLL_PRECISION)
+    distinct_users: Optional[int] = None
+    daily_shifts: Optional[DailyShiftColumns] = None
+
+
+class EstimateInterval(BaseModel):
+    value: Optional[float] = None
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+
+class ApproximateReportResponse(BaseModel):
+    """
+    Оценка итогов по выборке. min/max — по выборке: истинный минимум
+    не больше min_amount, истинный максимум не меньше max_amount.
+    """
+
+    sample_method: SampleMethodEnum
+    sample_pct: float
+    sampled_rows: int
+    confidence: float
+    transaction_count: EstimateInterval
+    total_amount: Optional[EstimateInterval] = None
+    avg_amount: Optional[EstimateInterval] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0
+    size: int = 0
+
+    @computed_field
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return round(self.hits / total, 4) if total else 0.0
+
+
+class SingleFlightStats(BaseModel):
+    executions: int = 0
+    coalesced: int = 0
+    errors: int = 0
+    in_flight: int = 0
@@ -0,0 +1,32 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.core.metrics import HistogramSnapshot
+
+
+class PoolStats(BaseModel):
+    pool_size: int
+    max_overflow: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    waiting: int
+    checkouts_total: int
+    timeouts_total: int
+    wait_seconds: HistogramSnapshot
+
+
+class ReplicaStats(BaseModel):
+    configured: bool
+    healthy: bool = False
+    # Отставание при последней проверке, секунды
+    lag_seconds: Optional[float] = None
+    # Сколько секунд назад была последняя проверка
+    checked_ago_seconds: Optional[float] = None
+    last_error: Optional[str] = None
+    replica_reads_total: int = 0
+    primary_reads_total: int = 0
+    # Из них из-за недоступности или отставания реплики
+    fallbacks_total: int = 0
+    pool: Optional[PoolStats] = None
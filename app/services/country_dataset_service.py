@@ -0,0 +1,82 @@
+import hashlib
+from typing import BinaryIO
+
+from fastapi import Depends
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db_connector import get_db
+from app.core.executor import cpu_executor
+from app.core.request_metrics import timed_iter
+from app.core.settings import settings
+from app.repo.country_dataset_repo import CountryDatasetRepository
+from app.schemas.report_schema import CountryDatasetInfo
+from app.services.base_services import BaseServices
+from app.services.utils.utils_pandas_frame import iter_user_countries
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(file: BinaryIO) -> str:
+    """sha256 содержимого файла, позиция чтения возвращается в начало"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    while block := file.read(HASH_BLOCK_SIZE):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class CountryDatasetServices(BaseServices):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.dataset_repo = CountryDatasetRepository(self.session)
+
+    async def upload_dataset(
+        self, countries_file: BinaryIO, filename: str
+    ) -> CountryDatasetInfo:
+        """
+        Сохраняет соответствие пользователь → страна из CSV как версию набора.
+        Повторная загрузка того же файла не разбирается и возвращает прежний набор.
+        """
+        content_hash = await cpu_executor.run(file_sha256, countries_file)
+        existing = await self.dataset_repo.get_by_hash(content_hash)
+        if existing is not None:
+            return self.to_dataset_info(existing, created=False)
+
+        chunks = timed_iter(
+            iter_user_countries(countries_file, filename, settings.CSV_CHUNK_SIZE),
+            "pandas",
+        )
+        try:
+            dataset = await self.dataset_repo.create_dataset(content_hash, filename)
+            dataset.row_count = await self.dataset_repo.load_user_countries(
+                dataset.id, cpu_executor.iterate(chunks)
+            )
+            await self.session.commit()
+        except IntegrityError:
+            # Тот же файл параллельно загрузили в другом запросе
+            await self.session.rollback()
+            existing = await self.dataset_repo.get_by_hash(content_hash)
+            return self.to_dataset_info(existing, created=False)
+        except Exception:
+            await self.session.rollback()
+            raise
+        self.log.info(f"Загружен набор стран {dataset.id}: {dataset.row_count} строк")
+        return self.to_dataset_info(dataset, created=True)
+
+    @staticmethod
+    def to_dataset_info(dataset, created: bool) -> CountryDatasetInfo:
+        return CountryDatasetInfo(
+            id=dataset.id,
+            filename=dataset.filename,
+            content_hash=dataset.content_hash,
+            row_count=dataset.row_count,
+            created=created,
+        )
+
+
+async def country_dataset_services(
+    session: AsyncSession = Depends(get_db),
+) -> CountryDatasetServices:
+    return CountryDatasetServices(session)
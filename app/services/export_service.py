@@ -0,0 +1,52 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+from app.core.db_connector import SessionLocal
+from app.core.settings import settings
+from app.enums.enum_export import ExportFormatEnum
+from app.repo.transaction_repo import TransactionRepository
+from app.schemas.report_schema import TransactionFilter
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormatEnum.CSV: "text/csv",
+    ExportFormatEnum.NDJSON: "application/x-ndjson",
+}
+
+
+async def stream_transactions_export(
+    filters: TransactionFilter,
+    export_format: ExportFormatEnum,
+    queue_size: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Отдаёт выгрузку COPY кусками байтов. Очередь ограничена, поэтому
+    при медленном клиенте COPY ждёт, а не копит результат в памяти.
+    Сессия своя: генератор работает уже после выхода из эндпоинта.
+    """
+    queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(
+        maxsize=queue_size or settings.EXPORT_QUEUE_SIZE
+    )
+    errors = []
+
+    async def produce() -> None:
+        try:
+            async with SessionLocal() as session:
+                repo = TransactionRepository(session)
+                await repo.copy_export(filters, export_format, queue.put)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            errors.append(e)
+        await queue.put(None)
+
+    task = asyncio.create_task(produce())
+    try:
+        while (chunk := await queue.get()) is not None:
+            yield chunk
+        if errors:
+            raise errors[0]
+    finally:
+        # Клиент отключился — прерываем COPY и возвращаем соединение в пул
+        if not task.done():
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
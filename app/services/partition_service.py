@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import logging
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db_connector import SessionLocal
+from app.core.settings import settings
+from app.repo.partition_repo import PartitionRepository, add_months, month_start
+from app.services.base_services import BaseServices
+
+
+class PartitionServices(BaseServices):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.partition_repo = PartitionRepository(self.session)
+
+    async def ensure_future_partitions(
+        self, months_ahead: int, today: Optional[date] = None
+    ) -> int:
+        """Держит партиции на months_ahead месяцев вперёд, чтобы default пустовал"""
+        start = month_start(today or date.today())
+        end = add_months(start, months_ahead)
+        try:
+            created = await self.partition_repo.create_partitions(start, end)
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        if created:
+            self.log.info(f"Создано месячных партиций transactions: {created}")
+        return created
+
+    async def detach_month(self, month: date) -> str:
+        """Отсоединяет партицию месяца и удаляет его роллапы одной транзакцией"""
+        try:
+            name = await self.partition_repo.detach_partition(
+                month, settings.PARTITION_DETACH_LOCK_TIMEOUT_SEC
+            )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        self.log.info(f"Партиция {name} отсоединена от transactions")
+        return name
+
+
+async def ensure_future_partitions_once(
+    months_ahead: int = settings.PARTITION_MONTHS_AHEAD,
+) -> int:
+    async with SessionLocal() as session:
+        return await PartitionServices(session).ensure_future_partitions(months_ahead)
+
+
+async def maintain_partitions_periodically(interval_sec: int) -> None:
+    """Фоновое создание будущих партиций, запускается из lifespan приложения"""
+    while True:
+        try:
+            await ensure_future_partitions_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"❌ Ошибка при создании партиций transactions: {e}")
+        await asyncio.sleep(interval_sec)
+
+
+async def detach_month(month: date) -> str:
+    async with SessionLocal() as session:
+        return await PartitionServices(session).detach_month(month)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Партиции таблицы transactions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure = commands.add_parser("ensure", help="Создать будущие партиции")
+    ensure.add_argument(
+        "--months-ahead", type=int, default=settings.PARTITION_MONTHS_AHEAD
+    )
+    detach = commands.add_parser("detach", help="Отсоединить партицию месяца")
+    detach.add_argument("month", type=date.fromisoformat, help="YYYY-MM-01")
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command == "ensure":
+        await ensure_future_partitions_once(args.months_ahead)
+    else:
+        await detach_month(args.month)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
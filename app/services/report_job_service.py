@@ -0,0 +1,44 @@
+from typing import Any, Dict, List
+
+from app.core.db_connector import SessionLocal
+from app.core.job_queue import JobQueue
+from app.core.settings import settings
+from app.enums.enum_job import JobKindEnum
+from app.schemas.job_schema import JobInfo
+from app.schemas.report_schema import TransactionFilter, CountryStatsFilter
+from app.services.report_service import ReportServices
+
+# Общая для процесса очередь, воркеры запускаются из lifespan приложения
+report_jobs = JobQueue(
+    workers=settings.REPORT_JOB_WORKERS,
+    max_queued=settings.REPORT_JOB_MAX_QUEUED,
+    result_ttl_sec=settings.REPORT_JOB_RESULT_TTL_SEC,
+)
+
+
+async def run_report_job(filters: TransactionFilter) -> Dict[str, Any]:
+    # Своя сессия: задача живёт дольше HTTP-запроса, который её создал
+    async with SessionLocal() as session:
+        report = await ReportServices(session).get_all_report_by_filter(filters)
+    return report.model_dump(mode="json")
+
+
+async def run_country_report_job(
+    dataset_id: int, filters: CountryStatsFilter
+) -> List[Dict[str, Any]]:
+    async with SessionLocal() as session:
+        stats = await ReportServices(session).get_report_country_by_dataset(
+            dataset_id, filters
+        )
+    return [stat.model_dump(mode="json") for stat in stats]
+
+
+def submit_report_job(filters: TransactionFilter) -> JobInfo:
+    return report_jobs.submit(JobKindEnum.REPORT, lambda: run_report_job(filters))
+
+
+def submit_country_report_job(dataset_id: int, filters: CountryStatsFilter) -> JobInfo:
+    return report_jobs.submit(
+        JobKindEnum.COUNTRY_REPORT,
+        lambda: run_country_report_job(dataset_id, filters),
+    )
@@ -1,92 +1,289 @@
+import asyncio
+from typing import BinaryIO, Dict, List, Sequence, Union
+
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.core.db_connector import get_db
+from app.core.db_connector import (
+    get_db,
+    get_read_db,
+    read_session_factory,
+    replica_router,
+    SessionLocal,
+)
+from app.core.executor import cpu_executor
+from app.core.request_metrics import timed_iter
+from app.core.settings import settings
+from app.repo.country_dataset_repo import CountryDatasetRepository
 from app.repo.transaction_repo import TransactionRepository
 from app.schemas.report_schema import (
     TransactionFilter,
     ReportResponse,
+    ReportColumnarResponse,
+    DailyShiftColumns,
     CountryStatsFilter,
-    CountryReportResponse,
     CountryStat,
+    SamplingParams,
+    ApproximateReportResponse,
 )
 from app.services.base_services import BaseServices
-from app.services.utils.utils_pandas_frame import get_user_id_for_n_countries
+from app.services.utils.report_cache import (
+    ReportCache,
+    InMemoryCacheBackend,
+    make_filter_key,
+)
+from app.services.utils.single_flight import SingleFlight
+from app.services.utils.utils_pandas_frame import iter_user_countries
+from app.services.utils.utils_sampling import SampleTotals, estimate_from_sample
+from app.services.utils.utils_sketch import AmountSketch, REPORT_PERCENTILES
+
+# Общий для процесса кэш отчётов, бэкенд можно заменить через report_cache.set_backend
+report_cache = ReportCache(
+    InMemoryCacheBackend(
+        max_size=settings.REPORT_CACHE_MAX_SIZE, ttl_sec=settings.REPORT_CACHE_TTL_SEC
+    )
+)
+# Объединение одинаковых одновременных отчётов в одно выполнение
+report_flight = SingleFlight()
 
 
 class ReportServices(BaseServices):
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self, session: AsyncSession, session_factory: async_sessionmaker = SessionLocal
+    ):
         super().__init__(session)
+        # Откуда брать дополнительные сессии: та же БД, что и у session
+        self.session_factory = session_factory
         self.report_repo = TransactionRepository(self.session)
+        self.dataset_repo = CountryDatasetRepository(self.session)
 
     async def get_all_report_by_filter(
-        self, filters: TransactionFilter
-    ) -> ReportResponse:
-        # Получаем агрегированные данные
-        aggregated = await self.report_repo.get_aggregated_report(filters)
-        # Получаем данные по дням, если нужно
-        return ReportResponse(
+        self, filters: TransactionFilter, columnar: bool = False
+    ) -> Union[ReportResponse, ReportColumnarResponse]:
+        response_model = ReportColumnarResponse if columnar else ReportResponse
+        # Реплика может отставать: её результаты не смешиваются с основной БД
+        key = f"{self.data_source}:" + make_filter_key(response_model.__name__, filters)
+        if not settings.REPORT_CACHE_ENABLED:
+            return await self.coalesce(
+                key, lambda: self.build_report_by_filter(filters, columnar)
+            )
+        watermark = await self.report_repo.get_data_watermark()
+        cached = await report_cache.get(key, watermark)
+        if cached is not None:
+            return response_model.model_validate(cached)
+
+        async def build_and_cache():
+            report = await self.build_report_by_filter(filters, columnar)
+            await report_cache.set(key, watermark, report.model_dump(mode="json"))
+            return report
+
+        # watermark в ключе: после изменения данных не присоединяемся к старому запросу
+        return await self.coalesce(f"{key}@{watermark}", build_and_cache)
+
+    @property
+    def data_source(self) -> str:
+        """Откуда читает сервис: replica или primary"""
+        if self.session_factory is replica_router.replica:
+            return "replica"
+        return "primary"
+
+    @staticmethod
+    async def coalesce(key: str, func):
+        if not settings.REPORT_COALESCE_ENABLED:
+            return await func()
+        return await report_flight.do(key, func)
+
+    async def get_batch_report(
+        self, filters_list: Sequence[TransactionFilter]
+    ) -> List[ReportResponse]:
+        """
+        Отчёты по нескольким фильтрам, в порядке filters_list.
+        Одинаковые фильтры считаются один раз. Фильтры только с итогами
+        считаются одним запросом с условными агрегатами на сессии сервиса,
+        остальные (дневная серия, квантили, distinct_users) — параллельно,
+        каждый на своей сессии, не больше BATCH_REPORT_CONCURRENCY сразу.
+        """
+        unique: Dict[str, TransactionFilter] = {}
+        keys = []
+        for filters in filters_list:
+            key = make_filter_key(ReportResponse.__name__, filters)
+            unique.setdefault(key, filters)
+            keys.append(key)
+        simple = {
+            key: filters
+            for key, filters in unique.items()
+            if self.is_totals_only(filters)
+        }
+        semaphore = asyncio.Semaphore(settings.BATCH_REPORT_CONCURRENCY)
+
+        async def build_separately(filters: TransactionFilter) -> ReportResponse:
+            async with semaphore:
+                return await build_report_in_new_session(filters, self.session_factory)
+
+        async def build_totals() -> List[ReportResponse]:
+            if not simple:
+                return []
+            aggregates = await self.report_repo.get_batch_aggregates(
+                list(simple.values())
+            )
+            return [ReportResponse(**aggr.model_dump()) for aggr in aggregates]
+
+        separate = [key for key in unique if key not in simple]
+        totals, *reports = await asyncio.gather(
+            build_totals(),
+            *(build_separately(unique[key]) for key in separate),
+        )
+        results = dict(zip(simple, totals))
+        results.update(zip(separate, reports))
+        return [results[key] for key in keys]
+
+    @staticmethod
+    def is_totals_only(filters: TransactionFilter) -> bool:
+        """Отчёт сводится к итогам, которые можно посчитать условными агрегатами"""
+        return not (
+            filters.include_daily_shift
+            or filters.include_median
+            or filters.include_percentiles
+            or filters.include_distinct_users
+        )
+
+    async def build_report_by_filter(
+        self, filters: TransactionFilter, columnar: bool = False
+    ) -> Union[ReportResponse, ReportColumnarResponse]:
+        # Итоги и данные по дням получаем одним запросом
+        aggregated, daily_shifts = await self.report_repo.get_report(
+            filters, columnar=columnar
+        )
+        response_model = ReportColumnarResponse if columnar else ReportResponse
+        report = response_model(
             total_amount=aggregated.total_amount,
             transaction_count=aggregated.transaction_count,
             avg_amount=aggregated.avg_amount,
             min_amount=aggregated.min_amount,
             max_amount=aggregated.max_amount,
-            daily_shifts=(
-                await self.report_repo.get_daily_shifts(filters)
-                if filters.include_daily_shift
-                else None
-            ),
+            daily_shifts=daily_shifts,
         )
+        if filters.include_median or filters.include_percentiles:
+            # Квантили по слитым скетчам дней вместо сортировки всех строк
+            sketch = AmountSketch.from_rows(
+                await self.report_repo.get_amount_sketch(filters)
+            )
+            if filters.include_median:
+                report.median_amount = sketch.quantile(0.5)
+            if filters.include_percentiles:
+                report.percentiles = sketch.quantiles(REPORT_PERCENTILES)
+        if filters.include_distinct_users:
+            await self.add_distinct_users(report, filters)
+        return report
+
+    async def add_distinct_users(
+        self,
+        report: Union[ReportResponse, ReportColumnarResponse],
+        filters: TransactionFilter,
+    ) -> None:
+        """Оценки различных пользователей: за период и по дням дневной серии"""
+        report.distinct_users = await self.report_repo.get_distinct_users(filters)
+        if report.daily_shifts is None:
+            return
+        by_day = await self.report_repo.get_daily_distinct_users(filters)
+        if isinstance(report.daily_shifts, DailyShiftColumns):
+            columns = report.daily_shifts
+            columns.distinct_users = [by_day.get(day, 0) for day in columns.date]
+        else:
+            for shift in report.daily_shifts:
+                shift.distinct_users = by_day.get(shift.date, 0)
 
-    async def get_report_country(self, countries_csv: str, filters: CountryStatsFilter):
-        list_user_country_data = get_user_id_for_n_countries(countries_csv, filters)
-        list_trans = await self.report_repo.get_trans_user_ids(
-            list_user_country_data.list_id_for_search
+    async def get_approximate_report(
+        self, filters: TransactionFilter, sampling: SamplingParams
+    ) -> ApproximateReportResponse:
+        """
+        Оценка итогов по выборке TABLESAMPLE. Если sample_pct не задан, процент
+        подбирается так, чтобы в выборку попало около APPROX_SAMPLE_ROWS строк всей
+        таблицы: время ответа не растёт вместе с таблицей, растёт только интервал.
+        """
+        if filters.include_daily_shift:
+            raise ValueError("approximate не поддерживает include_daily_shift")
+        sample_pct = sampling.sample_pct
+        if sample_pct is None:
+            estimated_rows = await self.report_repo.get_row_estimate()
+            sample_pct = 100.0
+            if estimated_rows > settings.APPROX_SAMPLE_ROWS:
+                sample_pct = settings.APPROX_SAMPLE_ROWS / estimated_rows * 100
+        row = await self.report_repo.get_sample_totals(
+            filters, sampling.sample_method, sample_pct
         )
-        # Создаём DataFrame из транзакций
-        trans_data = [
-            {
-                "user_id": t.user_id,
-                "amount": float(t.sum_pay),
-            }  # используем sum_pay, конвертируем в float
-            for t in list_trans
-        ]
-        df_trans = pd.DataFrame(trans_data)
-        if df_trans.empty:
-            return CountryReportResponse(stats=[])
-
-        df_countries = pd.DataFrame(list_user_country_data.list_for_frame_user_country)
-        # Объединяем транзакции с странами
-        df_joined = df_trans.merge(df_countries, on="user_id", how="inner")
-        # Агрегируем по странам
-        agg_stats = (
-            df_joined.groupby("country")
-            .agg(
-                transaction_count=("amount", "count"),
-                total_amount=("amount", "sum"),
-                average_amount=("amount", "mean"),
-            )
-            .reset_index()
+        totals = SampleTotals(
+            *(float(value or 0) for value in row[:5]),
+            min_amount=float(row.min_amount) if row.min_amount is not None else None,
+            max_amount=float(row.max_amount) if row.max_amount is not None else None,
+        )
+        estimates = estimate_from_sample(
+            totals, sample_pct / 100, settings.APPROX_CONFIDENCE
+        )
+        return ApproximateReportResponse(
+            sample_method=sampling.sample_method,
+            sample_pct=sample_pct,
+            sampled_rows=int(totals.rows),
+            confidence=settings.APPROX_CONFIDENCE,
+            transaction_count=estimates.transaction_count,
+            total_amount=estimates.total_amount if filters.include_total else None,
+            avg_amount=estimates.avg_amount if filters.include_avg else None,
+            min_amount=totals.min_amount if filters.include_min else None,
+            max_amount=totals.max_amount if filters.include_max else None,
         )
-        # Сортировка
-        sort_column = {
-            "count": "transaction_count",
-            "total": "total_amount",
-            "avg": "average_amount",
-        }.get(filters.sort_by or "count", "transaction_count")
-        agg_stats = agg_stats.sort_values(by=sort_column, ascending=True)
-        stats = [
+
+    async def get_report_country(
+        self, countries_file: BinaryIO, filename: str, filters: CountryStatsFilter
+    ):
+        chunks = timed_iter(
+            iter_user_countries(countries_file, filename, settings.CSV_CHUNK_SIZE),
+            "pandas",
+        )
+        # Пачки из CSV сразу уходят в COPY, соединение и агрегация
+        # выполняются в PostgreSQL, в python возвращаются только строки по странам
+        # Разбор CSV идёт в пуле потоков и не блокирует event loop
+        await self.report_repo.load_user_countries(cpu_executor.iterate(chunks))
+        rows = await self.report_repo.get_country_report(filters)
+        return self.to_country_stats(rows)
+
+    async def get_report_country_by_dataset(
+        self, dataset_id: int, filters: CountryStatsFilter
+    ) -> List[CountryStat]:
+        """Отчёт по сохранённому набору: без разбора и передачи CSV"""
+        if await self.dataset_repo.get_by_id(dataset_id) is None:
+            raise LookupError(f"Набор стран {dataset_id} не найден")
+        rows = await self.report_repo.get_country_report(filters, dataset_id=dataset_id)
+        return self.to_country_stats(rows)
+
+    @staticmethod
+    def to_country_stats(rows: Sequence) -> List[CountryStat]:
+        return [
             CountryStat(
-                country=row["country"],
-                transaction_count=int(row["transaction_count"]),
-                total_amount=row["total_amount"],
-                average_amount=row["average_amount"],
+                country=row.country,
+                transaction_count=row.transaction_count,
+                total_amount=float(row.total_amount),
+                average_amount=float(row.average_amount),
+                distinct_users=getattr(row, "distinct_users", None),
             )
-            for _, row in agg_stats.iterrows()
+            for row in rows
         ]
-        return stats
+
+
+async def build_report_in_new_session(
+    filters: TransactionFilter, session_factory: async_sessionmaker = SessionLocal
+) -> ReportResponse:
+    async with session_factory() as session:
+        service = ReportServices(session, session_factory)
+        return await service.get_all_report_by_filter(filters)
 
 
 async def report_services(session: AsyncSession = Depends(get_db)) -> ReportServices:
     return ReportServices(session)
+
+
+async def report_read_services(
+    session: AsyncSession = Depends(get_read_db),
+    session_factory: async_sessionmaker = Depends(read_session_factory),
+) -> ReportServices:
+    """Сервис только для чтения: на реплике, если она подходит по max_staleness"""
+    return ReportServices(session, session_factory)
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db_connector import SessionLocal
+from app.core.settings import settings
+from app.repo.rollup_repo import RollupRepository
+from app.services.base_services import BaseServices
+
+
+class RollupServices(BaseServices):
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.rollup_repo = RollupRepository(self.session)
+
+    async def refresh_daily_rollups(self) -> Optional[List[date]]:
+        try:
+            days = await self.rollup_repo.refresh_daily_rollups()
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        if days is None:
+            self.log.info("Дневные роллапы пересобраны полностью")
+        else:
+            self.log.info(f"Дневные роллапы пересчитаны за {len(days)} дн.")
+        return days
+
+
+async def refresh_daily_rollups_once() -> Optional[List[date]]:
+    async with SessionLocal() as session:
+        return await RollupServices(session).refresh_daily_rollups()
+
+
+async def refresh_daily_rollups_periodically(interval_sec: int) -> None:
+    """Фоновый пересчёт роллапов, запускается из lifespan приложения"""
+    while True:
+        try:
+            await refresh_daily_rollups_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"❌ Ошибка при пересчёте дневных роллапов: {e}")
+        await asyncio.sleep(interval_sec)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(refresh_daily_rollups_once())
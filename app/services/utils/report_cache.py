@@ -0,0 +1,100 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.schemas.report_schema import CacheStats
+
+
+class CacheBackend(ABC):
+    """
+    Хранилище кэша отчётов. По умолчанию — память процесса,
+    общий для воркеров бэкенд (например, Redis) подключается через set_backend.
+    Значения — JSON-совместимые объекты.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def size(self) -> int: ...
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """LRU с ограничением размера и временем жизни записей"""
+
+    def __init__(self, max_size: int, ttl_sec: float):
+        self.max_size = max_size
+        self.ttl_sec = ttl_sec
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._items[key] = (time.monotonic() + self.ttl_sec, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._items.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._items)
+
+
+def make_filter_key(prefix: str, filters: BaseModel) -> str:
+    """Ключ по нормализованному фильтру: значения по умолчанию уже подставлены валидаторами"""
+    return f"{prefix}:" + json.dumps(
+        filters.model_dump(mode="json"), sort_keys=True, separators=(",", ":")
+    )
+
+
+class ReportCache:
+    """
+    Кэш результатов отчётов. Запись валидна, пока не изменился watermark данных
+    (счётчик изменений таблицы транзакций) и не истёк TTL бэкенда.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.stats = CacheStats()
+
+    def set_backend(self, backend: CacheBackend) -> None:
+        self.backend = backend
+
+    async def get(self, key: str, watermark: int) -> Optional[Any]:
+        entry = await self.backend.get(key)
+        if entry is not None and entry["watermark"] != watermark:
+            self.stats.stale += 1
+            await self.backend.delete(key)
+            entry = None
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return entry["value"]
+
+    async def set(self, key: str, watermark: int, value: Any) -> None:
+        await self.backend.set(key, {"watermark": watermark, "value": value})
+
+    def get_stats(self) -> CacheStats:
+        return self.stats.model_copy(update={"size": self.backend.size()})
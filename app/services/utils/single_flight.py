@@ -0,0 +1,66 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Generic, TypeVar
+
+from app.schemas.report_schema import SingleFlightStats
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Call(Generic[T]):
+    task: "asyncio.Task[T]"
+    waiters: int = 1
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов: пока вычисление по ключу
+    выполняется, новые вызовы с тем же ключом ждут его результат (или исключение),
+    а не запускают своё.
+
+    Вычисление идёт отдельной задачей. Отмена одного из ожидающих его не прерывает;
+    задача отменяется, только когда ушли все ожидающие. Запустивший вычисление
+    при отмене дожидается его завершения, если результат ещё кому-то нужен:
+    вычисление использует его сессию БД.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.stats = SingleFlightStats()
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is not None:
+            self.stats.coalesced += 1
+            call.waiters += 1
+            return await self._wait(call, leader=False)
+
+        self.stats.executions += 1
+        call = _Call(task=asyncio.ensure_future(func()))
+        self._calls[key] = call
+        call.task.add_done_callback(lambda _: self._forget(key, call))
+        return await self._wait(call, leader=True)
+
+    async def _wait(self, call: _Call, leader: bool):
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            call.waiters -= 1
+            if call.task.done():
+                raise
+            if call.waiters == 0:
+                call.task.cancel()
+            elif leader:
+                await asyncio.wait({call.task})
+            raise
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # exception() заодно помечает исключение полученным для asyncio
+        if not call.task.cancelled() and call.task.exception() is not None:
+            self.stats.errors += 1
+
+    def get_stats(self) -> SingleFlightStats:
+        return self.stats.model_copy(update={"in_flight": len(self._calls)})
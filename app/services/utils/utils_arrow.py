@@ -0,0 +1,42 @@
+import importlib.util
+import json
+
+from app.schemas.report_schema import ReportColumnarResponse, DailyShiftColumns
+
+
+def arrow_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def report_to_arrow_ipc(report: ReportColumnarResponse) -> bytes:
+    """
+    Дневная серия как Arrow IPC stream: одна колонка на поле DailyShift.
+    Итоги отчёта передаются в метаданных схемы под ключом report.
+    """
+    import pyarrow as pa
+
+    columns = report.daily_shifts or DailyShiftColumns()
+    totals = report.model_dump(mode="json", exclude={"daily_shifts"})
+    schema = pa.schema(
+        [
+            ("date", pa.string()),
+            ("total_amount", pa.float64()),
+            ("count", pa.int64()),
+            ("percent_change", pa.float64()),
+        ],
+        metadata={"report": json.dumps(totals)},
+    )
+    arrays = [
+        pa.array(columns.date, pa.string()),
+        pa.array(columns.total_amount, pa.float64()),
+        pa.array(columns.count, pa.int64()),
+        pa.array(columns.percent_change, pa.float64()),
+    ]
+    if columns.distinct_users is not None:
+        schema = schema.append(pa.field("distinct_users", pa.int64()))
+        arrays.append(pa.array(columns.distinct_users, pa.int64()))
+    batch = pa.record_batch(arrays, schema=schema)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,96 @@
+import math
+
+from sqlalchemy import (
+    BigInteger,
+    Float,
+    Integer,
+    SmallInteger,
+    Text,
+    case,
+    cast,
+    func,
+    literal,
+)
+from sqlalchemy.dialects.postgresql import BIT
+
+# Точность регистров в роллапах (2^14 регистров, ошибка ~0.8%). Запросы сворачивают
+# их до HLL_PRECISION; поднять выше можно только с пересборкой роллапов
+HLL_STORED_PRECISION = 14
+HLL_MIN_PRECISION = 4
+# hashint4 даёт 32 бита хэша
+HLL_HASH_BITS = 32
+
+
+def hll_relative_error(precision: int) -> float:
+    """Стандартная ошибка оценки HyperLogLog при 2^precision регистрах"""
+    return 1.04 / math.sqrt(2**precision)
+
+
+def _const(value: int, type_=BigInteger):
+    # Литералом, чтобы выражения в SELECT и GROUP BY совпадали текстуально
+    return literal(value, type_, literal_execute=True)
+
+
+def _first_one(bits, width: int):
+    """Позиция первой единицы в младших width битах (с 1), width + 1 если их нет"""
+    position = func.strpos(cast(cast(bits, BIT(width)), Text), "1")
+    return cast(func.coalesce(func.nullif(position, 0), width + 1), SmallInteger)
+
+
+def _user_hash(user_id):
+    return func.hashint4(user_id).op("&")(_const(2**HLL_HASH_BITS - 1))
+
+
+def hll_register_sql(user_id, precision: int):
+    """Номер регистра: старшие precision бит хэша user_id"""
+    shift = HLL_HASH_BITS - precision
+    return cast(
+        cast(_user_hash(user_id), BigInteger).op(">>")(_const(shift, Integer)),
+        SmallInteger,
+    )
+
+
+def hll_rank_sql(user_id, precision: int):
+    """Ранг: позиция первой единицы в оставшихся битах хэша"""
+    width = HLL_HASH_BITS - precision
+    return _first_one(
+        cast(_user_hash(user_id), BigInteger).op("&")(_const(2**width - 1)), width
+    )
+
+
+def hll_fold_sql(register, rank, from_precision: int, to_precision: int):
+    """
+    Перевод регистра и ранга к меньшей точности: отброшенные младшие биты
+    номера регистра становятся старшими битами остатка хэша.
+    """
+    shift = from_precision - to_precision
+    if shift <= 0:
+        return register, rank
+    folded_register = cast(
+        cast(register, Integer).op(">>")(_const(shift, Integer)), SmallInteger
+    )
+    low_bits = cast(register, Integer).op("&")(_const(2**shift - 1))
+    folded_rank = case(
+        (low_bits == 0, cast(rank + shift, SmallInteger)),
+        else_=_first_one(low_bits, shift),
+    )
+    return folded_register, folded_rank
+
+
+def hll_estimate_sql(rank, precision: int):
+    """
+    Агрегат оценки числа различных значений по строкам (регистр, max ранг)
+    одной группы. Для малых значений — линейный подсчёт по пустым регистрам.
+    """
+    registers = 2**precision
+    alpha = 0.7213 / (1 + 1.079 / registers)
+    empty = registers - func.count()
+    raw = alpha * registers**2 / (func.sum(func.power(2.0, -rank)) + empty)
+    estimate = case(
+        (
+            (raw <= 2.5 * registers) & (empty > 0),
+            registers * func.ln(literal(registers, Float) / cast(empty, Float)),
+        ),
+        else_=raw,
+    )
+    return cast(func.round(estimate), BigInteger)
@@ -1,44 +1,70 @@
-from io import StringIO
+import gzip
+from typing import TYPE_CHECKING, BinaryIO, Iterator, List, Tuple
 
-import pandas as pd
-from pandas import DataFrame
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
-from app.schemas.report_schema import CountryStatsFilter, CSVDataList, CSVData
+CSV_EXTENSIONS = (".csv", ".csv.gz", ".csv.zst")
 
 
-def check_column_in_csv(set_column: set, frame: DataFrame):
+def check_column_in_csv(set_column: set, frame: "DataFrame"):
     if not set_column.issubset(frame.columns):
         missing = set_column - set(frame.columns)
         raise ValueError(f"Отсутствуют обязательные колонки в CSV: {missing}")
 
 
-def read_frame(countries_csv: str, sep: str):
+def frame_to_user_countries(countries_df: "DataFrame") -> List[Tuple[int, str]]:
+    """Пары (user_id, country) в виде python-типов для COPY"""
+    check_column_in_csv({"user_id", "country"}, countries_df)
+    countries_df = countries_df.dropna(subset=["user_id", "country"])
     try:
-        countries_df = pd.read_csv(StringIO(countries_csv), sep=sep)
-    except Exception as e:
-        raise ValueError(f"Ошибка парсинга CSV: {str(e)}")
-    return countries_df
+        user_ids = countries_df["user_id"].astype("int64").tolist()
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Некорректные значения user_id в CSV: {str(e)}")
+    countries = countries_df["country"].astype(str).tolist()
+    return list(zip(user_ids, countries))
 
 
-def get_user_id_for_n_countries(
-    countries_csv: str, filters: CountryStatsFilter
-) -> CSVDataList:
-    countries_df = read_frame(countries_csv, ";")
-    check_column_in_csv({"user_id", "country"}, countries_df)
-    grouped = countries_df.groupby("country")["user_id"].apply(list).to_dict()
-    # Сортируем страны по количеству пользователей (по убыванию)
-    sorted_countries = sorted(grouped.items(), key=lambda x: len(x[0]), reverse=True)
-    # Ограничиваем top_n, если задано
-    selected_countries = (
-        sorted_countries[: filters.top_n] if filters.top_n else sorted_countries
-    )
-    data_obj = CSVDataList()
-    for country_name, user_ids in selected_countries:
-        data_obj.list_for_frame_user_country.extend(
-            [{"user_id": id_user, "country": country_name} for id_user in user_ids]
-        )
-        data_obj.list_id_for_search.extend(user_ids)
-        data_obj.list_id_data_csv.append(
-            CSVData(country=country_name, list_id_user_country=user_ids.copy())
-        )
-    return data_obj
+def open_csv_stream(countries_file: BinaryIO, filename: str) -> BinaryIO:
+    """Поток байт CSV с прозрачной распаковкой .csv.gz и .csv.zst"""
+    if filename.endswith(".csv.gz"):
+        return gzip.GzipFile(fileobj=countries_file, mode="rb")
+    if filename.endswith(".csv.zst"):
+        try:
+            from compression import zstd
+
+            return zstd.ZstdFile(countries_file, mode="rb")
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Для загрузки .csv.zst нужен пакет zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(countries_file)
+    if filename.endswith(".csv"):
+        return countries_file
+    raise ValueError(f"Поддерживаются только файлы {', '.join(CSV_EXTENSIONS)}")
+
+
+def iter_user_countries(
+    countries_file: BinaryIO, filename: str, chunk_size: int
+) -> Iterator[List[Tuple[int, str]]]:
+    """
+    Читает CSV пачками по chunk_size строк прямо из файла загрузки.
+    В памяти одновременно находится только одна пачка.
+    """
+    # pandas импортируется при первом разборе CSV, а не при старте приложения
+    import pandas as pd
+
+    stream = open_csv_stream(countries_file, filename)
+    try:
+        reader = pd.read_csv(stream, sep=";", chunksize=chunk_size, encoding="utf-8")
+        with reader:
+            for chunk in reader:
+                yield frame_to_user_countries(chunk)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise ValueError(f"Ошибка парсинга CSV: {str(e)}")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Ошибка парсинга CSV: {str(e)}")
@@ -0,0 +1,62 @@
+import math
+from statistics import NormalDist
+from typing import NamedTuple, Optional
+
+from app.schemas.report_schema import EstimateInterval
+
+
+class SampleTotals(NamedTuple):
+    """
+    Суммы по выборке. Единица выборки (кластер) — страница для SYSTEM
+    и строка для BERNOULLI; c_j и s_j — число и сумма транзакций кластера.
+    """
+
+    rows: int  # Σ c_j
+    total: float  # Σ s_j
+    sum_count_sq: float  # Σ c_j²
+    sum_total_sq: float  # Σ s_j²
+    sum_count_total: float  # Σ c_j·s_j
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+
+class SampleEstimates(NamedTuple):
+    transaction_count: EstimateInterval
+    total_amount: EstimateInterval
+    avg_amount: EstimateInterval
+
+
+def z_score(confidence: float) -> float:
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def interval(value: float, variance: float, z: float) -> EstimateInterval:
+    margin = z * math.sqrt(max(variance, 0.0))
+    return EstimateInterval(value=value, low=value - margin, high=value + margin)
+
+
+def estimate_from_sample(
+    totals: SampleTotals, fraction: float, confidence: float
+) -> SampleEstimates:
+    """
+    Оценки Хорвица–Томпсона для количества и суммы: каждый кластер попадает
+    в выборку с вероятностью fraction, поэтому итоги выборки делятся на fraction,
+    а дисперсия оценивается как (1 - f) / f² · Σ y_j². Среднее — отношение
+    оценок суммы и количества, его дисперсия — по линеаризации.
+    """
+    z = z_score(confidence)
+    scale = (1 - fraction) / fraction**2
+    count = interval(totals.rows / fraction, scale * totals.sum_count_sq, z)
+    # Транзакций не меньше, чем уже попало в выборку
+    count.low = max(count.low, totals.rows)
+    total = interval(totals.total / fraction, scale * totals.sum_total_sq, z)
+    if not totals.rows:
+        return SampleEstimates(count, total, EstimateInterval())
+    ratio = totals.total / totals.rows
+    residual_sq = (
+        totals.sum_total_sq
+        - 2 * ratio * totals.sum_count_total
+        + ratio**2 * totals.sum_count_sq
+    )
+    avg = interval(ratio, scale * residual_sq / count.value**2, z)
+    return SampleEstimates(count, total, avg)
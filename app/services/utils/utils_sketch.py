@@ -0,0 +1,98 @@
+import math
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import Float, Integer, cast, func, literal
+
+# Относительная точность квантилей. Меняется только вместе с пересборкой роллапов:
+# номера корзин в daily_transaction_rollups посчитаны для этого значения
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+# Суммы меньше копейки попадают в корзину копейки
+SKETCH_MIN_VALUE = 0.01
+
+# Квантили для include_percentiles
+REPORT_PERCENTILES = (0.25, 0.75, 0.9, 0.95, 0.99)
+
+
+def sketch_bucket(value: float) -> int:
+    """Корзина суммы: value лежит в (gamma^(k-1), gamma^k]"""
+    return math.ceil(math.log(max(value, SKETCH_MIN_VALUE)) / math.log(SKETCH_GAMMA))
+
+
+def bucket_value(bucket: int) -> float:
+    """Представитель корзины с относительной ошибкой не больше SKETCH_RELATIVE_ACCURACY"""
+    return 2 * SKETCH_GAMMA**bucket / (SKETCH_GAMMA + 1)
+
+
+def sketch_bucket_sql(amount):
+    """
+    То же, что sketch_bucket, выражением SQL для колонки суммы.
+    Константы подставляются литералами, чтобы выражение в SELECT
+    и GROUP BY совпадало текстуально.
+    """
+    min_value = literal(SKETCH_MIN_VALUE, Float, literal_execute=True)
+    log_gamma = literal(math.log(SKETCH_GAMMA), Float, literal_execute=True)
+    value = func.greatest(cast(amount, Float), min_value)
+    return cast(func.ceil(func.ln(value) / log_gamma), Integer)
+
+
+class AmountSketch:
+    """
+    Логарифмическая гистограмма сумм (как в DDSketch): счётчики по корзинам
+    с геометрически растущими границами. Скетчи за разные дни сливаются
+    сложением счётчиков, квантиль берётся по накопленной сумме.
+    numpy импортируется в методах: роллапам при старте нужен только sketch_bucket_sql.
+    """
+
+    def __init__(self, buckets: Sequence[int] = (), counts: Sequence[int] = ()):
+        import numpy as np
+
+        self.buckets = np.asarray(buckets, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        order = np.argsort(self.buckets, kind="stable")
+        self.buckets, self.counts = self.buckets[order], self.counts[order]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, int]]) -> "AmountSketch":
+        rows = list(rows)
+        if not rows:
+            return cls()
+        buckets, counts = zip(*rows)
+        return cls(buckets, counts)
+
+    @classmethod
+    def from_values(cls, values: Iterable[float]) -> "AmountSketch":
+        import numpy as np
+
+        buckets, counts = np.unique(
+            [sketch_bucket(float(value)) for value in values], return_counts=True
+        )
+        return cls(buckets, counts)
+
+    def merge(self, other: "AmountSketch") -> "AmountSketch":
+        import numpy as np
+
+        buckets = np.concatenate([self.buckets, other.buckets])
+        counts = np.concatenate([self.counts, other.counts])
+        merged, inverse = np.unique(buckets, return_inverse=True)
+        return AmountSketch(
+            merged, np.bincount(inverse, weights=counts).astype(np.int64)
+        )
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if not total:
+            return None
+        import numpy as np
+
+        rank = q * (total - 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank, side="right"))
+        return round(bucket_value(int(self.buckets[index])), 2)
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[str, Optional[float]]:
+        """Квантили с ключами вида p95"""
+        return {f"p{q * 100:g}": self.quantile(q) for q in qs}
@@ -0,0 +1,122 @@
+"""
+Микробенчмарк сериализации ответов отчётов: стоимость на 10k строк.
+До: модели строк, затем путь FastAPI — повторная валидация по response_model
+(/report/by-country) или jsonable_encoder (/report) и stdlib json.
+После: те же модели один раз, FastJSONResponse (сериализатор pydantic + orjson).
+
+    uv run python -m benchmarks.bench_serialization --rows 10000 --repeat 20
+
+БД не нужна, строки генерируются в памяти.
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.core.responses import FastJSONResponse, orjson
+from app.schemas.report_schema import CountryStat, DailyShift, ReportResponse
+from benchmarks.stats import summarize_latencies
+
+
+def country_rows(rows: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "country": f"country_{i}",
+            "transaction_count": i + 1,
+            "total_amount": (i + 1) * 10.5,
+            "average_amount": 10.5,
+        }
+        for i in range(rows)
+    ]
+
+
+def daily_rows(rows: int) -> List[Dict[str, Any]]:
+    start = date(2000, 1, 1)
+    return [
+        {
+            "date": (start + timedelta(days=i)).isoformat(),
+            "total_amount": 1000.0 + i,
+            "count": 100 + i % 7,
+            "percent_change": None if i == 0 else 0.1,
+        }
+        for i in range(rows)
+    ]
+
+
+def country_before(rows: List[Dict[str, Any]]) -> bytes:
+    items = [CountryStat(**row) for row in rows]
+    # serialize_response FastAPI при response_model=List[CountryStat]
+    adapter = TypeAdapter(List[CountryStat])
+    validated = adapter.validate_python(items)
+    return JSONResponse(adapter.dump_python(validated, mode="json")).body
+
+
+def country_after(rows: List[Dict[str, Any]]) -> bytes:
+    return FastJSONResponse([CountryStat(**row) for row in rows]).body
+
+
+def report_before(rows: List[Dict[str, Any]]) -> bytes:
+    report = ReportResponse(daily_shifts=[DailyShift(**row) for row in rows])
+    # /report без response_model: FastAPI кодирует модель через jsonable_encoder
+    return JSONResponse(jsonable_encoder(report)).body
+
+
+def report_after(rows: List[Dict[str, Any]]) -> bytes:
+    report = ReportResponse(daily_shifts=[DailyShift(**row) for row in rows])
+    return FastJSONResponse(report).body
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize_latencies(samples)
+
+
+def run_serialization_benchmark(rows: int, repeat: int) -> Dict[str, Dict[str, Any]]:
+    cases = {
+        "country_stats": (country_before, country_after, country_rows(rows)),
+        "daily_shifts": (report_before, report_after, daily_rows(rows)),
+    }
+    results = {}
+    for name, (before_func, after_func, data) in cases.items():
+        before = measure(lambda: before_func(data), repeat)
+        after = measure(lambda: after_func(data), repeat)
+        results[name] = {
+            "before": before,
+            "after": after,
+            "speedup": round(before["p50_ms"] / max(after["p50_ms"], 1e-9), 2),
+        }
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации ответов")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    print(f"orjson: {'да' if orjson is not None else 'нет, stdlib json'}")
+    per_10k = 10_000 / args.rows
+    for name, result in run_serialization_benchmark(args.rows, args.repeat).items():
+        before = result["before"]["p50_ms"] * per_10k
+        after = result["after"]["p50_ms"] * per_10k
+        print(
+            f"{name:15} до: {before:8.2f} мс/10k  после: {after:8.2f} мс/10k  "
+            f"ускорение: x{result['speedup']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Бенчмарк холодного старта приложения: каждый замер — новый процесс python.
+Меряются импорт app.api_main, готовность (импорт + startup lifespan)
+и первый ответ (готовность + GET /api/v1/system/pool, БД не нужна).
+
+    uv run python -m benchmarks.bench_startup --repeat 10 --output benchmarks/results/startup.json
+
+Результат в формате bench_reports, его можно сравнивать с базовым прогоном:
+
+    uv run python -m benchmarks.bench_reports compare \\
+        benchmarks/results/startup_baseline.json benchmarks/results/startup.json
+
+Переменные окружения POSTGRES_* нужны те же, что и приложению.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Тяжёлые модули, которых не должно быть в памяти сразу после старта
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow")
+READY_PATH = "/api/v1/system/pool"
+
+
+async def asgi_get(app, path: str) -> int:
+    """GET напрямую через ASGI, без HTTP-клиента: его импорт не попадает в замер"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+
+def measure_startup() -> Dict[str, Any]:
+    """Один замер в текущем процессе, вызывается в новом процессе"""
+    started = time.perf_counter()
+    from app.api_main import app
+
+    imported = time.perf_counter()
+
+    async def start_and_serve():
+        async with app.router.lifespan_context(app):
+            ready = time.perf_counter()
+            status = await asgi_get(app, READY_PATH)
+            return ready, time.perf_counter(), status
+
+    ready, first_response, status = asyncio.run(start_and_serve())
+    return {
+        "import_sec": imported - started,
+        "ready_sec": ready - started,
+        "first_response_sec": first_response - started,
+        "status": status,
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+
+def run_once() -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).resolve().parents[1],
+    )
+    # Последняя строка stdout — результат, выше может быть вывод приложения
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_startup_benchmark(repeat: int) -> Dict[str, Any]:
+    from benchmarks.stats import summarize_latencies
+
+    samples = [run_once() for _ in range(repeat)]
+    results = []
+    for name in ("import", "ready", "first_response"):
+        summary = summarize_latencies([sample[f"{name}_sec"] for sample in samples])
+        results.append({"scale": "startup", "name": name, "case": "cold", **summary})
+    return {
+        "python": platform.python_version(),
+        "heavy_modules": sorted(
+            {name for sample in samples for name in sample["heavy_modules"]}
+        ),
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного старта")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(measure_startup()))
+        return
+    report = run_startup_benchmark(args.repeat)
+    for result in report["results"]:
+        print(
+            f"{result['name']:15} p50: {result['p50_ms']:8.1f} мс  "
+            f"p95: {result['p95_ms']:8.1f} мс"
+        )
+    print(f"Тяжёлые модули после старта: {', '.join(report['heavy_modules']) or 'нет'}")
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Общие функции бенчмарков: перцентили, разбор планов EXPLAIN, сравнение прогонов."""
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+
+def summarize_latencies(latencies_sec: Sequence[float]) -> Dict[str, float]:
+    values = np.asarray(latencies_sec, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "runs": len(values),
+    }
+
+
+def count_scanned_rows(plan: Dict[str, Any]) -> int:
+    """
+    Число строк, прочитанных узлами сканирования плана EXPLAIN (ANALYZE, FORMAT JSON):
+    возвращённые строки плюс отброшенные фильтром, с учётом числа повторов узла.
+    """
+    node = plan.get("Plan", plan)
+    rows = 0
+    if node.get("Node Type", "").endswith("Scan"):
+        per_loop = node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)
+        rows += int(per_loop * node.get("Actual Loops", 1))
+    for child in node.get("Plans", []):
+        rows += count_scanned_rows(child)
+    return rows
+
+
+def result_key(result: Dict[str, Any]) -> str:
+    return f"{result['scale']}|{result['name']}|{result['case']}"
+
+
+def compare_results(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    Сравнивает два прогона по p95 и возвращает замеры,
+    замедлившиеся больше чем на threshold (доля, 0.2 = 20%).
+    """
+    baseline_by_key = {result_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = baseline_by_key.get(result_key(result))
+        if before is None or not before["p95_ms"]:
+            continue
+        change = result["p95_ms"] / before["p95_ms"] - 1
+        if change > threshold:
+            regressions.append(
+                {
+                    "key": result_key(result),
+                    "baseline_p95_ms": before["p95_ms"],
+                    "current_p95_ms": result["p95_ms"],
+                    "change": round(change, 4),
+                }
+            )
+    return regressions
@@ -21,6 +21,7 @@ from app.api_main import app  # замените на ваш FastAPI app
 from app.services.report_service import ReportServices
 from app.repo.transaction_repo import TransactionRepository
 from app.models import TransactionModel
+from app.schemas.report_schema import AggregateReport
 
 import pytest
 from fastapi.testclient import TestClient
@@ -39,8 +40,11 @@ def mock_session():
 @pytest.fixture
 def mock_transaction_repo(mock_session):
     repo = TransactionRepository(mock_session)
-    repo.get_trans_user_ids = AsyncMock(return_value=[])
     repo.get_aggregated_report = AsyncMock()
+    repo.get_report = AsyncMock(return_value=(AggregateReport(), None))
+    repo.load_user_countries = AsyncMock()
+    repo.get_country_report = AsyncMock(return_value=[])
+    repo.get_data_watermark = AsyncMock(return_value=1)
     return repo
 
 
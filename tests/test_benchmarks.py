@@ -0,0 +1,77 @@
+import json
+
+from benchmarks.stats import compare_results, count_scanned_rows, summarize_latencies
+
+
+def test_summarize_latencies():
+    summary = summarize_latencies([0.001 * i for i in range(1, 101)])
+
+    assert summary["runs"] == 100
+    assert summary["p50_ms"] == 50.5
+    assert summary["p95_ms"] < summary["p99_ms"] <= 100
+
+
+def test_count_scanned_rows():
+    plan = {
+        "Plan": {
+            "Node Type": "Hash Join",
+            "Actual Rows": 10,
+            "Actual Loops": 1,
+            "Plans": [
+                {
+                    "Node Type": "Seq Scan",
+                    "Actual Rows": 100,
+                    "Rows Removed by Filter": 900,
+                    "Actual Loops": 1,
+                },
+                {"Node Type": "Index Only Scan", "Actual Rows": 5, "Actual Loops": 2},
+            ],
+        }
+    }
+
+    assert count_scanned_rows(plan) == 1010
+
+
+def test_compare_results_reports_p95_regressions():
+    result = {"scale": "1m", "name": "repo.get_daily_shifts", "case": "status=all"}
+    baseline = {"results": [{**result, "p95_ms": 10.0}]}
+    current = {"results": [{**result, "p95_ms": 13.0}]}
+
+    assert compare_results(baseline, current, threshold=0.5) == []
+    regressions = compare_results(baseline, current, threshold=0.2)
+    assert len(regressions) == 1
+    assert regressions[0]["change"] == 0.3
+
+
+def test_run_serialization_benchmark():
+    from benchmarks.bench_serialization import (
+        run_serialization_benchmark,
+        country_before,
+        country_after,
+        report_before,
+        report_after,
+        country_rows,
+        daily_rows,
+    )
+
+    # Быстрый путь должен давать тот же JSON, что и путь через FastAPI
+    countries = country_rows(3)
+    assert json.loads(country_after(countries)) == json.loads(country_before(countries))
+    days = daily_rows(3)
+    assert json.loads(report_after(days)) == json.loads(report_before(days))
+    results = run_serialization_benchmark(rows=10, repeat=2)
+    assert set(results) == {"country_stats", "daily_shifts"}
+    assert results["daily_shifts"]["after"]["runs"] == 2
+
+
+def test_run_startup_benchmark():
+    from benchmarks.bench_startup import run_startup_benchmark
+
+    report = run_startup_benchmark(repeat=1)
+
+    # Тяжёлые модули подгружаются при первом отчёте, а не при старте
+    assert report["heavy_modules"] == []
+    names = [result["name"] for result in report["results"]]
+    assert names == ["import", "ready", "first_response"]
+    ready, first_response = report["results"][1:]
+    assert ready["p50_ms"] <= first_response["p50_ms"]
@@ -0,0 +1,66 @@
+import asyncio
+import gc
+import time
+from io import BytesIO
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app.api_main import app
+
+
+def slow_user_countries(countries_file, filename, chunk_size):
+    # Имитация тяжёлого разбора CSV: синхронная работа без await
+    for _ in range(4):
+        time.sleep(0.15)
+        yield [(1, "Russia")]
+
+
+async def consume_chunks(chunks):
+    loaded = 0
+    async for records in chunks:
+        loaded += len(records)
+    return loaded
+
+
+@pytest.mark.asyncio
+async def test_country_upload_does_not_block_other_endpoints():
+    # Полная сборка мусора посреди замера даёт паузу, не связанную с загрузкой
+    gc.collect()
+    transport = httpx.ASGITransport(app=app)
+    with (
+        patch("app.services.report_service.iter_user_countries", slow_user_countries),
+        patch(
+            "app.repo.transaction_repo.TransactionRepository.load_user_countries",
+            side_effect=consume_chunks,
+            autospec=False,
+        ),
+        patch(
+            "app.repo.transaction_repo.TransactionRepository.get_country_report",
+            AsyncMock(return_value=[]),
+        ),
+    ):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            upload = asyncio.create_task(
+                client.post(
+                    "/api/v1/reports/report/by-country",
+                    files={"countries_file": ("c.csv", BytesIO(b"user_id;country\n"))},
+                )
+            )
+            latencies = []
+            while not upload.done():
+                started = time.perf_counter()
+                # ASGITransport отвечает без реального ожидания, отдаём цикл загрузке
+                await asyncio.sleep(0.01)
+                response = await client.get("/api/v1/reports/cache/stats")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+            response = await upload
+
+    assert response.status_code == 200
+    # Пока разбирается «CSV» (~0.6 с), короткие запросы отвечают без задержек
+    assert len(latencies) > 5
+    assert max(latencies) < 0.1
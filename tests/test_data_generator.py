@@ -0,0 +1,96 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+
+from app.data_generator import (
+    DatasetConfig,
+    generate_transactions_block,
+    parse_args,
+)
+
+
+def test_generate_transactions_block_is_deterministic():
+    config = DatasetConfig(
+        users=50, tx_per_user=20, zipf_a=1.2, seasonality=0.5, block_size=300, seed=7
+    )
+
+    first = generate_transactions_block(config, block_index=1)
+    second = generate_transactions_block(config, block_index=1)
+    other = generate_transactions_block(config, block_index=2)
+
+    assert first.equals(second)
+    assert not first.equals(other)
+    assert len(first) == 300
+    # Последний блок короче
+    assert len(generate_transactions_block(config, block_index=3)) == 100
+
+
+def test_generate_transactions_block_respects_config():
+    config = DatasetConfig(
+        users=10,
+        tx_per_user=1000,
+        successful_share=1.0,
+        payment_share=0.0,
+        min_amount=5,
+        max_amount=10,
+        days=30,
+        block_size=10_000,
+    )
+
+    frame = generate_transactions_block(config, block_index=0)
+
+    assert set(frame["status"]) == {"SUCCESSFUL"}
+    assert set(frame["type"]) == {"INVOICE"}
+    assert frame["sum_pay"].between(5, 10).all()
+    assert frame["user_id"].between(1, 10).all()
+    assert frame["date_pay"].max() - frame["date_pay"].min() <= pd.Timedelta(days=30)
+
+
+def test_generate_transactions_block_covers_end_date():
+    config = DatasetConfig(
+        users=10, tx_per_user=1000, days=30, end_date=date(2024, 3, 31)
+    )
+
+    frame = generate_transactions_block(config, block_index=0)
+
+    days = frame["date_pay"].dt.date
+    assert config.start_date == date(2024, 3, 2)
+    assert days.min() == config.start_date
+    assert days.max() == config.end_date
+    assert days.nunique() == 30
+
+
+def test_random_streams_do_not_collide(monkeypatch):
+    from app import data_generator
+
+    seeds = []
+    default_rng = np.random.default_rng
+
+    def recording_rng(seed):
+        seeds.append(tuple(seed))
+        return default_rng(seed)
+
+    monkeypatch.setattr(data_generator.np.random, "default_rng", recording_rng)
+    config = DatasetConfig(users=4, tx_per_user=10, block_size=5, seed=5)
+
+    # Перестановка пользователей и блок с номером, равным числу пользователей,
+    # берут числа из разных потоков
+    generate_transactions_block(config, block_index=config.users)
+
+    assert len(seeds) == 2
+    assert len(set(seeds)) == 2
+
+
+def test_parse_args_amounts():
+    args = parse_args(["--min-amount", "5.5", "--max-amount", "20"])
+
+    assert (args.min_amount, args.max_amount) == (5.5, 20.0)
+    config = DatasetConfig(
+        **{k: v for k, v in vars(args).items() if k in DatasetConfig.model_fields}
+    )
+    assert (config.min_amount, config.max_amount) == (5.5, 20.0)
+    with pytest.raises(ValidationError):
+        DatasetConfig(min_amount=10, max_amount=5)
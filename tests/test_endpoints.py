@@ -59,3 +59,199 @@ def test_get_country_stats_bad_file(client):
         data={"sort_by": "count"},
     )
     assert response.status_code == 400
+
+
+def test_get_cache_stats(client):
+    response = client.get("/api/v1/reports/cache/stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert {"hits", "misses", "stale", "size", "hit_ratio"} <= set(data)
+
+
+def test_get_pool_stats(client):
+    response = client.get("/api/v1/system/pool")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["pool_size"] >= 1
+    assert "waiting" in data
+    assert (
+        len(data["wait_seconds"]["counts"]) == len(data["wait_seconds"]["buckets"]) + 1
+    )
+
+
+def test_report_server_timing_and_metrics(client):
+    with patch(
+        "app.services.report_service.ReportServices.get_all_report_by_filter"
+    ) as mock_method:
+        mock_method.return_value = {"total_amount": 1.0, "transaction_count": 1}
+        response = client.get("/api/v1/reports/report")
+
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert "service;dur=" in timing
+    assert "serialize;dur=" in timing
+    assert "total;dur=" in timing
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/api/v1/reports/report"}'
+        in metrics.text
+    )
+    assert 'phase="service"' in metrics.text
+    assert "# TYPE db_pool_checked_out gauge" in metrics.text
+    # Монотонные счётчики экспортируются как counter с суффиксом _total
+    assert "# TYPE db_pool_checkouts_total counter" in metrics.text
+    assert "# TYPE report_cache_hits_total counter" in metrics.text
+    assert "# TYPE report_cache_size gauge" in metrics.text
+    assert "# TYPE report_coalescing_executions_total counter" in metrics.text
+    assert "# TYPE report_coalescing_in_flight gauge" in metrics.text
+
+
+def test_get_report_columnar(client):
+    from app.schemas.report_schema import ReportColumnarResponse, DailyShiftColumns
+
+    report = ReportColumnarResponse(
+        total_amount=300.0,
+        transaction_count=2,
+        daily_shifts=DailyShiftColumns(
+            date=["2024-01-01", "2024-01-02"],
+            total_amount=[100.0, 200.0],
+            count=[1, 1],
+            percent_change=[None, 100.0],
+        ),
+    )
+    with patch(
+        "app.services.report_service.ReportServices.get_all_report_by_filter"
+    ) as mock_method:
+        mock_method.return_value = report
+        response = client.get(
+            "/api/v1/reports/report",
+            headers={"Accept": "application/vnd.report.columns+json"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.report.columns+json"
+    assert mock_method.call_args.kwargs["columnar"] is True
+    assert response.json()["daily_shifts"]["percent_change"] == [None, 100.0]
+
+
+def test_get_report_arrow_without_pyarrow(client):
+    with patch("app.api.report_api.arrow_available", return_value=False):
+        response = client.get(
+            "/api/v1/reports/report",
+            headers={"Accept": "application/vnd.apache.arrow.stream"},
+        )
+    assert response.status_code == 406
+
+
+def test_get_country_stats_by_dataset(client):
+    with patch(
+        "app.services.report_service.ReportServices.get_report_country_by_dataset"
+    ) as mock_method:
+        mock_method.return_value = [
+            {
+                "country": "USA",
+                "transaction_count": 2,
+                "total_amount": 10.0,
+                "average_amount": 5.0,
+            }
+        ]
+        response = client.post(
+            "/api/v1/reports/report/by-country", data={"dataset_id": 3}
+        )
+
+    assert response.status_code == 200
+    assert response.json()[0]["country"] == "USA"
+    assert mock_method.call_args.kwargs["dataset_id"] == 3
+
+
+def test_get_country_stats_requires_file_or_dataset(client):
+    response = client.post("/api/v1/reports/report/by-country", data={})
+    assert response.status_code == 400
+
+
+def test_report_job_lifecycle(client):
+    response = client.post("/api/v1/reports/jobs/report?status=successful")
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+
+    status = client.get(f"/api/v1/reports/jobs/{job['id']}")
+    assert status.status_code == 200
+    assert status.json()["kind"] == "report"
+    # Воркеры в тестах не запущены, результат ещё не готов
+    assert client.get(f"/api/v1/reports/jobs/{job['id']}/result").status_code == 409
+    assert client.get("/api/v1/reports/jobs/unknown").status_code == 404
+
+
+def test_get_report_approximate(client):
+    from collections import namedtuple
+
+    # Выборка 1% из 10 млн строк: 100 строк на сумму 5000
+    SampleRow = namedtuple(
+        "SampleRow",
+        "sampled_rows sampled_total sum_count_sq sum_total_sq sum_count_total "
+        "min_amount max_amount",
+    )
+    row = SampleRow(100, 5000.0, 100, 400_000.0, 5000.0, 1, 500)
+    with (
+        patch(
+            "app.repo.transaction_repo.TransactionRepository.get_row_estimate",
+            AsyncMock(return_value=10_000_000),
+        ),
+        patch(
+            "app.repo.transaction_repo.TransactionRepository.get_sample_totals",
+            AsyncMock(return_value=row),
+        ),
+    ):
+        response = client.get(
+            "/api/v1/reports/report",
+            params={
+                "approximate": True,
+                "status": "successful",
+                "include_total": True,
+                "include_max": True,
+            },
+        )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["sample_pct"] == 1.0
+    assert data["transaction_count"]["value"] == 10_000
+    assert data["total_amount"]["low"] < 500_000 < data["total_amount"]["high"]
+    assert data["max_amount"] == 500
+    assert data["avg_amount"] is None
+
+    response = client.get(
+        "/api/v1/reports/report",
+        params={"approximate": True, "include_daily_shift": True},
+    )
+    assert response.status_code == 400
+
+
+def test_get_batch_report(client):
+    from app.schemas.report_schema import ReportResponse
+
+    with patch(
+        "app.services.report_service.ReportServices.get_batch_report",
+        AsyncMock(return_value=[ReportResponse(total_amount=1), ReportResponse()]),
+    ) as mock_method:
+        response = client.post(
+            "/api/v1/reports/batch",
+            json={
+                "filters": [
+                    {"status": "successful", "include_total": True},
+                    {"status": "failed", "type": "invoice"},
+                ]
+            },
+        )
+
+    assert response.status_code == 200
+    reports = response.json()["reports"]
+    assert [report["total_amount"] for report in reports] == [1, None]
+    filters = mock_method.await_args.args[0]
+    # Даты по умолчанию подставляются и для фильтров из тела запроса
+    assert filters[1].start_date is not None
+
+    response = client.post("/api/v1/reports/batch", json={"filters": []})
+    assert response.status_code == 422
@@ -1,22 +1,871 @@
+import os
 from unittest.mock import AsyncMock
 
 import pytest
 from decimal import Decimal
-from app.models import TransactionModel
 
 
 @pytest.mark.asyncio
-async def test_get_trans_user_ids(mock_transaction_repo):
-    fake_transactions = [
-        TransactionModel(user_id=1, sum_pay=Decimal("100.00")),
-        TransactionModel(user_id=2, sum_pay=Decimal("200.00")),
+async def test_daily_source_reads_rollups(mock_session):
+    from sqlalchemy import select
+    from sqlalchemy.dialects import postgresql
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import TransactionFilter
+
+    repo = TransactionRepository(mock_session)
+    filters = TransactionFilter(
+        start_date="2024-01-01", end_date="2024-12-31", status="successful"
+    )
+
+    source = await repo.get_daily_source(filters)
+    sql = str(select(source).compile(dialect=postgresql.dialect()))
+
+    assert "daily_transaction_rollups" in sql
+    assert "rollup_refresh_state" in sql
+    assert "UNION ALL" in sql
+    # Обе части UNION ALL отдают количество как bigint
+    assert "CAST(sum(daily_transaction_rollups.transaction_count) AS BIGINT)" in sql
+
+
+@pytest.mark.asyncio
+async def test_get_aggregated_report_from_daily_source(mock_session):
+    from unittest.mock import MagicMock
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import TransactionFilter
+
+    row = MagicMock()
+    row._mapping = {"avg_amount": Decimal("150.00"), "transaction_count": 2}
+    result = MagicMock()
+    result.fetchone.return_value = row
+    mock_session.execute = AsyncMock(return_value=result)
+    repo = TransactionRepository(mock_session)
+    filters = TransactionFilter(
+        status="successful", include_avg=True, include_total=True
+    )
+
+    report = await repo.get_aggregated_report(filters)
+
+    assert report.avg_amount == 150.0
+    assert report.transaction_count == 2
+    mock_session.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_get_country_report_query(mock_session):
+    from unittest.mock import MagicMock
+    from sqlalchemy.dialects import postgresql
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import CountryStatsFilter
+
+    result = MagicMock()
+    result.fetchall.return_value = []
+    mock_session.execute = AsyncMock(return_value=result)
+    repo = TransactionRepository(mock_session)
+
+    await repo.get_country_report(CountryStatsFilter(sort_by="total", top_n=5))
+
+    query = mock_session.execute.call_args.args[0]
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "JOIN transactions" in sql
+    assert "GROUP BY tmp_user_countries.country" in sql
+    assert "ORDER BY total_amount DESC" in sql
+    assert "LIMIT" in sql
+
+
+@pytest.mark.asyncio
+async def test_get_country_report_by_dataset_query(mock_session):
+    from unittest.mock import MagicMock
+    from sqlalchemy.dialects import postgresql
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import CountryStatsFilter
+
+    result = MagicMock()
+    result.fetchall.return_value = []
+    mock_session.execute = AsyncMock(return_value=result)
+    repo = TransactionRepository(mock_session)
+
+    await repo.get_country_report(CountryStatsFilter(), dataset_id=7)
+
+    query = mock_session.execute.call_args.args[0]
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "FROM user_countries" in sql
+    assert "user_countries.dataset_id = %(dataset_id_1)s" in sql
+    assert "tmp_user_countries" not in sql
+
+
+@pytest.mark.asyncio
+async def test_get_report_single_query(mock_session):
+    from datetime import date
+    from types import SimpleNamespace
+    from unittest.mock import MagicMock
+    from sqlalchemy.dialects import postgresql
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import TransactionFilter
+
+    totals = {"total_amount": Decimal("300.00"), "transaction_count": 3}
+    rows = [
+        SimpleNamespace(
+            day_date=date(2024, 1, 1),
+            daily_total=Decimal("100.00"),
+            daily_count=1,
+            prev_day_total=None,
+            percentage_change=None,
+            _mapping=totals,
+        ),
+        SimpleNamespace(
+            day_date=date(2024, 1, 2),
+            daily_total=Decimal("200.00"),
+            daily_count=2,
+            prev_day_total=Decimal("100.00"),
+            percentage_change=Decimal("100.00"),
+            _mapping=totals,
+        ),
+    ]
+    result = MagicMock()
+    result.fetchall.return_value = rows
+    mock_session.execute = AsyncMock(return_value=result)
+    repo = TransactionRepository(mock_session)
+    filters = TransactionFilter(
+        start_date="2024-01-01",
+        end_date="2024-01-02",
+        status="successful",
+        include_total=True,
+        include_daily_shift=True,
+    )
+
+    aggregated, daily_shifts = await repo.get_report(filters)
+
+    mock_session.execute.assert_awaited_once()
+    sql = str(
+        mock_session.execute.call_args.args[0].compile(dialect=postgresql.dialect())
+    )
+    assert "lag(daily_source.daily_total) OVER" in sql
+    assert "sum(daily_source.daily_total) OVER ()" in sql
+    assert aggregated.total_amount == 300.0
+    assert aggregated.transaction_count == 3
+    assert [shift.percent_change for shift in daily_shifts] == [None, 100.0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    not os.getenv("TEST_DATABASE_URL"),
+    reason="нужна PostgreSQL с применёнными миграциями в TEST_DATABASE_URL",
+)
+async def test_report_query_uses_index_only_scan():
+    from sqlalchemy import select, func, cast, text, Date
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.models import TransactionModel
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import TransactionFilter
+
+    engine = create_async_engine(os.environ["TEST_DATABASE_URL"])
+    email = "index-only-scan@test"
+    months = [f"transactions_y2031m{month:02d}" for month in range(1, 7)]
+
+    async def explain(connection, filters):
+        # Та же форма, что у сырой части daily_source
+        day = cast(TransactionModel.date_pay, Date)
+        query = await TransactionRepository(None).get_report_by_filter(
+            select(day, func.sum(TransactionModel.sum_pay), func.count()).group_by(day),
+            filters,
+        )
+        compiled = query.compile(
+            dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+        )
+        rows = await connection.exec_driver_sql(f"EXPLAIN {compiled}")
+        return "\n".join(row[0] for row in rows)
+
+    try:
+        # ~17 тыс. строк в месячной партиции, 70% успешных, типы поровну
+        async with engine.begin() as connection:
+            await connection.execute(
+                text(
+                    "SELECT create_transactions_partitions('2031-01-01', '2031-06-30')"
+                )
+            )
+            user_id = await connection.scalar(
+                text(
+                    "INSERT INTO users (email, hashed_password, name) "
+                    "VALUES (:email, 'x', 'plan') RETURNING id"
+                ),
+                {"email": email},
+            )
+            await connection.execute(
+                text("""
+                    INSERT INTO transactions (date_pay, sum_pay, status, type, user_id)
+                    SELECT timestamp '2031-01-01' + random() * interval '181 days',
+                           round((random() * 1000)::numeric, 2),
+                           CASE WHEN random() < 0.7 THEN 'SUCCESSFUL'
+                                ELSE 'FAILED' END::typestatusenum,
+                           CASE WHEN random() < 0.5 THEN 'PAYMENT'
+                                ELSE 'INVOICE' END::typepayenum,
+                           :user_id
+                    FROM generate_series(1, 100000)
+                    """),
+                {"user_id": user_id},
+            )
+        # Статистика и карта видимости как после autovacuum, настройки
+        # планировщика по умолчанию
+        async with engine.connect() as connection:
+            connection = await connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+            await connection.execute(text("VACUUM (ANALYZE) transactions"))
+
+        async with engine.connect() as connection:
+            # Только статус, который есть у большинства строк, за целые месяцы:
+            # партиция читается почти целиком, Seq Scan там дешевле и не проверяется
+            plans = {}
+            for status, type_, start, end in [
+                ("successful", "payment", "2031-02-01", "2031-04-30"),
+                ("failed", "invoice", "2031-02-01", "2031-04-30"),
+                ("failed", "all", "2031-02-01", "2031-04-30"),
+                ("successful", "all", "2031-02-10", "2031-02-20"),
+            ]:
+                filters = TransactionFilter(
+                    start_date=start, end_date=end, status=status, type=type_
+                )
+                plans[status, type_, start] = await explain(connection, filters)
+    finally:
+        async with engine.begin() as connection:
+            for month in months:
+                await connection.execute(text(f"DROP TABLE IF EXISTS {month}"))
+            await connection.execute(
+                text("DELETE FROM users WHERE email = :email"), {"email": email}
+            )
+        await engine.dispose()
+
+    for case, plan in plans.items():
+        assert "Index Only Scan" in plan, (case, plan)
+        assert "Seq Scan" not in plan, (case, plan)
+
+
+@pytest.mark.asyncio
+async def test_copy_export_ndjson(mock_session):
+    from unittest.mock import MagicMock
+    from app.enums.enum_export import ExportFormatEnum
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import TransactionFilter
+
+    driver_connection = MagicMock()
+    driver_connection.copy_from_query = AsyncMock()
+    raw_connection = MagicMock(driver_connection=driver_connection)
+    connection = MagicMock()
+    connection.get_raw_connection = AsyncMock(return_value=raw_connection)
+    mock_session.connection = AsyncMock(return_value=connection)
+    repo = TransactionRepository(mock_session)
+    output = AsyncMock()
+
+    await repo.copy_export(
+        TransactionFilter(start_date="2024-01-01", status="failed"),
+        ExportFormatEnum.NDJSON,
+        output,
+    )
+
+    sql = driver_connection.copy_from_query.call_args.args[0]
+    assert sql.startswith("SELECT row_to_json(export) FROM (SELECT")
+    assert "'2024-01-01 00:00:00'" in sql
+    assert "'FAILED'" in sql
+    assert driver_connection.copy_from_query.call_args.kwargs["output"] is output
+
+
+def test_to_daily_shift_columns():
+    import json
+    from datetime import date
+    from types import SimpleNamespace
+    from app.core.responses import FastJSONResponse
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import ReportColumnarResponse
+
+    # Дни из роллапов приходят из PostgreSQL с numeric-количеством
+    rows = [
+        SimpleNamespace(
+            day_date=date(2024, 1, 1),
+            daily_total=Decimal("100.00"),
+            daily_count=Decimal("3"),
+            prev_day_total=None,
+            percentage_change=None,
+        ),
+        SimpleNamespace(
+            day_date=date(2024, 1, 2),
+            daily_total=Decimal("150.00"),
+            daily_count=Decimal("4"),
+            prev_day_total=Decimal("100.00"),
+            percentage_change=Decimal("50.00"),
+        ),
+    ]
+
+    columns = TransactionRepository.to_daily_shift_columns(rows)
+
+    assert columns.date == ["2024-01-01", "2024-01-02"]
+    assert columns.total_amount == [100.0, 150.0]
+    assert columns.count == [3, 4]
+    assert all(type(count) is int for count in columns.count)
+    assert columns.percent_change == [None, 50.0]
+    # В JSON количества — числа, как и после чтения из кэша
+    body = FastJSONResponse(ReportColumnarResponse(daily_shifts=columns)).body
+    assert json.loads(body)["daily_shifts"]["count"] == [3, 4]
+    assert TransactionRepository.to_daily_shift(rows[0]).count == 3
+
+
+@pytest.mark.asyncio
+async def test_get_sample_totals_query(mock_session):
+    from unittest.mock import MagicMock
+    from sqlalchemy.dialects import postgresql
+    from app.enums.enum_sample import SampleMethodEnum
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import TransactionFilter
+
+    mock_session.execute = AsyncMock(return_value=MagicMock())
+    repo = TransactionRepository(mock_session)
+    filters = TransactionFilter(status="successful", include_total=True)
+
+    await repo.get_sample_totals(filters, SampleMethodEnum.SYSTEM, 1.5)
+    query = mock_session.execute.call_args.args[0]
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "TABLESAMPLE system" in sql
+    # Дисперсия для SYSTEM считается по страницам
+    assert "GROUP BY transactions_sample.tableoid" in sql
+    assert "transactions_sample.status = __[POSTCOMPILE" in sql
+
+    await repo.get_sample_totals(filters, SampleMethodEnum.BERNOULLI, 1.5)
+    query = mock_session.execute.call_args.args[0]
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "TABLESAMPLE bernoulli" in sql
+    assert "GROUP BY" not in sql
+
+
+@pytest.mark.asyncio
+async def test_get_amount_sketch_merges_rollup_sketches(mock_session):
+    from unittest.mock import MagicMock
+    from sqlalchemy.dialects import postgresql
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import TransactionFilter
+
+    result = MagicMock()
+    result.fetchall.return_value = [(10, 3), (11, 1)]
+    mock_session.execute = AsyncMock(return_value=result)
+    repo = TransactionRepository(mock_session)
+    filters = TransactionFilter(
+        start_date="2024-01-01",
+        end_date="2024-12-31",
+        status="successful",
+        include_median=True,
+    )
+
+    rows = await repo.get_amount_sketch(filters)
+
+    sql = str(
+        mock_session.execute.call_args.args[0].compile(dialect=postgresql.dialect())
+    )
+    assert rows == [(10, 3), (11, 1)]
+    assert "unnest(daily_transaction_rollups.sketch_buckets)" in sql
+    assert "UNION ALL" in sql
+    # Сырые строки только раскладываются по корзинам, без сортировки сумм
+    assert "percentile" not in sql
+
+
+@pytest.mark.asyncio
+async def test_get_country_report_with_distinct_users_query(mock_session):
+    from unittest.mock import MagicMock
+    from sqlalchemy.dialects import postgresql
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import CountryStatsFilter
+
+    mock_session.execute = AsyncMock(return_value=MagicMock())
+    repo = TransactionRepository(mock_session)
+
+    await repo.get_country_report(
+        CountryStatsFilter(sort_by="total", top_n=5, include_distinct_users=True)
+    )
+
+    sql = str(
+        mock_session.execute.call_args.args[0].compile(dialect=postgresql.dialect())
+    )
+    assert "country_stats.distinct_users" in sql
+    assert "hashint4(transactions.user_id)" in sql
+    assert "count(DISTINCT" not in sql
+    assert "ORDER BY total_amount DESC, country" in sql
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    not os.getenv("TEST_DATABASE_URL"),
+    reason="нужна PostgreSQL в TEST_DATABASE_URL",
+)
+@pytest.mark.parametrize("distinct", [50, 5_000, 200_000])
+async def test_hll_estimate_matches_distinct_count(distinct):
+    from sqlalchemy import select, func
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.services.utils.utils_hll import (
+        HLL_STORED_PRECISION,
+        hll_register_sql,
+        hll_rank_sql,
+        hll_fold_sql,
+        hll_estimate_sql,
+        hll_relative_error,
+    )
+
+    precision = 12
+    # Каждый пользователь повторяется трижды: оценка не зависит от дублей
+    users = (
+        select((func.generate_series(1, distinct * 3) % distinct).label("user_id"))
+    ).subquery("users")
+    user_id = users.c.user_id
+    stored = (
+        select(
+            hll_register_sql(user_id, HLL_STORED_PRECISION).label("register"),
+            func.max(hll_rank_sql(user_id, HLL_STORED_PRECISION)).label("rank"),
+        )
+        .group_by(hll_register_sql(user_id, HLL_STORED_PRECISION))
+        .subquery("stored")
+    )
+    # Свёртка хранимых регистров должна совпадать с прямым подсчётом
+    register, rank = hll_fold_sql(
+        stored.c.register, stored.c.rank, HLL_STORED_PRECISION, precision
+    )
+    folded = select(register.label("register"), rank.label("rank")).subquery()
+    folded = (
+        select(folded.c.register, func.max(folded.c.rank).label("rank"))
+        .group_by(folded.c.register)
+        .subquery("folded")
+    )
+    direct = (
+        select(
+            hll_register_sql(user_id, precision).label("register"),
+            func.max(hll_rank_sql(user_id, precision)).label("rank"),
+        )
+        .group_by(hll_register_sql(user_id, precision))
+        .subquery("direct")
+    )
+
+    engine = create_async_engine(os.environ["TEST_DATABASE_URL"])
+    try:
+        async with engine.connect() as connection:
+            from_folded = await connection.scalar(
+                select(hll_estimate_sql(folded.c.rank, precision))
+            )
+            from_direct = await connection.scalar(
+                select(hll_estimate_sql(direct.c.rank, precision))
+            )
+    finally:
+        await engine.dispose()
+
+    assert from_folded == from_direct
+    assert abs(from_direct - distinct) <= 4 * hll_relative_error(precision) * distinct
+
+
+@pytest.mark.asyncio
+async def test_get_batch_aggregates_single_query(mock_session):
+    from unittest.mock import MagicMock
+    from sqlalchemy.dialects import postgresql
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import TransactionFilter
+
+    result = MagicMock()
+    result.fetchone.return_value._mapping = {
+        "total_amount_0": Decimal("50.00"),
+        "transaction_count_0": 5,
+        "max_amount_2": Decimal("9.99"),
+    }
+    mock_session.execute = AsyncMock(return_value=result)
+    repo = TransactionRepository(mock_session)
+    filters_list = [
+        TransactionFilter(
+            start_date="2024-01-01",
+            end_date="2024-01-31",
+            status="successful",
+            include_total=True,
+        ),
+        TransactionFilter(start_date="2023-01-01", end_date="2023-12-31"),
+        TransactionFilter(
+            start_date="2024-01-15",
+            end_date="2024-02-15",
+            status="successful",
+            type="payment",
+            include_max=True,
+        ),
     ]
 
-    # Перезаписываем мок, установленный в фикстуре
-    mock_transaction_repo.get_trans_user_ids.return_value = fake_transactions
+    reports = await repo.get_batch_aggregates(filters_list)
+
+    mock_session.execute.assert_awaited_once()
+    sql = str(
+        mock_session.execute.call_args.args[0].compile(dialect=postgresql.dialect())
+    )
+    assert sql.count("FILTER (WHERE") == 3
+    assert "AS max_amount_2" in sql
+    assert reports[0].total_amount == 50.0 and reports[0].transaction_count == 5
+    assert reports[1].total_amount is None
+    assert reports[2].max_amount == 9.99
+
+
+@pytest.mark.asyncio
+async def test_refresh_daily_rollups_rebuilds_dirty_days(mock_session):
+    from datetime import date, datetime
+    from app.repo.rollup_repo import RollupRepository
+
+    repo = RollupRepository(mock_session)
+    repo.lock_watermark = AsyncMock(return_value=datetime(2024, 1, 2))
+    repo.get_db_now = AsyncMock(return_value=datetime(2024, 1, 3))
+    repo.claim_dirty_days = AsyncMock(return_value=[date(2023, 12, 31)])
+    repo.rebuild_daily_rollups = AsyncMock()
+    repo.set_watermark = AsyncMock()
+    repo.bump_data_watermark = AsyncMock()
+
+    days = await repo.refresh_daily_rollups()
+
+    # День до отметки пересчитывается: он взят из rollup_dirty_days, а не по updated_at
+    assert days == [date(2023, 12, 31)]
+    repo.rebuild_daily_rollups.assert_awaited_once_with(days)
+    repo.bump_data_watermark.assert_awaited_once()
+
+    # Без изменённых дней роллапы те же, кэш отчётов не сбрасывается
+    repo.claim_dirty_days.return_value = []
+    assert await repo.refresh_daily_rollups() == []
+    assert repo.bump_data_watermark.await_count == 1
+
+    repo.lock_watermark.return_value = None
+    assert await repo.refresh_daily_rollups() is None
+    repo.rebuild_daily_rollups.assert_awaited_with(None)
+    assert repo.bump_data_watermark.await_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    not os.getenv("TEST_DATABASE_URL"),
+    reason="нужна PostgreSQL с применёнными миграциями в TEST_DATABASE_URL",
+)
+async def test_rollup_refresh_picks_up_late_commit():
+    from datetime import date, datetime
+    from sqlalchemy import delete, func, insert, select
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from app.enums.enum_status import TypeStatusEnum
+    from app.enums.enum_type_pay import TypePayEnum
+    from app.models import DailyTransactionRollupModel, TransactionModel, UserModel
+    from app.services.rollup_service import RollupServices
+
+    engine = create_async_engine(os.environ["TEST_DATABASE_URL"])
+    day = date(1999, 1, 15)
+    rollup = DailyTransactionRollupModel
+
+    async def refresh():
+        async with AsyncSession(engine) as session:
+            await RollupServices(session).refresh_daily_rollups()
+
+    async def rollup_count():
+        async with engine.connect() as connection:
+            return await connection.scalar(
+                select(func.coalesce(func.sum(rollup.transaction_count), 0)).where(
+                    rollup.day == day
+                )
+            )
+
+    try:
+        async with engine.begin() as connection:
+            user_id = await connection.scalar(
+                insert(UserModel)
+                .values(email="late-commit@test", hashed_password="x", name="late")
+                .returning(UserModel.id)
+            )
+        # Транзакция начинается до пересчёта, а коммитится после него
+        async with engine.connect() as late:
+            await late.execute(
+                insert(TransactionModel).values(
+                    date_pay=datetime(1999, 1, 15, 12),
+                    sum_pay=Decimal("10.00"),
+                    status=TypeStatusEnum.SUCCESSFUL,
+                    type=TypePayEnum.PAYMENT,
+                    user_id=user_id,
+                )
+            )
+            await refresh()
+            await late.commit()
+        assert await rollup_count() == 0
+
+        await refresh()
+        assert await rollup_count() == 1
+
+        # Удаление тоже отмечает день
+        async with engine.begin() as connection:
+            await connection.execute(
+                delete(TransactionModel).where(TransactionModel.user_id == user_id)
+            )
+        await refresh()
+        assert await rollup_count() == 0
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(
+                delete(TransactionModel).where(
+                    TransactionModel.user_id
+                    == select(UserModel.id)
+                    .where(UserModel.email == "late-commit@test")
+                    .scalar_subquery()
+                )
+            )
+            await connection.execute(
+                delete(UserModel).where(UserModel.email == "late-commit@test")
+            )
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    not os.getenv("TEST_DATABASE_URL"),
+    reason="нужна PostgreSQL с применёнными миграциями в TEST_DATABASE_URL",
+)
+async def test_change_counter_does_not_serialize_writers():
+    import asyncio
+    from datetime import datetime
+    from sqlalchemy import delete, insert, select, text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from app.enums.enum_status import TypeStatusEnum
+    from app.enums.enum_type_pay import TypePayEnum
+    from app.models import TransactionModel, UserModel
+    from app.repo.transaction_repo import TransactionRepository
+
+    engine = create_async_engine(os.environ["TEST_DATABASE_URL"], pool_size=10)
+    email = "change-counter@test"
+
+    async def watermark():
+        async with AsyncSession(engine) as session:
+            return await TransactionRepository(session).get_data_watermark()
+
+    def payment(user_id):
+        return insert(TransactionModel).values(
+            date_pay=datetime(1999, 2, 1, 12),
+            sum_pay=Decimal("1.00"),
+            status=TypeStatusEnum.SUCCESSFUL,
+            type=TypePayEnum.PAYMENT,
+            user_id=user_id,
+        )
+
+    connections = []
+    try:
+        async with engine.begin() as connection:
+            user_id = await connection.scalar(
+                insert(UserModel)
+                .values(email=email, hashed_password="x", name="counter")
+                .returning(UserModel.id)
+            )
+        before = await watermark()
+        # Два соединения из разных шардов счётчика
+        by_shard = {}
+        while len(by_shard) < 2:
+            connection = await engine.connect()
+            connections.append(connection)
+            pid = await connection.scalar(text("SELECT pg_backend_pid()"))
+            by_shard.setdefault(pid % 16, connection)
+        first, second = by_shard.values()
+
+        await first.execute(payment(user_id))
+        # Пока первая транзакция открыта, вторая не ждёт её блокировки
+        await asyncio.wait_for(second.execute(payment(user_id)), timeout=5)
+        await second.commit()
+        await first.commit()
+
+        assert await watermark() == before + 2
+    finally:
+        for connection in connections:
+            await connection.close()
+        async with engine.begin() as connection:
+            await connection.execute(
+                delete(TransactionModel).where(
+                    TransactionModel.user_id
+                    == select(UserModel.id)
+                    .where(UserModel.email == email)
+                    .scalar_subquery()
+                )
+            )
+            await connection.execute(delete(UserModel).where(UserModel.email == email))
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    not os.getenv("TEST_DATABASE_URL"),
+    reason="нужна PostgreSQL с применёнными миграциями в TEST_DATABASE_URL",
+)
+async def test_partition_lifecycle_with_default_rows():
+    from datetime import date, datetime
+    from sqlalchemy import delete, func, insert, select, text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from app.enums.enum_status import TypeStatusEnum
+    from app.enums.enum_type_pay import TypePayEnum
+    from app.models import DailyTransactionRollupModel, TransactionModel, UserModel
+    from app.repo.partition_repo import PartitionRepository
+    from app.repo.transaction_repo import TransactionRepository
+    from app.services.partition_service import PartitionServices
+
+    engine = create_async_engine(os.environ["TEST_DATABASE_URL"])
+    email = "partition-lifecycle@test"
+    month = date(2033, 5, 1)
+    name = "transactions_y2033m05"
+    rollup = DailyTransactionRollupModel
+
+    async def scalar(query):
+        async with engine.connect() as connection:
+            return await connection.scalar(query)
+
+    try:
+        async with engine.begin() as connection:
+            user_id = await connection.scalar(
+                insert(UserModel)
+                .values(email=email, hashed_password="x", name="partition")
+                .returning(UserModel.id)
+            )
+            # Партиции месяца ещё нет: строки оседают в default
+            await connection.execute(
+                insert(TransactionModel),
+                [
+                    dict(
+                        date_pay=datetime(2033, 5, day, 12),
+                        sum_pay=Decimal("10.00"),
+                        status=TypeStatusEnum.SUCCESSFUL,
+                        type=TypePayEnum.PAYMENT,
+                        user_id=user_id,
+                    )
+                    for day in (1, 31)
+                ],
+            )
+            await connection.execute(
+                insert(rollup).values(
+                    day=date(2033, 5, 1),
+                    status=TypeStatusEnum.SUCCESSFUL,
+                    type=TypePayEnum.PAYMENT,
+                    total_amount=Decimal("10.00"),
+                    transaction_count=1,
+                    min_amount=Decimal("10.00"),
+                    max_amount=Decimal("10.00"),
+                )
+            )
+
+        async with AsyncSession(engine) as session:
+            assert (
+                await PartitionRepository(session).create_partitions(month, month) == 1
+            )
+            await session.commit()
+        # Строки перенесены в новую партицию, default их больше не держит
+        assert await scalar(text(f"SELECT count(*) FROM {name}")) == 2
+        assert (
+            await scalar(
+                text(
+                    "SELECT count(*) FROM transactions_default "
+                    "WHERE date_pay >= '2033-05-01' AND date_pay < '2033-06-01'"
+                )
+            )
+            == 0
+        )
+
+        async with AsyncSession(engine) as session:
+            before = await TransactionRepository(session).get_data_watermark()
+        async with AsyncSession(engine) as session:
+            assert await PartitionServices(session).detach_month(month) == name
+        async with AsyncSession(engine) as session:
+            assert await TransactionRepository(session).get_data_watermark() > before
+            assert name not in await PartitionRepository(session).get_partitions()
+        # Данные остались в таблице, роллапы месяца удалены той же транзакцией
+        assert await scalar(text(f"SELECT count(*) FROM {name}")) == 2
+        assert (
+            await scalar(
+                select(func.count()).select_from(rollup).where(rollup.day == month)
+            )
+            == 0
+        )
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            await connection.execute(delete(rollup).where(rollup.day == month))
+            await connection.execute(
+                delete(TransactionModel).where(
+                    TransactionModel.user_id
+                    == select(UserModel.id)
+                    .where(UserModel.email == email)
+                    .scalar_subquery()
+                )
+            )
+            await connection.execute(delete(UserModel).where(UserModel.email == email))
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    not os.getenv("TEST_DATABASE_URL"),
+    reason="нужна PostgreSQL с применёнными миграциями в TEST_DATABASE_URL",
+)
+async def test_rollup_refresh_invalidates_cached_report(monkeypatch):
+    from datetime import datetime
+    from sqlalchemy import delete, insert, select
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from app.enums.enum_status import TypeStatusEnum
+    from app.enums.enum_type_pay import TypePayEnum
+    from app.models import TransactionModel, UserModel
+    from app.schemas.report_schema import TransactionFilter
+    from app.services import report_service
+    from app.services.rollup_service import RollupServices
+    from app.services.utils.report_cache import InMemoryCacheBackend, ReportCache
+
+    engine = create_async_engine(os.environ["TEST_DATABASE_URL"])
+    email = "refresh-cache@test"
+    cache = ReportCache(InMemoryCacheBackend(max_size=10, ttl_sec=300))
+    monkeypatch.setattr(report_service, "report_cache", cache)
+    filters = TransactionFilter(
+        start_date="1998-03-10",
+        end_date="1998-03-10",
+        status="successful",
+        include_total=True,
+    )
+
+    async def refresh():
+        async with AsyncSession(engine) as session:
+            await RollupServices(session).refresh_daily_rollups()
+
+    async def report_count():
+        async with AsyncSession(engine) as session:
+            report = await report_service.ReportServices(
+                session
+            ).get_all_report_by_filter(filters)
+            return report.transaction_count
+
+    async def add_payment(user_id):
+        async with engine.begin() as connection:
+            await connection.execute(
+                insert(TransactionModel).values(
+                    date_pay=datetime(1998, 3, 10, 12),
+                    sum_pay=Decimal("10.00"),
+                    status=TypeStatusEnum.SUCCESSFUL,
+                    type=TypePayEnum.PAYMENT,
+                    user_id=user_id,
+                )
+            )
 
-    result = await mock_transaction_repo.get_trans_user_ids([1, 2])
+    try:
+        async with engine.begin() as connection:
+            user_id = await connection.scalar(
+                insert(UserModel)
+                .values(email=email, hashed_password="x", name="cache")
+                .returning(UserModel.id)
+            )
+        await add_payment(user_id)
+        await refresh()
+        # Запись задним числом: роллап дня устарел до следующего пересчёта,
+        # и отчёт по нему попадает в кэш под новым watermark
+        await add_payment(user_id)
+        assert await report_count() == 1
 
-    assert len(result) == 2
-    assert result[0].user_id == 1
-    assert result[1].user_id == 2
+        await refresh()
+        assert await report_count() == 2
+        assert cache.get_stats().stale == 1
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(
+                delete(TransactionModel).where(
+                    TransactionModel.user_id
+                    == select(UserModel.id)
+                    .where(UserModel.email == email)
+                    .scalar_subquery()
+                )
+            )
+            await connection.execute(delete(UserModel).where(UserModel.email == email))
+        await refresh()
+        await engine.dispose()
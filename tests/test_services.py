@@ -1,29 +1,388 @@
 import pytest
 from decimal import Decimal
+from io import BytesIO
+from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
 
 @pytest.mark.asyncio
 async def test_get_report_country(mock_report_service):
-    # Подготовим транзакции
-    mock_trans = [
-        type("obj", (), {"user_id": 1, "sum_pay": Decimal("100.00")}),
-        type("obj", (), {"user_id": 2, "sum_pay": Decimal("200.00")}),
+    # Строки агрегата по странам, которые возвращает PostgreSQL
+    mock_rows = [
+        SimpleNamespace(
+            country="Russia",
+            transaction_count=1,
+            total_amount=Decimal("100.00"),
+            average_amount=Decimal("100.00"),
+        ),
+        SimpleNamespace(
+            country="USA",
+            transaction_count=1,
+            total_amount=Decimal("200.00"),
+            average_amount=Decimal("200.00"),
+        ),
     ]
-    mock_report_service.report_repo.get_trans_user_ids.return_value = mock_trans
+    mock_report_service.report_repo.get_country_report.return_value = mock_rows
+
+    # Пачки из CSV должны уйти в COPY
+    loaded = []
+
+    async def load_user_countries(chunks):
+        async for records in chunks:
+            loaded.extend(records)
+        return len(loaded)
+
+    mock_report_service.report_repo.load_user_countries = load_user_countries
 
     # CSV данные
-    csv_str = "user_id;country\n1;Russia\n2;USA\n"
+    csv_file = BytesIO(b"user_id;country\n1;Russia\n2;USA\n")
     from app.schemas.report_schema import CountryStatsFilter
 
     filters = CountryStatsFilter(sort_by="total", top_n=10)
 
     result = await mock_report_service.get_report_country(
-        countries_csv=csv_str, filters=filters
+        countries_file=csv_file, filename="countries.csv", filters=filters
     )
 
+    assert loaded == [(1, "Russia"), (2, "USA")]
+    mock_report_service.report_repo.get_country_report.assert_awaited_once_with(filters)
     assert len(result) == 2
     assert result[0].country == "Russia"
     assert result[0].total_amount == 100.0
     assert result[1].country == "USA"
     assert result[1].total_amount == 200.0
+
+
+@pytest.mark.asyncio
+async def test_get_all_report_by_filter_cached(mock_report_service, monkeypatch):
+    from app.schemas.report_schema import AggregateReport, TransactionFilter
+    from app.services import report_service
+    from app.services.utils.report_cache import ReportCache, InMemoryCacheBackend
+
+    cache = ReportCache(InMemoryCacheBackend(max_size=10, ttl_sec=60))
+    monkeypatch.setattr(report_service, "report_cache", cache)
+    repo = mock_report_service.report_repo
+    repo.get_report.return_value = (AggregateReport(transaction_count=5), None)
+    filters = TransactionFilter(status="successful", include_total=True)
+
+    first = await mock_report_service.get_all_report_by_filter(filters)
+    second = await mock_report_service.get_all_report_by_filter(filters)
+    # Изменение данных сдвигает watermark и инвалидирует запись
+    repo.get_data_watermark.return_value = 2
+    third = await mock_report_service.get_all_report_by_filter(filters)
+
+    assert first == second == third
+    assert repo.get_report.await_count == 2
+    stats = cache.get_stats()
+    assert (stats.hits, stats.misses, stats.stale) == (1, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_get_all_report_by_filter_caches_replica_separately(
+    mock_report_service, monkeypatch
+):
+    from unittest.mock import MagicMock
+    from app.schemas.report_schema import AggregateReport, TransactionFilter
+    from app.services import report_service
+    from app.services.utils.report_cache import ReportCache, InMemoryCacheBackend
+
+    cache = ReportCache(InMemoryCacheBackend(max_size=10, ttl_sec=60))
+    monkeypatch.setattr(report_service, "report_cache", cache)
+    replica = MagicMock()
+    monkeypatch.setattr(report_service.replica_router, "replica", replica)
+    repo = mock_report_service.report_repo
+    repo.get_report.return_value = (AggregateReport(transaction_count=5), None)
+    filters = TransactionFilter(status="successful", include_total=True)
+    replica_service = report_service.ReportServices(None, replica)
+    replica_service.report_repo = repo
+
+    await mock_report_service.get_all_report_by_filter(filters)
+    # Тот же watermark, но отчёт с реплики не берётся из записи основной БД
+    await replica_service.get_all_report_by_filter(filters)
+    await replica_service.get_all_report_by_filter(filters)
+
+    assert mock_report_service.data_source == "primary"
+    assert replica_service.data_source == "replica"
+    assert repo.get_report.await_count == 2
+    stats = cache.get_stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 2, 2)
+
+
+@pytest.mark.asyncio
+async def test_ensure_future_partitions(mock_session):
+    from datetime import date
+    from app.services.partition_service import PartitionServices
+
+    service = PartitionServices(mock_session)
+    service.partition_repo.create_partitions = AsyncMock(return_value=2)
+
+    created = await service.ensure_future_partitions(3, today=date(2024, 11, 15))
+
+    assert created == 2
+    # Окно переходит через год и начинается с первого числа месяца
+    service.partition_repo.create_partitions.assert_awaited_once_with(
+        date(2024, 11, 1), date(2025, 2, 1)
+    )
+    mock_session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_detach_month_rolls_back_on_error(mock_session):
+    from datetime import date
+    from app.services.partition_service import PartitionServices
+
+    service = PartitionServices(mock_session)
+    service.partition_repo.detach_partition = AsyncMock(
+        return_value="transactions_y2024m01"
+    )
+
+    assert await service.detach_month(date(2024, 1, 1)) == "transactions_y2024m01"
+    mock_session.commit.assert_awaited_once()
+
+    # Не дождались блокировки: ни DETACH, ни удаление роллапов не фиксируются
+    service.partition_repo.detach_partition.side_effect = RuntimeError("lock timeout")
+    with pytest.raises(RuntimeError):
+        await service.detach_month(date(2024, 1, 1))
+    mock_session.rollback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stream_transactions_export(monkeypatch):
+    from contextlib import asynccontextmanager
+    from app.enums.enum_export import ExportFormatEnum
+    from app.repo.transaction_repo import TransactionRepository
+    from app.schemas.report_schema import TransactionFilter
+    from app.services import export_service
+
+    @asynccontextmanager
+    async def session_local():
+        yield AsyncMock()
+
+    async def copy_export(self, filters, export_format, output):
+        assert export_format == ExportFormatEnum.CSV
+        for chunk in (b"id,date_pay\n", b"1,2024-01-01\n", b"2,2024-01-02\n"):
+            await output(chunk)
+
+    monkeypatch.setattr(export_service, "SessionLocal", session_local)
+    monkeypatch.setattr(TransactionRepository, "copy_export", copy_export)
+
+    # Очередь на один кусок: производитель ждёт, пока потребитель заберёт данные
+    chunks = [
+        chunk
+        async for chunk in export_service.stream_transactions_export(
+            TransactionFilter(), ExportFormatEnum.CSV, queue_size=1
+        )
+    ]
+
+    assert b"".join(chunks) == b"id,date_pay\n1,2024-01-01\n2,2024-01-02\n"
+
+
+@pytest.mark.asyncio
+async def test_upload_country_dataset(mock_session):
+    from app.services.country_dataset_service import (
+        CountryDatasetServices,
+        file_sha256,
+    )
+
+    csv_file = BytesIO(b"user_id;country\n1;Russia\n2;USA\n")
+    service = CountryDatasetServices(mock_session)
+    repo = service.dataset_repo
+    repo.get_by_hash = AsyncMock(return_value=None)
+    repo.create_dataset = AsyncMock(
+        return_value=SimpleNamespace(
+            id=3, filename="countries.csv", content_hash=file_sha256(csv_file)
+        )
+    )
+    loaded = []
+
+    async def load_user_countries(dataset_id, chunks):
+        async for records in chunks:
+            loaded.extend((dataset_id, *record) for record in records)
+        return len(loaded)
+
+    repo.load_user_countries = load_user_countries
+
+    info = await service.upload_dataset(csv_file, "countries.csv")
+
+    assert (info.id, info.row_count, info.created) == (3, 2, True)
+    assert loaded == [(3, 1, "Russia"), (3, 2, "USA")]
+    mock_session.commit.assert_awaited_once()
+
+    # Тот же файл повторно не разбирается
+    repo.get_by_hash.return_value = SimpleNamespace(
+        id=3, filename="countries.csv", content_hash=info.content_hash, row_count=2
+    )
+    again = await service.upload_dataset(csv_file, "countries.csv")
+    assert (again.id, again.created) == (3, False)
+    assert len(loaded) == 2
+
+
+@pytest.mark.asyncio
+async def test_job_queue_runs_jobs_with_bounded_concurrency():
+    import asyncio
+    from app.core.job_queue import JobQueue, JobQueueFullError
+    from app.enums.enum_job import JobKindEnum, JobStatusEnum
+
+    queue = JobQueue(workers=2, max_queued=3, result_ttl_sec=60)
+    running, peak = 0, 0
+    release = asyncio.Event()
+
+    async def runner(value):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+        if value is None:
+            raise RuntimeError("нет данных")
+        return value
+
+    jobs = [
+        queue.submit(JobKindEnum.REPORT, lambda value=value: runner(value))
+        for value in (1, 2, None)
+    ]
+    # Воркеры ещё не забрали задачи: очередь на 3 заполнена
+    with pytest.raises(JobQueueFullError):
+        queue.submit(JobKindEnum.REPORT, lambda: runner(4))
+
+    queue.start()
+    await asyncio.sleep(0)
+    release.set()
+    await queue.join()
+    await queue.stop()
+
+    assert peak == 2
+    results = [queue.get(job.id) for job in jobs]
+    assert [job.status for job in results] == [
+        JobStatusEnum.DONE,
+        JobStatusEnum.DONE,
+        JobStatusEnum.FAILED,
+    ]
+    assert [results[0].result, results[1].result] == [1, 2]
+    assert results[2].error == "нет данных"
+
+    # После TTL результаты удаляются
+    for job in results:
+        job.expires_at = 0
+    assert queue.get(jobs[0].id) is None
+
+
+@pytest.mark.asyncio
+async def test_get_all_report_by_filter_coalesces_concurrent_requests(
+    mock_report_service, monkeypatch
+):
+    import asyncio
+
+    from app.schemas.report_schema import AggregateReport, TransactionFilter
+    from app.services import report_service
+    from app.services.utils.report_cache import ReportCache, InMemoryCacheBackend
+    from app.services.utils.single_flight import SingleFlight
+
+    monkeypatch.setattr(
+        report_service,
+        "report_cache",
+        ReportCache(InMemoryCacheBackend(max_size=10, ttl_sec=60)),
+    )
+    flight = SingleFlight()
+    monkeypatch.setattr(report_service, "report_flight", flight)
+
+    async def slow_report(filters, columnar=False):
+        await asyncio.sleep(0.01)
+        return AggregateReport(transaction_count=5), None
+
+    repo = mock_report_service.report_repo
+    repo.get_report.side_effect = slow_report
+    filters = TransactionFilter(status="successful", include_total=True)
+
+    reports = await asyncio.gather(
+        *(mock_report_service.get_all_report_by_filter(filters) for _ in range(10))
+    )
+
+    assert all(report.transaction_count == 5 for report in reports)
+    assert repo.get_report.await_count == 1
+    assert flight.get_stats().coalesced == 9
+
+
+@pytest.mark.asyncio
+async def test_build_report_with_median_and_percentiles(mock_report_service):
+    from app.schemas.report_schema import TransactionFilter
+    from app.services.utils.utils_sketch import sketch_bucket
+
+    repo = mock_report_service.report_repo
+    amounts = [10.0] * 50 + [100.0] * 45 + [1000.0] * 5
+    buckets = {}
+    for amount in amounts:
+        bucket = sketch_bucket(amount)
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+    repo.get_amount_sketch = AsyncMock(return_value=sorted(buckets.items()))
+    filters = TransactionFilter(
+        status="successful", include_median=True, include_percentiles=True
+    )
+
+    report = await mock_report_service.build_report_by_filter(filters)
+
+    repo.get_amount_sketch.assert_awaited_once_with(filters)
+    assert report.median_amount == pytest.approx(10, rel=0.01)
+    assert report.percentiles["p90"] == pytest.approx(100, rel=0.01)
+    assert report.percentiles["p99"] == pytest.approx(1000, rel=0.01)
+
+
+@pytest.mark.asyncio
+async def test_build_report_with_distinct_users(mock_report_service):
+    from app.schemas.report_schema import (
+        AggregateReport,
+        DailyShift,
+        TransactionFilter,
+    )
+
+    repo = mock_report_service.report_repo
+    repo.get_report.return_value = (
+        AggregateReport(),
+        [
+            DailyShift(date="2024-01-01", total_amount=10, count=3),
+            DailyShift(date="2024-01-02", total_amount=20, count=5),
+        ],
+    )
+    repo.get_distinct_users = AsyncMock(return_value=6)
+    repo.get_daily_distinct_users = AsyncMock(return_value={"2024-01-01": 2})
+    filters = TransactionFilter(include_daily_shift=True, include_distinct_users=True)
+
+    report = await mock_report_service.build_report_by_filter(filters)
+
+    assert report.distinct_users == 6
+    assert [shift.distinct_users for shift in report.daily_shifts] == [2, 0]
+
+
+@pytest.mark.asyncio
+async def test_get_batch_report_dedupes_and_keeps_order(
+    mock_report_service, monkeypatch
+):
+    from app.schemas.report_schema import (
+        AggregateReport,
+        ReportResponse,
+        TransactionFilter,
+    )
+    from app.services import report_service
+
+    totals = TransactionFilter(status="successful", include_total=True)
+    failed = TransactionFilter(status="failed")
+    daily = TransactionFilter(include_daily_shift=True)
+    repo = mock_report_service.report_repo
+    repo.get_batch_aggregates = AsyncMock(
+        return_value=[
+            AggregateReport(total_amount=10, transaction_count=2),
+            AggregateReport(),
+        ]
+    )
+    separately = AsyncMock(return_value=ReportResponse(daily_shifts=[]))
+    monkeypatch.setattr(report_service, "build_report_in_new_session", separately)
+
+    reports = await mock_report_service.get_batch_report(
+        [daily, totals, failed, totals.model_copy(), daily]
+    )
+
+    # Итоговые фильтры — одним запросом, дубликаты не пересчитываются
+    repo.get_batch_aggregates.assert_awaited_once_with([totals, failed])
+    separately.assert_awaited_once_with(daily, mock_report_service.session_factory)
+    assert [report.total_amount for report in reports] == [None, 10, None, 10, None]
+    assert reports[0].daily_shifts == [] and reports[4] is reports[0]
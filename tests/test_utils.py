@@ -1,14 +1,317 @@
-from app.services.utils.utils_pandas_frame import get_user_id_for_n_countries
-from app.schemas.report_schema import CountryStatsFilter
+import gzip
+from io import BytesIO
 
+import pytest
 
-def test_get_user_id_for_n_countries():
-    csv_str = "user_id;country\n1;Russia\n2;USA\n3;Russia\n"
-    filters = CountryStatsFilter(sort_by="count", top_n=10)
+from app.services.utils.utils_pandas_frame import iter_user_countries
 
-    result = get_user_id_for_n_countries(countries_csv=csv_str, filters=filters)
 
-    assert len(result.list_id_for_search) == 3
-    assert len(result.list_id_data_csv) == 2
-    assert result.list_id_data_csv[0].country == "Russia"
-    assert result.list_id_data_csv[1].country == "USA"
+def test_iter_user_countries():
+    csv_file = BytesIO(b"user_id;country\n1;Russia\n2;USA\n3;Russia\n")
+
+    chunks = list(iter_user_countries(csv_file, "countries.csv", chunk_size=2))
+
+    assert chunks == [[(1, "Russia"), (2, "USA")], [(3, "Russia")]]
+    assert all(type(user_id) is int for user_id, _ in chunks[0])
+
+
+def test_iter_user_countries_gzip():
+    csv_file = BytesIO(gzip.compress(b"user_id;country\n1;Russia\n2;USA\n"))
+
+    chunks = list(iter_user_countries(csv_file, "countries.csv.gz", chunk_size=10))
+
+    assert chunks == [[(1, "Russia"), (2, "USA")]]
+
+
+def test_iter_user_countries_zstd():
+    try:
+        from compression.zstd import compress
+    except ImportError:
+        compress = pytest.importorskip("zstandard").compress
+    csv_file = BytesIO(compress(b"user_id;country\n1;Russia\n2;USA\n3;Russia\n"))
+
+    chunks = list(iter_user_countries(csv_file, "countries.csv.zst", chunk_size=2))
+
+    assert chunks == [[(1, "Russia"), (2, "USA")], [(3, "Russia")]]
+
+
+def test_iter_user_countries_missing_column():
+    csv_file = BytesIO(b"user_id;city\n1;Moscow\n")
+
+    with pytest.raises(ValueError):
+        list(iter_user_countries(csv_file, "countries.csv", chunk_size=10))
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_backend_lru_and_ttl(monkeypatch):
+    from app.services.utils import report_cache
+    from app.services.utils.report_cache import InMemoryCacheBackend
+
+    now = [100.0]
+    monkeypatch.setattr(report_cache.time, "monotonic", lambda: now[0])
+    backend = InMemoryCacheBackend(max_size=2, ttl_sec=10)
+
+    await backend.set("a", 1)
+    await backend.set("b", 2)
+    assert await backend.get("a") == 1
+    # "b" вытесняется как давно не использованный
+    await backend.set("c", 3)
+    assert await backend.get("b") is None
+    assert backend.size() == 2
+
+    now[0] += 11
+    assert await backend.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_and_propagates_errors():
+    import asyncio
+
+    from app.services.utils.single_flight import SingleFlight
+
+    flight = SingleFlight()
+    calls = []
+    release = asyncio.Event()
+
+    async def compute():
+        calls.append(1)
+        await release.wait()
+        if len(calls) > 1:
+            raise RuntimeError("db error")
+        return 42
+
+    waiters = [asyncio.ensure_future(flight.do("k", compute)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert flight.get_stats().in_flight == 1
+    release.set()
+    assert await asyncio.gather(*waiters) == [42] * 5
+
+    # После завершения ключ свободен, ошибка достаётся всем ожидающим
+    release.clear()
+    waiters = [asyncio.ensure_future(flight.do("k", compute)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    stats = flight.get_stats()
+    assert (stats.executions, stats.coalesced, stats.errors) == (2, 6, 1)
+    assert stats.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancellation():
+    import asyncio
+
+    from app.services.utils.single_flight import SingleFlight
+
+    flight = SingleFlight()
+    release = asyncio.Event()
+    cancelled = []
+
+    async def compute():
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return "ok"
+
+    leader = asyncio.ensure_future(flight.do("k", compute))
+    follower = asyncio.ensure_future(flight.do("k", compute))
+    await asyncio.sleep(0)
+    # Отмена одного ожидающего не прерывает вычисление для остальных
+    follower.cancel()
+    await asyncio.sleep(0)
+    assert not cancelled
+    release.set()
+    assert await leader == "ok"
+
+    # Когда уходят все ожидающие, вычисление отменяется
+    release.clear()
+    only = asyncio.ensure_future(flight.do("k", compute))
+    await asyncio.sleep(0)
+    only.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await only
+    await asyncio.sleep(0)
+    assert cancelled == [1]
+    assert flight.get_stats().in_flight == 0
+
+
+def test_estimate_from_sample_covers_population():
+    import numpy as np
+
+    from app.services.utils.utils_sampling import SampleTotals, estimate_from_sample
+
+    rng = np.random.default_rng(7)
+    amounts = rng.gamma(2.0, 50.0, size=200_000)
+    fraction = 0.02
+    sample = amounts[rng.random(amounts.size) < fraction]
+    # BERNOULLI: каждая строка — отдельный кластер
+    totals = SampleTotals(
+        rows=sample.size,
+        total=sample.sum(),
+        sum_count_sq=sample.size,
+        sum_total_sq=(sample**2).sum(),
+        sum_count_total=sample.sum(),
+    )
+
+    estimates = estimate_from_sample(totals, fraction, confidence=0.99)
+
+    count, total, avg = estimates
+    assert count.low <= amounts.size <= count.high
+    assert total.low <= amounts.sum() <= total.high
+    assert avg.low <= amounts.mean() <= avg.high
+    # Интервал среднего заметно уже разброса самих сумм
+    assert avg.high - avg.low < amounts.std() / 5
+
+    # Полная выборка даёт точный ответ
+    exact = estimate_from_sample(totals, 1.0, confidence=0.99)
+    assert exact.total_amount.low == exact.total_amount.high == sample.sum()
+
+
+def test_amount_sketch_quantiles_and_merge():
+    import numpy as np
+
+    from app.services.utils.utils_sketch import (
+        AmountSketch,
+        SKETCH_RELATIVE_ACCURACY,
+    )
+
+    rng = np.random.default_rng(3)
+    first = rng.lognormal(4, 1, size=20_000).round(2)
+    second = rng.lognormal(5, 0.5, size=30_000).round(2)
+    everything = np.concatenate([first, second])
+
+    # Скетчи по дням сливаются в скетч всего диапазона
+    merged = AmountSketch.from_values(first).merge(AmountSketch.from_values(second))
+
+    assert merged.count == everything.size
+    for q in (0.5, 0.95, 0.99):
+        exact = np.quantile(everything, q, method="lower")
+        assert abs(merged.quantile(q) - exact) <= exact * SKETCH_RELATIVE_ACCURACY * 2
+    assert set(merged.quantiles([0.5, 0.95])) == {"p50", "p95"}
+    assert AmountSketch().quantile(0.5) is None
+
+
+@pytest.mark.parametrize("use_orjson", [True, False], ids=["orjson", "json"])
+def test_fast_json_response_render(monkeypatch, use_orjson):
+    import json
+    from datetime import date, datetime
+    from decimal import Decimal
+
+    from app.core import responses
+    from app.schemas.report_schema import CountryStat
+
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(responses, "orjson", None)
+    content = {
+        "country": "Россия",
+        "stats": [
+            CountryStat(
+                country="Россия",
+                transaction_count=2,
+                total_amount=10.5,
+                average_amount=5.25,
+            )
+        ],
+        "day": date(2024, 1, 2),
+        "at": datetime(2024, 1, 2, 3, 4, 5),
+        "amount": Decimal("1.50"),
+    }
+
+    body = responses.FastJSONResponse(content).body
+
+    assert json.loads(body) == {
+        "country": "Россия",
+        "stats": [
+            {
+                "country": "Россия",
+                "transaction_count": 2,
+                "total_amount": 10.5,
+                "average_amount": 5.25,
+                "distinct_users": None,
+            }
+        ],
+        "day": "2024-01-02",
+        "at": "2024-01-02T03:04:05",
+        "amount": "1.50",
+    }
+    with pytest.raises(TypeError):
+        responses.FastJSONResponse({"value": object()})
+
+
+def test_report_to_arrow_ipc_round_trip():
+    import json
+
+    pa = pytest.importorskip("pyarrow")
+
+    from app.schemas.report_schema import DailyShiftColumns, ReportColumnarResponse
+    from app.services.utils.utils_arrow import report_to_arrow_ipc
+
+    report = ReportColumnarResponse(
+        total_amount=300.0,
+        transaction_count=2,
+        distinct_users=2,
+        daily_shifts=DailyShiftColumns(
+            date=["2024-01-01", "2024-01-02"],
+            total_amount=[100.0, 200.0],
+            count=[1, 1],
+            percent_change=[None, 100.0],
+            distinct_users=[1, 1],
+        ),
+    )
+
+    table = pa.ipc.open_stream(report_to_arrow_ipc(report)).read_all()
+
+    assert table.to_pydict() == {
+        "date": ["2024-01-01", "2024-01-02"],
+        "total_amount": [100.0, 200.0],
+        "count": [1, 1],
+        "percent_change": [None, 100.0],
+        "distinct_users": [1, 1],
+    }
+    totals = json.loads(table.schema.metadata[b"report"])
+    assert totals["total_amount"] == 300.0
+    assert totals["distinct_users"] == 2
+    assert "daily_shifts" not in totals
+
+    # Пустой отчёт даёт пустую таблицу с той же схемой
+    empty = pa.ipc.open_stream(report_to_arrow_ipc(ReportColumnarResponse())).read_all()
+    assert empty.num_rows == 0
+    assert empty.column_names == ["date", "total_amount", "count", "percent_change"]
+
+
+def test_sql_hooks_account_failed_statements():
+    from types import SimpleNamespace
+
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import OperationalError
+
+    from app.core.request_metrics import (
+        RequestMetrics,
+        current_request_metrics,
+        install_sql_hooks,
+    )
+
+    engine = create_engine("sqlite://")
+    install_sql_hooks(SimpleNamespace(sync_engine=engine))
+    metrics = RequestMetrics()
+    token = current_request_metrics.set(metrics)
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing_table"))
+            connection.rollback()
+            assert connection.execute(text("SELECT 1")).scalar() == 1
+            # Время старта не копится на соединении после ошибки
+            assert "query_started" not in connection.info
+    finally:
+        current_request_metrics.reset(token)
+        engine.dispose()
+
+    assert metrics.db_statements == 2
+    assert metrics.db_seconds > 0